@@ -0,0 +1,95 @@
+import json
+import os
+import uuid
+from datetime import datetime, timezone
+
+# Bulk score/streak adjustments with an undo log.
+#
+# A batch is a list of (user_id, score_delta, streak_delta) operations. All of
+# them are applied to the in-memory dicts in one go (no awaits in between), and
+# the batch is appended to ADJUSTMENTS_FILE with the deltas that were actually
+# applied after clamping at zero. Reverting a batch applies those deltas in
+# reverse as a new batch, so the log stays append-only:
+#
+#   {"batch": "20250101-1a2b3c", "at": ..., "by": user_id, "reason": ..., "ops": [[user_id, score, streak], ...]}
+#   {"batch": "20250102-4d5e6f", ..., "reverts": "20250101-1a2b3c", "ops": [...]}
+
+ADJUSTMENTS_FILE = "score_adjustments.jsonl"
+
+
+def new_batch_id():
+    return f"{datetime.now(timezone.utc):%Y%m%d}-{uuid.uuid4().hex[:6]}"
+
+
+def merge_ops(ops):
+    # Sum the deltas of repeated users so each user is adjusted once
+    merged = {}
+    for user_id, score_delta, streak_delta in ops:
+        total = merged.setdefault(str(user_id), [0, 0])
+        total[0] += score_delta
+        total[1] += streak_delta
+    return [(uid, s, st) for uid, (s, st) in merged.items() if s or st]
+
+
+def apply(scores, streaks, ops, by, reason=None, reverts=None, filename=ADJUSTMENTS_FILE, load_user=None):
+    # Apply every operation in memory, log the batch and return its record.
+    # The caller persists scores once, e.g. save_all_scores(user ids in record["ops"]).
+    # load_user(user_id), if given, brings a user into scores/streaks before they are read.
+    ops = merge_ops(ops)
+    if load_user is not None:
+        for user_id, _, _ in ops:
+            load_user(user_id)
+    applied = []
+    for user_id, score_delta, streak_delta in ops:
+        old_score = scores.get(user_id, 0)
+        old_streak = streaks.get(user_id, 0)
+        new_score = max(0, old_score + score_delta)
+        new_streak = max(0, old_streak + streak_delta)
+        applied.append((user_id, new_score, new_streak, new_score - old_score, new_streak - old_streak))
+
+    for user_id, new_score, new_streak, _, _ in applied:
+        scores[user_id] = new_score
+        streaks[user_id] = new_streak
+
+    record = {
+        "batch": new_batch_id(),
+        "at": datetime.now(timezone.utc).isoformat(),
+        "by": str(by),
+        "reason": reason,
+        "ops": [[uid, ds, dst] for uid, _, _, ds, dst in applied if ds or dst],
+    }
+    if reverts:
+        record["reverts"] = reverts
+    with open(filename, "a", encoding="utf-8") as f:
+        f.write(json.dumps(record, ensure_ascii=False, separators=(",", ":")) + "\n")
+    return record
+
+
+def find(batch_id, filename=ADJUSTMENTS_FILE):
+    # Returns (batch record or None, id of the batch that reverted it or None)
+    record = None
+    reverted_by = None
+    if not os.path.exists(filename):
+        return None, None
+    with open(filename, "r", encoding="utf-8") as f:
+        for line in f:
+            try:
+                entry = json.loads(line)
+            except json.JSONDecodeError:
+                continue
+            if entry.get("batch") == batch_id:
+                record = entry
+            elif entry.get("reverts") == batch_id:
+                reverted_by = entry["batch"]
+    return record, reverted_by
+
+
+def revert(scores, streaks, batch_id, by, filename=ADJUSTMENTS_FILE, load_user=None):
+    record, reverted_by = find(batch_id, filename)
+    if record is None:
+        raise ValueError(f"No adjustment batch `{batch_id}`.")
+    if reverted_by:
+        raise ValueError(f"Batch `{batch_id}` was already reverted by `{reverted_by}`.")
+    ops = [(uid, -ds, -dst) for uid, ds, dst in record["ops"]]
+    return apply(scores, streaks, ops, by, reason=f"revert {batch_id}", reverts=batch_id, filename=filename,
+                 load_user=load_user)
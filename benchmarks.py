@@ -0,0 +1,340 @@
+import argparse
+import asyncio
+import atexit
+import gc
+import json
+import os
+import random
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+
+# Benchmarks for the bot's hot paths.
+#
+#   python benchmarks.py                     # run everything, compare against the baseline
+#   python benchmarks.py --max-users 10000   # skip the 1M-user scale for a quick run
+#   python benchmarks.py --update-baseline   # record the current numbers as the new baseline
+#
+# Exits with status 1 when any benchmark is slower than its baseline by more than
+# --threshold (relative) and --min-delta (absolute seconds), and still is when
+# timed a second time. Timings only compare on the same machine, so the baseline
+# is per checkout and not committed: record one with --update-baseline first.
+
+REPO_DIR = os.path.dirname(os.path.abspath(__file__))
+BASELINE_FILE = os.path.join(REPO_DIR, "benchmarks_baseline.json")   # gitignored, per machine
+
+USER_SCALES = (100, 10_000, 1_000_000)
+RIDDLE_SCALES = (100, 100_000)
+
+BENCH_CHANNEL_ID = 4242
+
+# main.py loads its JSON files from the working directory at import time, so
+# import it from an empty scratch directory to keep real data untouched.
+WORK_DIR = tempfile.mkdtemp(prefix="riddle-bench-")
+atexit.register(shutil.rmtree, WORK_DIR, ignore_errors=True)
+os.chdir(WORK_DIR)
+os.environ["DISCORD_CHANNEL_ID"] = str(BENCH_CHANNEL_ID)
+sys.path.insert(0, REPO_DIR)
+
+import main  # noqa: E402
+import sqlite_store  # noqa: E402
+from fake_discord import FakeClient, FakeInteraction, FakeUser  # noqa: E402
+
+WORDS = ["piano", "shadow", "echo", "river", "clock", "candle", "map", "egg", "towel",
+         "keyboard", "footsteps", "darkness", "sponge", "coin", "stamp", "needle"]
+
+
+def make_riddles(count, rng):
+    riddles = []
+    for i in range(1, count + 1):
+        question = " ".join(rng.choice(WORDS) for _ in range(8)) + f" riddle {i}?"
+        riddles.append({
+            "id": str(i),
+            "question": question,
+            "answer": "the " + rng.choice(WORDS),
+            "submitter_id": str(rng.randint(10**17, 10**18)),
+        })
+    return riddles
+
+
+def make_users(count, rng):
+    scores = {}
+    streaks = {}
+    for i in range(count):
+        uid = str(10**17 + i)
+        scores[uid] = rng.randint(0, 60)
+        streaks[uid] = rng.randint(0, 40)
+    return scores, streaks
+
+
+def reset_state(users=0, riddles=0, seed=1234):
+    rng = random.Random(seed)
+    main.scores, main.streaks = make_users(users, rng)
+    main.submission_dates = {}
+    main.submitted_questions = make_riddles(riddles, rng)
+    main.riddle_index.rebuild(main.submitted_questions)
+    main.ranked_index.invalidate()
+    len(main.ranked_index)  # Build it here, not in the first timed run
+    main.used_question_ids = set()
+    main.rounds.clear()
+    main.client = FakeClient(BENCH_CHANNEL_ID)
+    return rng
+
+
+# --- Benchmarks: each takes a scale and returns a zero-arg callable to time ---
+
+def bench_answer_match(users):
+    rng = reset_state()
+    answer = "The piano"
+    guesses = [" ".join(rng.choice(WORDS) for _ in range(3)) for _ in range(users)]
+
+    def run():
+        answer_words = main.clean_and_filter(answer)
+        for content in guesses:
+            user_words = main.clean_and_filter(content)
+            any(word in user_words for word in answer_words)
+    return run
+
+
+def bench_pick_next_riddle(riddles):
+    reset_state(riddles=riddles)
+
+    def run():
+        main.used_question_ids.clear()
+        for _ in range(100):
+            main.used_question_ids.add(str(main.pick_next_riddle()["id"]))  # As activate_round() does
+    return run
+
+
+def bench_duplicate_check(riddles):
+    reset_state(riddles=riddles)
+    candidates = ["What has keys but can't open locks?"] * 10
+    candidates += [q["question"].upper() for q in main.submitted_questions[-10:]]
+
+    def run():
+        for question in candidates:
+            main.is_duplicate_question(question)
+    return run
+
+
+def bench_riddle_persist(riddles):
+    # One submission plus one removal against a catalog of the given size
+    reset_state(riddles=riddles)
+    main.save_all_riddles()
+    extra = make_riddles(1, random.Random(99))[0]
+    extra["id"] = str(riddles + 1)
+
+    def run():
+        main.submitted_questions.append(extra)
+        main.save_new_riddle(extra)
+        main.submitted_questions.pop()
+        main.save_removed_riddle(extra["id"])
+    return run
+
+
+def bench_riddle_load(riddles):
+    reset_state(riddles=riddles)
+    main.save_all_riddles()
+
+    def run():
+        main.load_all_data()
+    return run
+
+
+def bench_leaderboard(users):
+    reset_state(users=users)
+
+    def run():
+        interaction = FakeInteraction(FakeUser(1), main.client)
+        asyncio.run(main.leaderboard.callback(interaction))
+    return run
+
+
+def bench_save_all_scores(users):
+    reset_state(users=users)
+    return main.save_all_scores
+
+
+def bench_sqlite_save_scores(users):
+    # One guess worth of score changes through the SQLite backend, including the commit
+    reset_state(users=users)
+    store = sqlite_store.SQLiteStore(os.path.join(WORK_DIR, f"bench-{users}.db"))
+    atexit.register(store.close)
+    main.store = store
+    main.save_all_scores()
+    store.flush()
+    main.store = None
+    user_id = next(iter(main.scores))
+
+    def run():
+        main.store = store
+        try:
+            main.scores[user_id] += 1
+            main.save_all_scores([user_id])
+            store.flush()
+        finally:
+            main.store = None
+    return run
+
+
+def bench_reveal(users):
+    rng = reset_state(users=users, riddles=10)
+    snapshot = dict(main.streaks)
+    all_ids = list(main.scores)
+    solvers = rng.sample(all_ids, max(1, len(all_ids) // 100))
+    guessers = rng.sample(all_ids, max(1, len(all_ids) // 20))
+
+    def run():
+        main.streaks = dict(snapshot)
+        rnd = main.new_round(main.submitted_questions[0], "Benchmark", BENCH_CHANNEL_ID)
+        main.activate_round(rnd)
+        rnd.correct_users = set(solvers)
+        rnd.guess_attempts = {uid: 1 for uid in guessers}
+        asyncio.run(main.reveal_riddle_answer())
+    return run
+
+
+def _write_sources(users):
+    # Users plus a tenth as many riddles, saved as the JSON backend's files
+    reset_state(users=users, riddles=max(1, users // 10))
+    main.save_all_scores()
+    main.save_all_riddles()
+    main.last_snapshot_sources = None
+
+
+def bench_startup_json(users):
+    _write_sources(users)
+
+    def run():
+        main.load_all_data()
+        main.load_round_state()
+    return run
+
+
+def bench_startup_snapshot(users):
+    _write_sources(users)
+    main.save_snapshot()
+
+    def run():
+        if not main.load_snapshot():
+            raise RuntimeError("snapshot was not used")
+        main.load_round_state()
+    return run
+
+
+BENCHMARKS = [
+    ("answer_match", USER_SCALES, bench_answer_match),
+    ("pick_next_riddle", RIDDLE_SCALES, bench_pick_next_riddle),
+    ("duplicate_check", RIDDLE_SCALES, bench_duplicate_check),
+    ("riddle_persist", RIDDLE_SCALES, bench_riddle_persist),
+    ("riddle_load", RIDDLE_SCALES, bench_riddle_load),
+    ("leaderboard", USER_SCALES, bench_leaderboard),
+    ("save_all_scores", USER_SCALES, bench_save_all_scores),
+    ("sqlite_save_scores", USER_SCALES, bench_sqlite_save_scores),
+    ("reveal", USER_SCALES, bench_reveal),
+    ("startup_json", USER_SCALES, bench_startup_json),
+    ("startup_snapshot", USER_SCALES, bench_startup_snapshot),
+]
+
+
+def time_it(func, repeat):
+    # Like timeit, keep the cyclic GC out of the measurement so that garbage left
+    # by the data setup does not land in whichever benchmark happens to run next
+    samples = []
+    for _ in range(repeat):
+        gc.collect()
+        gc.disable()
+        try:
+            start = time.perf_counter()
+            func()
+            samples.append(time.perf_counter() - start)
+        finally:
+            gc.enable()
+    return min(samples), statistics.median(samples)
+
+
+def run_benchmarks(selected, max_users, max_riddles, repeat):
+    results = {}
+    for name, scales, factory in BENCHMARKS:
+        if selected and name not in selected:
+            continue
+        for scale in scales:
+            limit = max_users if scales is USER_SCALES else max_riddles
+            if limit and scale > limit:
+                continue
+            func = factory(scale)
+            # One repeat is enough to get a stable number at the largest scales
+            best, median = time_it(func, repeat if scale <= 10_000 else 1)
+            key = f"{name}@{scale}"
+            results[key] = {"min": round(best, 6), "median": round(median, 6)}
+            print(f"{key:<32} min {best * 1000:10.2f} ms   median {median * 1000:10.2f} ms")
+    return results
+
+
+def retime(key, repeat):
+    # Time one benchmark ("name@scale") again, for confirming a regression
+    name, scale = key.split("@")
+    factory = next(factory for bench_name, _, factory in BENCHMARKS if bench_name == name)
+    best, _ = time_it(factory(int(scale)), repeat if int(scale) <= 10_000 else 1)
+    return best
+
+
+def compare(results, baseline, threshold, min_delta):
+    regressions = []
+    for key, result in results.items():
+        base = baseline.get(key)
+        if not base:
+            print(f"{key:<32} no baseline")
+            continue
+        current = result["min"]
+        previous = base["min"]
+        if current > previous * (1 + threshold) and current - previous > min_delta:
+            regressions.append((key, previous, current))
+    return regressions
+
+
+def main_cli():
+    parser = argparse.ArgumentParser(description="Benchmark the riddle bot's hot paths.")
+    parser.add_argument("benchmarks", nargs="*", help="Only run these benchmarks (default: all)")
+    parser.add_argument("--max-users", type=int, default=0, help="Skip user scales above this")
+    parser.add_argument("--max-riddles", type=int, default=0, help="Skip riddle scales above this")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--threshold", type=float, default=0.30, help="Allowed slowdown ratio")
+    parser.add_argument("--min-delta", type=float, default=0.002, help="Ignore slowdowns below this many seconds")
+    parser.add_argument("--baseline", default=BASELINE_FILE)
+    parser.add_argument("--update-baseline", action="store_true")
+    args = parser.parse_args()
+
+    results = run_benchmarks(set(args.benchmarks), args.max_users, args.max_riddles, args.repeat)
+
+    baseline = {}
+    if os.path.exists(args.baseline):
+        with open(args.baseline, "r", encoding="utf-8") as f:
+            baseline = json.load(f)
+
+    if args.update_baseline:
+        baseline.update(results)
+        with open(args.baseline, "w", encoding="utf-8") as f:
+            json.dump(dict(sorted(baseline.items())), f, indent=4)
+        print(f"Baseline written to {args.baseline}")
+        return 0
+
+    if not baseline:
+        print(f"No baseline at {args.baseline}; record one on this machine with --update-baseline")
+        return 0
+
+    regressions = compare(results, baseline, args.threshold, args.min_delta)
+    if regressions:
+        # One slow run is often just a busy machine: time those again and keep the better number
+        for key, _, _ in regressions:
+            results[key]["min"] = min(results[key]["min"], round(retime(key, args.repeat), 6))
+        regressions = compare(results, baseline, args.threshold, args.min_delta)
+    for key, previous, current in regressions:
+        print(f"REGRESSION {key}: {previous * 1000:.2f} ms -> {current * 1000:.2f} ms")
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main_cli())
@@ -0,0 +1,81 @@
+import io
+
+# Card drawing, run in CardRenderer's worker processes (see cards.py).
+#
+# Workers are started with spawn, which re-imports the parent's __main__ in each
+# child before anything else. Left alone that would be main.py, i.e. the whole
+# bot; CardRenderer points __main__ at this module while it starts a worker, so a
+# worker imports only this file and Pillow. Keep it free of the bot's modules.
+#
+# Arguments and results are plain data, so they pickle cheaply.
+
+WIDTH = 800
+ROW_HEIGHT = 56
+HEADER_HEIGHT = 72
+PADDING = 24
+BACKGROUND = (32, 34, 37)
+ROW_SHADES = ((43, 45, 49), (49, 51, 56))
+TEXT = (242, 243, 245)
+MUTED = (181, 186, 193)
+GOLD = (240, 178, 50)
+
+
+def _font(size):
+    from PIL import ImageFont
+    for name in ("DejaVuSans-Bold.ttf", "Arial Bold.ttf", "arialbd.ttf"):
+        try:
+            return ImageFont.truetype(name, size)
+        except OSError:
+            continue
+    return ImageFont.load_default()
+
+
+def _plain(text):
+    # The bundled fonts have no emoji glyphs; drop them rather than draw boxes
+    return "".join(ch for ch in str(text) if ord(ch) < 0x2000).strip()
+
+
+def _png(image):
+    # A few flat colours plus anti-aliased text: a 64-colour palette is a fraction of the RGB size
+    out = io.BytesIO()
+    image.quantize(colors=64).save(out, format="PNG", optimize=True)
+    return out.getvalue()
+
+
+def render_leaderboard(title, rows):
+    # rows: [(position, name, score, streak, rank_title, streak_title)]
+    from PIL import Image, ImageDraw
+    height = HEADER_HEIGHT + ROW_HEIGHT * max(1, len(rows)) + PADDING
+    image = Image.new("RGB", (WIDTH, height), BACKGROUND)
+    draw = ImageDraw.Draw(image)
+    big, small = _font(26), _font(18)
+    draw.text((PADDING, PADDING), _plain(title), font=big, fill=GOLD)
+
+    top = HEADER_HEIGHT
+    for i, (position, name, score, streak, rank_title, streak_title) in enumerate(rows):
+        draw.rectangle((PADDING // 2, top, WIDTH - PADDING // 2, top + ROW_HEIGHT - 4), fill=ROW_SHADES[i % 2])
+        draw.text((PADDING, top + 8), f"#{position}", font=big, fill=GOLD if position == 1 else TEXT)
+        draw.text((PADDING + 90, top + 6), _plain(name)[:32], font=small, fill=TEXT)
+        subtitle = _plain(rank_title) + (f" / {_plain(streak_title)}" if streak_title else "")
+        draw.text((PADDING + 90, top + 30), subtitle, font=small, fill=MUTED)
+        draw.text((WIDTH - 260, top + 14), f"{score} pts", font=big, fill=TEXT)
+        draw.text((WIDTH - 110, top + 18), f"streak {streak}", font=small, fill=MUTED)
+        top += ROW_HEIGHT
+    return _png(image)
+
+
+def render_profile(name, score, streak, rank_title, streak_title, position, ranked):
+    from PIL import Image, ImageDraw
+    image = Image.new("RGB", (WIDTH, 220), BACKGROUND)
+    draw = ImageDraw.Draw(image)
+    big, small = _font(34), _font(20)
+    draw.text((PADDING, PADDING), _plain(name)[:32], font=big, fill=GOLD)
+    draw.text((PADDING, 80), _plain(rank_title), font=small, fill=TEXT)
+    if streak_title:
+        draw.text((PADDING, 110), _plain(streak_title), font=small, fill=MUTED)
+    place = f"#{position} of {ranked}" if position else "Unranked"
+    for i, (label, value) in enumerate((("Score", score), ("Streak", streak), ("Place", place))):
+        x = PADDING + i * (WIDTH - 2 * PADDING) // 3
+        draw.text((x, 150), label, font=small, fill=MUTED)
+        draw.text((x, 174), str(value), font=small, fill=TEXT)
+    return _png(image)
@@ -0,0 +1,86 @@
+import asyncio
+import importlib.util
+import multiprocessing
+import sys
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+
+import card_worker
+import metrics
+from card_worker import render_leaderboard, render_profile  # noqa: F401 (the renders main.py passes to get())
+
+# Leaderboard and profile cards: PNG images drawn with Pillow. Off unless CARDS=1
+# (and Pillow, in requirements.txt, is installed); without them replies are text-only.
+#
+# Drawing a card takes tens of milliseconds of pure CPU, so it never runs on the
+# event loop: the render_* functions in card_worker.py run in a small process pool
+# and CardRenderer awaits them.
+# Finished cards are cached by a key that includes the bot's standings version,
+# e.g. ("leaderboard", page, standings_version), so flipping back and forth between
+# pages reuses the PNGs until a score or streak changes. The cache is bounded by total PNG bytes,
+# evicting the least recently used cards; cards for an old standings version are
+# never asked for again and age out first.
+
+AVAILABLE = importlib.util.find_spec("PIL") is not None
+
+# --- On the event loop ---
+
+class CardRenderer:
+    def __init__(self, max_bytes, workers=1):
+        self.max_bytes = max_bytes
+        self.workers = workers
+        self.cards = OrderedDict()    # key -> PNG bytes, least recently used first
+        self.size = 0                 # total bytes in self.cards
+        self.pending = {}             # key -> future of a render in flight, shared by concurrent requests
+        self._pool = None
+
+    def _executor(self):
+        if self._pool is None:
+            # spawn, not fork: a fork would copy the bot's threads and sockets
+            self._pool = ProcessPoolExecutor(max_workers=self.workers,
+                                             mp_context=multiprocessing.get_context("spawn"))
+        return self._pool
+
+    def _submit(self, render, *args):
+        # The pool starts its workers inside submit(), and spawn has each one import the
+        # parent's __main__ first. Point that at card_worker for the call, so workers never
+        # run main.py. Only this thread starts workers, and submit() does not yield.
+        bot_main = sys.modules["__main__"]
+        sys.modules["__main__"] = card_worker
+        try:
+            return asyncio.get_running_loop().run_in_executor(self._executor(), render, *args)
+        finally:
+            sys.modules["__main__"] = bot_main
+
+    async def get(self, key, render, *args):
+        # The PNG for key, rendering it as render(*args) in the pool on a miss
+        png = self.cards.get(key)
+        metrics.record_cache("card", png is not None)
+        if png is not None:
+            self.cards.move_to_end(key)
+            return png
+        future = self.pending.get(key)
+        if future is None:
+            future = self._submit(render, *args)
+            self.pending[key] = future
+            future.add_done_callback(lambda done: self._finished(key, done))
+        # Shielded so one cancelled request does not cancel the render for the others
+        return await asyncio.shield(future)
+
+    def _finished(self, key, future):
+        self.pending.pop(key, None)
+        if future.cancelled() or future.exception() is not None:
+            return
+        png = future.result()
+        if len(png) > self.max_bytes:
+            return
+        self.cards[key] = png
+        self.size += len(png)
+        while self.size > self.max_bytes:
+            _, evicted = self.cards.popitem(last=False)
+            self.size -= len(evicted)
+
+    def close(self):
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
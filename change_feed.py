@@ -0,0 +1,212 @@
+import asyncio
+import json
+import os
+import socket
+import uuid
+
+import asyncpg
+
+import db
+import metrics
+
+# Cross-process cache invalidation over Postgres LISTEN/NOTIFY.
+#
+# Every worker keeps scores, streaks and the riddle catalog in memory. When one
+# worker changes them it publishes a compact NOTIFY payload, and every other
+# worker applies the change to its own copy instead of reloading everything.
+#
+# Payloads are JSON objects with a short type tag:
+#   {"w": worker, "t": "u", "u": [[user_id, score, streak], ...]}   users changed
+#   {"w": worker, "t": "r+", "r": {riddle}}                           riddle added
+#   {"w": worker, "t": "r-", "id": "12"}                              riddle removed
+#   {"w": worker, "t": "reload"}                                      reload from storage
+# Workers ignore their own messages (matched on "w").
+
+CHANGE_CHANNEL = os.getenv("CHANGE_CHANNEL", "riddle_changes")
+WORKER_ID = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:6]}"
+
+MAX_PAYLOAD_BYTES = 7900        # Postgres rejects NOTIFY payloads of 8000 bytes or more
+RECONNECT_DELAY = 5
+
+published = metrics.Counter("riddle_change_feed_published_total", "NOTIFY messages sent", ("type",))
+received = metrics.Counter("riddle_change_feed_received_total", "NOTIFY messages applied", ("type",))
+
+_handler = None             # Called with (type, message dict) for each change from another worker
+_outbox = None              # asyncio.Queue of messages waiting to be published
+_publisher_task = None
+_listener_task = None
+
+
+def set_handler(handler):
+    global _handler
+    _handler = handler
+
+
+def is_running():
+    return _publisher_task is not None and not _publisher_task.done()
+
+
+def _encode(message):
+    message["w"] = WORKER_ID
+    return json.dumps(message, ensure_ascii=False, separators=(",", ":"))
+
+
+def _queue(message):
+    if _outbox is not None:
+        _outbox.put_nowait(message)
+
+
+# --- Publishing (safe to call from synchronous code on the event loop) ---
+
+def publish_users(rows):
+    # rows: iterable of (user_id, score, streak)
+    if _outbox is None:
+        return
+    rows = [[str(uid), score, streak] for uid, score, streak in rows]
+    if rows:
+        _queue({"t": "u", "u": rows})
+
+
+def publish_riddle_added(riddle):
+    _queue({"t": "r+", "r": riddle})
+
+
+def publish_riddle_removed(riddle_id):
+    _queue({"t": "r-", "id": str(riddle_id)})
+
+
+def publish_reload():
+    _queue({"t": "reload"})
+
+
+def _chunk_user_message(message):
+    # Split one large users message into payloads under the NOTIFY size limit
+    chunk = []
+    size = 64
+    for row in message["u"]:
+        row_size = len(json.dumps(row)) + 1
+        if chunk and size + row_size > MAX_PAYLOAD_BYTES:
+            yield _encode({"t": "u", "u": chunk})
+            chunk = []
+            size = 64
+        chunk.append(row)
+        size += row_size
+    if chunk:
+        yield _encode({"t": "u", "u": chunk})
+
+
+def _payloads(messages):
+    # Merge queued user updates (last value wins) and keep riddle changes in order
+    users = {}
+    for message in messages:
+        if message["t"] == "u":
+            for row in message["u"]:
+                users[row[0]] = row
+            continue
+        payload = _encode(message)
+        if len(payload.encode("utf-8")) > MAX_PAYLOAD_BYTES:
+            payload = _encode({"t": "reload"})  # Too big to inline; let workers re-read storage
+        yield message["t"], payload
+    if users:
+        for payload in _chunk_user_message({"u": list(users.values())}):
+            yield "u", payload
+
+
+async def _publish_loop():
+    while True:
+        messages = [await _outbox.get()]
+        while not _outbox.empty():
+            messages.append(_outbox.get_nowait())
+        try:
+            async with db.acquire() as conn:
+                for kind, payload in _payloads(messages):
+                    await db.timed_query("pg_notify", conn.execute("SELECT pg_notify($1, $2)", CHANGE_CHANNEL, payload))
+                    published.inc(kind)
+        except Exception as e:
+            print(f"Failed to publish change notification: {e}")
+
+
+# --- Listening ---
+
+def _on_notification(conn, pid, channel, payload):
+    try:
+        message = json.loads(payload)
+    except json.JSONDecodeError:
+        print(f"Ignoring malformed change notification: {payload[:100]}")
+        return
+    if message.get("w") == WORKER_ID or _handler is None:
+        return
+    kind = message.get("t")
+    try:
+        _handler(kind, message)
+        received.inc(kind)
+    except Exception as e:
+        print(f"Failed to apply change notification {kind}: {e}")
+
+
+async def _listen_loop():
+    # A dedicated connection outside the pool: pooled connections run UNLISTEN * on release
+    was_listening = False
+    while True:
+        conn = None
+        try:
+            conn = await asyncpg.connect(dsn=os.getenv("DATABASE_URL"))
+            closed = asyncio.Event()
+            conn.add_termination_listener(lambda c: closed.set())
+            await conn.add_listener(CHANGE_CHANNEL, _on_notification)
+            if was_listening and _handler is not None:
+                # Anything published while we were disconnected is lost; resync from storage
+                _handler("reload", {"t": "reload"})
+            was_listening = True
+            print(f"Listening for cache changes on '{CHANGE_CHANNEL}' as {WORKER_ID}")
+            await closed.wait()
+            print("Change feed connection lost; reconnecting")
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            print(f"Change feed listener error: {e}")
+        finally:
+            if conn is not None and not conn.is_closed():
+                await conn.close()
+        await asyncio.sleep(RECONNECT_DELAY)
+
+
+async def start():
+    global _outbox, _publisher_task, _listener_task
+    if is_running():
+        return
+    _outbox = asyncio.Queue()
+    _publisher_task = asyncio.create_task(_publish_loop())
+    _listener_task = asyncio.create_task(_listen_loop())
+
+
+async def stop():
+    global _outbox, _publisher_task, _listener_task
+    for task in (_publisher_task, _listener_task):
+        if task is not None:
+            task.cancel()
+    _outbox = _publisher_task = _listener_task = None
+
+
+async def _self_test():
+    # python change_feed.py -- round-trips a notification through DATABASE_URL
+    await db.create_db_pool()
+    got = asyncio.Event()
+    seen = []
+
+    def on_payload(conn, pid, channel, payload):
+        seen.append(json.loads(payload))
+        got.set()
+
+    listener = await asyncpg.connect(dsn=os.getenv("DATABASE_URL"))
+    await listener.add_listener(CHANGE_CHANNEL, on_payload)
+    await start()
+    publish_users([("123", 4, 2)])
+    await asyncio.wait_for(got.wait(), timeout=10)
+    await stop()
+    await listener.close()
+    print(f"OK: received {seen[0]}")
+
+
+if __name__ == "__main__":
+    asyncio.run(_self_test())
@@ -1,49 +1,119 @@
-pip install asyncpg
+import asyncio
+import contextlib
+import os
+import time
 
 import asyncpg
-import os
+
+import metrics
 
 db_pool = None
 
+# Pool tuning, all optional
+DB_POOL_MIN_SIZE = int(os.getenv("DB_POOL_MIN_SIZE") or 2)
+DB_POOL_MAX_SIZE = int(os.getenv("DB_POOL_MAX_SIZE") or 10)
+DB_COMMAND_TIMEOUT = float(os.getenv("DB_COMMAND_TIMEOUT") or 10)       # seconds per query
+DB_ACQUIRE_TIMEOUT = float(os.getenv("DB_ACQUIRE_TIMEOUT") or 5)        # seconds to wait for a free connection
+# asyncpg prepares every parameterized query on first use and keeps this many per
+# connection, so the hot statements below are parsed once per connection. Set 0
+# behind pgbouncer in transaction mode, where prepared statements don't survive.
+DB_STATEMENT_CACHE_SIZE = int(os.getenv("DB_STATEMENT_CACHE_SIZE") or 100)
+
+UPSERT_USER_SQL = """
+    INSERT INTO users (user_id, score, streak, created_at)
+    VALUES ($1, $2, $3, NOW())
+    ON CONFLICT (user_id) DO UPDATE
+    SET score = EXCLUDED.score,
+        streak = EXCLUDED.streak
+"""
+
+GET_USER_SQL = "SELECT * FROM users WHERE user_id = $1"
+
+INSERT_SUBMITTED_QUESTION_SQL = """
+    INSERT INTO user_submitted_questions (user_id, question, answer, created_at)
+    VALUES ($1, $2, $3, NOW())
+"""
+
+query_latency = metrics.Histogram(
+    "riddle_db_query_seconds", "Database query latency by query name", ("query",))
+pool_wait = metrics.Histogram(
+    "riddle_db_pool_wait_seconds", "Time spent waiting for a pooled database connection")
+pool_acquire_timeouts = metrics.Counter(
+    "riddle_db_pool_acquire_timeouts_total", "Pool acquires that gave up because every connection was busy")
+metrics.Gauge("riddle_db_pool_size", "Open pooled connections",
+              fn=lambda: db_pool.get_size() if db_pool else 0)
+metrics.Gauge("riddle_db_pool_idle", "Idle pooled connections",
+              fn=lambda: db_pool.get_idle_size() if db_pool else 0)
+
+
+@contextlib.asynccontextmanager
+async def acquire():
+    # Like db_pool.acquire(), but records pool wait time and fails loudly when the pool is exhausted
+    start = time.perf_counter()
+    try:
+        conn = await db_pool.acquire(timeout=DB_ACQUIRE_TIMEOUT)
+    except asyncio.TimeoutError:
+        pool_acquire_timeouts.inc()
+        print(f"Database pool exhausted: no free connection after {DB_ACQUIRE_TIMEOUT}s "
+              f"({db_pool.get_size()}/{DB_POOL_MAX_SIZE} open)")
+        raise
+    pool_wait.observe(time.perf_counter() - start)
+    try:
+        yield conn
+    finally:
+        await db_pool.release(conn)
+
+
+async def timed_query(name, awaitable):
+    start = time.perf_counter()
+    try:
+        return await awaitable
+    finally:
+        query_latency.observe(time.perf_counter() - start, name)
+
+
 async def load_all_user_scores():
     global scores, streaks
     scores = {}
     streaks = {}
-    async with db_pool.acquire() as conn:
-        rows = await conn.fetch("SELECT user_id, score, streak FROM users")
+    async with acquire() as conn:
+        rows = await timed_query("load_all_user_scores", conn.fetch("SELECT user_id, score, streak FROM users"))
         for row in rows:
             uid = str(row["user_id"])
             scores[uid] = row["score"]
             streaks[uid] = row["streak"]
+    return scores, streaks
 
 
 async def create_db_pool():
     global db_pool
-    db_pool = await asyncpg.create_pool(dsn=os.getenv("DATABASE_URL"))
+    if db_pool is not None:
+        return db_pool  # on_ready fires again on every reconnect
+    db_pool = await asyncpg.create_pool(
+        dsn=os.getenv("DATABASE_URL"),
+        min_size=DB_POOL_MIN_SIZE,
+        max_size=DB_POOL_MAX_SIZE,
+        command_timeout=DB_COMMAND_TIMEOUT,
+        statement_cache_size=DB_STATEMENT_CACHE_SIZE,
+    )
+    return db_pool
 
 async def upsert_user(user_id: int, score: int, streak: int):
-    async with db_pool.acquire() as conn:
-        await conn.execute("""
-            INSERT INTO users (user_id, score, streak, created_at)
-            VALUES ($1, $2, $3, NOW())
-            ON CONFLICT (user_id) DO UPDATE
-            SET score = EXCLUDED.score,
-                streak = EXCLUDED.streak
-        """, user_id, score, streak)
+    async with acquire() as conn:
+        await timed_query("upsert_user", conn.execute(UPSERT_USER_SQL, user_id, score, streak))
 
 async def get_user(user_id: int):
-    async with db_pool.acquire() as conn:
-        return await conn.fetchrow("SELECT * FROM users WHERE user_id = $1", user_id)
+    async with acquire() as conn:
+        return await timed_query("get_user", conn.fetchrow(GET_USER_SQL, user_id))
 
 async def insert_submitted_question(user_id: int, question: str, answer: str):
-    async with db_pool.acquire() as conn:
-        await conn.execute("""
-            INSERT INTO user_submitted_questions (user_id, question, answer, created_at)
-            VALUES ($1, $2, $3, NOW())
-        """, user_id, question, answer)
+    async with acquire() as conn:
+        await timed_query("insert_submitted_question",
+                          conn.execute(INSERT_SUBMITTED_QUESTION_SQL, user_id, question, answer))
 
 async def get_all_submitted_questions():
-    async with db_pool.acquire() as conn:
-        return await conn.fetch("SELECT * FROM user_submitted_questions")
+    async with acquire() as conn:
+        return await timed_query("get_all_submitted_questions",
+                                 conn.fetch("SELECT * FROM user_submitted_questions"))
 
 # Add more functions as needed...
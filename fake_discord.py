@@ -0,0 +1,136 @@
+import itertools
+
+# Minimal stand-ins for the discord.py objects the bot touches, so handlers in
+# main.py can be driven offline (benchmarks, local load testing). Every outbound
+# call is counted instead of hitting the Discord API.
+
+_message_ids = itertools.count(1)
+
+
+class CallCounter:
+    def __init__(self):
+        self.counts = {}
+
+    def hit(self, name):
+        self.counts[name] = self.counts.get(name, 0) + 1
+
+    def total(self):
+        return sum(self.counts.values())
+
+    def reset(self):
+        self.counts.clear()
+
+
+class FakeUser:
+    def __init__(self, user_id, name=None, bot=False, calls=None):
+        self.id = int(user_id)
+        self.name = name or f"user{user_id}"
+        self.display_name = self.name
+        self.mention = f"<@{self.id}>"
+        self.bot = bot
+        self.calls = calls
+
+    async def send(self, *args, **kwargs):
+        if self.calls:
+            self.calls.hit("user.send")
+
+
+class FakeMessage:
+    def __init__(self, channel, author, content, calls=None):
+        self.id = next(_message_ids)
+        self.channel = channel
+        self.author = author
+        self.content = content
+        self.calls = calls
+
+    async def delete(self):
+        if self.calls:
+            self.calls.hit("message.delete")
+
+
+class FakeChannel:
+    def __init__(self, channel_id, calls=None):
+        self.id = int(channel_id)
+        self.calls = calls or CallCounter()
+        self.sent = []
+        self.keep_history = False
+
+    async def send(self, content=None, **kwargs):
+        self.calls.hit("channel.send")
+        if self.keep_history:
+            self.sent.append((content, kwargs))
+        return FakeMessage(self, None, content, self.calls)
+
+
+class FakeResponse:
+    def __init__(self, calls):
+        self.calls = calls
+        self._done = False
+
+    def is_done(self):
+        return self._done
+
+    async def defer(self, **kwargs):
+        self.calls.hit("response.defer")
+        self._done = True
+
+    async def send_message(self, *args, **kwargs):
+        self.calls.hit("response.send_message")
+        self._done = True
+
+    async def edit_message(self, *args, **kwargs):
+        self.calls.hit("response.edit_message")
+        self._done = True
+
+
+class FakeFollowup:
+    def __init__(self, calls):
+        self.calls = calls
+
+    async def send(self, *args, **kwargs):
+        self.calls.hit("followup.send")
+
+
+class FakeInteraction:
+    def __init__(self, user, client, channel=None):
+        self.user = user
+        self.client = client
+        self.channel = channel
+        self.channel_id = channel.id if channel else None
+        self.guild = None
+        self.calls = client.calls
+        self.response = FakeResponse(self.calls)
+        self.followup = FakeFollowup(self.calls)
+
+
+class FakeClient:
+    def __init__(self, channel_id=0):
+        self.calls = CallCounter()
+        self.channel = FakeChannel(channel_id, self.calls)
+        self.channels = {self.channel.id: self.channel}
+        self.users = {}
+        self.user = FakeUser(1, "Riddle of the Day Bot", bot=True)
+
+    def _user(self, user_id):
+        user = self.users.get(int(user_id))
+        if user is None:
+            user = FakeUser(user_id, calls=self.calls)
+            self.users[int(user_id)] = user
+        return user
+
+    def get_user(self, user_id):
+        return self.users.get(int(user_id))
+
+    async def fetch_user(self, user_id):
+        self.calls.hit("fetch_user")
+        return self._user(user_id)
+
+    def add_channel(self, channel_id):
+        channel = self.channels.get(int(channel_id))
+        if channel is None:
+            channel = FakeChannel(channel_id, self.calls)
+            self.channels[channel.id] = channel
+        return channel
+
+    def get_channel(self, channel_id):
+        return self.channels.get(int(channel_id))
@@ -0,0 +1,131 @@
+import base64
+import heapq
+import struct
+import time
+from array import array
+
+# Per-riddle guess analytics.
+#
+# Each guess is stored as a fixed-size 9-byte record (user index, milliseconds
+# since the round started, correct flag) in a ring buffer that grows as guesses
+# come in, up to RING_CAPACITY records, so a quiet round costs a few bytes rather
+# than the full ring and no per-guess objects are kept. The aggregates /riddlestats shows are kept up to date as guesses come
+# in instead of being recomputed from the records:
+#   - guesses, guessers and solvers, for the solve rate
+#   - a running median of time-to-solve (two heaps)
+#   - a histogram of guesses per user
+# If a round ever exceeds RING_CAPACITY guesses the oldest records are
+# overwritten; the aggregates stay exact.
+
+RECORD = struct.Struct("<IIB")      # user index, ms since round start, correct
+RING_CAPACITY = 65536
+
+
+class RoundStats:
+    def __init__(self, riddle_id, started_at=None, capacity=RING_CAPACITY):
+        self.riddle_id = str(riddle_id)
+        self.started_at = time.time() if started_at is None else started_at
+        self.capacity = capacity
+        self.ring = bytearray()         # Grows to RECORD.size * capacity, then wraps
+        self.recorded = 0               # Guesses ever recorded; the ring holds the last `capacity`
+
+        self.user_ids = []              # user index -> user_id
+        self.user_index = {}            # user_id -> user index
+        self.guess_counts = array("H")  # user index -> guesses made
+        self.histogram = array("I")     # n -> users who made exactly n guesses
+        self.solvers = 0
+        self.first_solve_ms = None
+        self._low = []                  # Max-heap (negated) of the smaller half of solve times
+        self._high = []                 # Min-heap of the larger half
+
+    def record(self, user_id, correct, now=None):
+        now = time.time() if now is None else now
+        offset_ms = max(0, int((now - self.started_at) * 1000))
+        index = self.user_index.get(user_id)
+        if index is None:
+            index = len(self.user_ids)
+            self.user_index[user_id] = index
+            self.user_ids.append(user_id)
+            self.guess_counts.append(0)
+        self._apply(index, offset_ms, correct)
+        if self.recorded < self.capacity:
+            self.ring += RECORD.pack(index, offset_ms, int(correct))
+        else:
+            RECORD.pack_into(self.ring, (self.recorded % self.capacity) * RECORD.size, index, offset_ms, int(correct))
+        self.recorded += 1
+
+    def _apply(self, index, offset_ms, correct):
+        count = self.guess_counts[index]
+        if count:
+            self.histogram[count] -= 1
+        count += 1
+        self.guess_counts[index] = count
+        while len(self.histogram) <= count:
+            self.histogram.append(0)
+        self.histogram[count] += 1
+
+        if correct:
+            self.solvers += 1
+            if self.first_solve_ms is None or offset_ms < self.first_solve_ms:
+                self.first_solve_ms = offset_ms
+            heapq.heappush(self._low, -offset_ms)
+            heapq.heappush(self._high, -heapq.heappop(self._low))
+            if len(self._high) > len(self._low):
+                heapq.heappush(self._low, -heapq.heappop(self._high))
+
+    def median_solve_ms(self):
+        if not self._low:
+            return None
+        if len(self._low) > len(self._high):
+            return -self._low[0]
+        return (-self._low[0] + self._high[0]) / 2
+
+    def records(self):
+        # Yield (user_id, ms offset, correct) for the guesses still in the ring, oldest first
+        start = max(0, self.recorded - self.capacity)
+        for n in range(start, self.recorded):
+            index, offset_ms, correct = RECORD.unpack_from(self.ring, (n % self.capacity) * RECORD.size)
+            yield self.user_ids[index], offset_ms, bool(correct)
+
+    def summary(self):
+        guessers = len(self.user_ids)
+        median = self.median_solve_ms()
+        return {
+            "riddle_id": self.riddle_id,
+            "guesses": self.recorded,
+            "guessers": guessers,
+            "solvers": self.solvers,
+            "solve_rate": round(self.solvers / guessers, 4) if guessers else 0.0,
+            "median_solve_seconds": round(median / 1000, 1) if median is not None else None,
+            "first_solve_seconds": round(self.first_solve_ms / 1000, 1) if self.first_solve_ms is not None else None,
+            "guesses_per_user": {n: users for n, users in enumerate(self.histogram) if n and users},
+        }
+
+    # --- Round checkpoint (see save_round_state in main.py) ---
+
+    def to_dict(self):
+        return {
+            "riddle_id": self.riddle_id,
+            "started_at": self.started_at,
+            "capacity": self.capacity,
+            "user_ids": self.user_ids,
+            "recorded": self.recorded,
+            "ring": base64.b64encode(self.ring).decode("ascii"),
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        # Rebuilds the aggregates by replaying the ring, so guesses it already
+        # overwrote are missing from a restored round's aggregates
+        stats = cls(data["riddle_id"], started_at=data["started_at"], capacity=data.get("capacity", RING_CAPACITY))
+        stats.user_ids = list(data["user_ids"])
+        stats.user_index = {uid: i for i, uid in enumerate(stats.user_ids)}
+        stats.guess_counts = array("H", [0] * len(stats.user_ids))
+        stats.ring = bytearray(base64.b64decode(data["ring"]))
+        recorded = data["recorded"]
+        start = max(0, recorded - stats.capacity)
+        for n in range(start, recorded):
+            index, offset_ms, correct = RECORD.unpack_from(stats.ring, (n % stats.capacity) * RECORD.size)
+            stats._apply(index, offset_ms, correct)
+        stats.recorded = recorded
+        return stats
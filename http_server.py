@@ -0,0 +1,132 @@
+import asyncio
+import json
+from urllib.parse import urlsplit, parse_qs
+
+# Tiny HTTP/1.1 server that runs inside the bot's own asyncio loop. Handlers are
+# registered per path and must be cheap: they run on the event loop and should
+# only read in-memory state.
+#
+# A handler takes (path, query, headers) and returns (status, headers, body).
+# Header names in the request headers are lower-cased.
+
+ROUTES = {}          # exact path -> handler
+PREFIX_ROUTES = []   # (path prefix, handler), checked in order when no exact match
+
+STATUS_TEXT = {
+    200: "OK",
+    304: "Not Modified",
+    400: "Bad Request",
+    404: "Not Found",
+    405: "Method Not Allowed",
+    500: "Internal Server Error",
+}
+
+MAX_HEADER_LINES = 100
+
+_server = None
+
+
+def route(path, prefix=False):
+    def decorator(handler):
+        if prefix:
+            PREFIX_ROUTES.append((path, handler))
+        else:
+            ROUTES[path] = handler
+        return handler
+    return decorator
+
+
+def _find_handler(path):
+    handler = ROUTES.get(path)
+    if handler:
+        return handler
+    for prefix, prefix_handler in PREFIX_ROUTES:
+        if path.startswith(prefix):
+            return prefix_handler
+    return None
+
+
+def not_modified(request_headers, etag):
+    # A 304 response if the client's If-None-Match already names etag, else None
+    value = request_headers.get("if-none-match")
+    if not value:
+        return None
+    tags = [tag.strip() for tag in value.split(",")]
+    if "*" in tags or any(tag.removeprefix("W/") == etag for tag in tags):
+        return 304, {"ETag": etag, "Cache-Control": "no-cache"}, ""
+    return None
+
+
+def json_response(payload, etag=None, status=200):
+    headers = {"Content-Type": "application/json; charset=utf-8"}
+    if etag is not None:
+        headers["ETag"] = etag
+        headers["Cache-Control"] = "no-cache"  # Revalidate every time; a match costs a 304
+    return status, headers, json.dumps(payload, ensure_ascii=False, separators=(",", ":"))
+
+
+async def _write_response(writer, status, headers, body, head_only=False):
+    if isinstance(body, str):
+        body = body.encode("utf-8")
+    lines = [f"HTTP/1.1 {status} {STATUS_TEXT.get(status, 'OK')}"]
+    headers = dict(headers)
+    headers["Content-Length"] = str(len(body))
+    headers["Connection"] = "close"
+    for key, value in headers.items():
+        lines.append(f"{key}: {value}")
+    writer.write(("\r\n".join(lines) + "\r\n\r\n").encode("latin-1"))
+    if body and not head_only and status != 304:
+        writer.write(body)
+    await writer.drain()
+
+
+async def _handle_connection(reader, writer):
+    try:
+        request_line = await asyncio.wait_for(reader.readline(), timeout=10)
+        parts = request_line.decode("latin-1").split()
+        if len(parts) < 2:
+            await _write_response(writer, 400, {}, "")
+            return
+        method, target = parts[0], parts[1]
+
+        headers = {}
+        for _ in range(MAX_HEADER_LINES):
+            line = await asyncio.wait_for(reader.readline(), timeout=10)
+            if line in (b"\r\n", b"\n", b""):
+                break
+            key, _, value = line.decode("latin-1").partition(":")
+            headers[key.strip().lower()] = value.strip()
+
+        if method not in ("GET", "HEAD"):
+            await _write_response(writer, 405, {"Allow": "GET, HEAD"}, "")
+            return
+
+        url = urlsplit(target)
+        handler = _find_handler(url.path)
+        if handler is None:
+            await _write_response(writer, 404, {"Content-Type": "text/plain"}, "Not found\n")
+            return
+
+        query = {key: values[-1] for key, values in parse_qs(url.query).items()}
+        try:
+            status, response_headers, body = handler(url.path, query, headers)
+        except Exception as e:
+            print(f"HTTP handler error for {url.path}: {e}")
+            status, response_headers, body = 500, {"Content-Type": "text/plain"}, "Internal error\n"
+        await _write_response(writer, status, response_headers, body, head_only=(method == "HEAD"))
+    except (asyncio.TimeoutError, ConnectionError):
+        pass
+    finally:
+        try:
+            writer.close()
+        except Exception:
+            pass
+
+
+async def start_http_server(host, port):
+    global _server
+    if _server is not None:
+        return _server  # Already running (e.g. on_ready fired again after a reconnect)
+    _server = await asyncio.start_server(_handle_connection, host, port)
+    print(f"HTTP endpoint listening on http://{host}:{port}")
+    return _server
@@ -0,0 +1,261 @@
+import asyncio
+import json
+import os
+import time
+import zlib
+from datetime import datetime, timezone
+
+import asyncpg
+
+import change_feed
+import db
+import metrics
+
+# Leader election for scheduled jobs.
+#
+# Every bot process starts the same scheduled jobs, but only the process holding
+# the lease actually runs them. Standbys retry the lease every
+# LEASE_RETRY_SECONDS, so if the leader dies another process takes over within
+# a few seconds.
+#
+#   LEADER_LEASE=postgres  pg_try_advisory_lock on a dedicated connection; the lock
+#                          disappears with the connection, so a crashed leader frees it
+#   LEADER_LEASE=file      flock() on LEASE_FILE, for several processes on one host
+#   LEADER_LEASE=none      no coordination: every job always runs (single process)
+#
+# Each run is also claimed per (job, slot) in the job run log, so a job that
+# already finished for today's slot is not repeated after a failover. The claim
+# reads the log again first (the file log from where it last stopped), since
+# another worker may have written to it while this one was on standby.
+
+LEADER_LEASE = os.getenv("LEADER_LEASE") or ("postgres" if os.getenv("DATABASE_URL") else "file")
+LEASE_NAME = os.getenv("LEASE_NAME", "riddle-scheduler")
+LEASE_FILE = os.getenv("LEASE_FILE", "scheduler.lock")
+LEASE_RETRY_SECONDS = float(os.getenv("LEASE_RETRY_SECONDS") or 5)
+JOB_RUNS_FILE = "job_runs.jsonl"
+# A run still marked 'running' is assumed to be in progress on its worker for this
+# long; only after that may another leader take it over
+JOB_TAKEOVER_SECONDS = float(os.getenv("JOB_TAKEOVER_SECONDS") or 600)
+
+WORKER_ID = change_feed.WORKER_ID
+
+JOB_RUNS_SCHEMA = """
+    CREATE TABLE IF NOT EXISTS job_runs (
+        job TEXT NOT NULL,
+        slot TEXT NOT NULL,
+        worker TEXT NOT NULL,
+        status TEXT NOT NULL,
+        started_at TIMESTAMPTZ NOT NULL,
+        finished_at TIMESTAMPTZ,
+        error TEXT,
+        PRIMARY KEY (job, slot)
+    )
+"""
+
+# A run left 'running' by a worker that lost the lease is taken over once it is
+# JOB_TAKEOVER_SECONDS old; a finished or failed run for the same slot is not repeated.
+CLAIM_JOB_SQL = """
+    INSERT INTO job_runs (job, slot, worker, status, started_at)
+    VALUES ($1, $2, $3, 'running', NOW())
+    ON CONFLICT (job, slot) DO UPDATE
+    SET worker = EXCLUDED.worker, status = 'running', started_at = NOW(), finished_at = NULL, error = NULL
+    WHERE job_runs.status = 'running' AND job_runs.worker <> EXCLUDED.worker
+      AND job_runs.started_at < NOW() - make_interval(secs => $4)
+    RETURNING job
+"""
+
+FINISH_JOB_SQL = """
+    UPDATE job_runs SET status = $4, finished_at = NOW(), error = $5
+    WHERE job = $1 AND slot = $2 AND worker = $3
+"""
+
+is_leader_gauge = metrics.Gauge("riddle_scheduler_is_leader", "1 while this process holds the scheduler lease")
+job_runs_total = metrics.Counter("riddle_job_runs_total", "Scheduled job runs by outcome", ("job", "status"))
+
+
+class PostgresLease:
+    def __init__(self, name):
+        self.key = zlib.crc32(name.encode("utf-8"))  # advisory lock keys are bigints
+        self.conn = None
+        self.held = False
+
+    async def refresh(self):
+        if self.held:
+            try:
+                await self.conn.fetchval("SELECT 1")
+                return True
+            except Exception as e:
+                print(f"Lost scheduler lease connection: {e}")
+                await self.release()
+        try:
+            if self.conn is None or self.conn.is_closed():
+                # Not a pooled connection: the pool unlocks advisory locks on release
+                self.conn = await asyncpg.connect(dsn=os.getenv("DATABASE_URL"))
+                self.conn.add_termination_listener(self._on_terminated)
+            self.held = await self.conn.fetchval("SELECT pg_try_advisory_lock($1)", self.key)
+        except Exception as e:
+            print(f"Failed to acquire scheduler lease: {e}")
+            self.held = False
+        return self.held
+
+    def _on_terminated(self, conn):
+        self.held = False
+
+    async def release(self):
+        self.held = False
+        if self.conn is not None and not self.conn.is_closed():
+            try:
+                await self.conn.close()
+            except Exception:
+                pass
+        self.conn = None
+
+
+class FileLease:
+    def __init__(self, path):
+        self.path = path
+        self.fd = None
+        self.held = False
+
+    async def refresh(self):
+        if self.held:
+            return True
+        import fcntl
+        fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            os.close(fd)
+            return False
+        os.ftruncate(fd, 0)
+        os.write(fd, f"{WORKER_ID}\n".encode("utf-8"))
+        self.fd = fd
+        self.held = True
+        return True
+
+    async def release(self):
+        if self.fd is not None:
+            os.close(self.fd)  # closing the descriptor drops the flock
+        self.fd = None
+        self.held = False
+
+
+_lease = None
+_elector_task = None
+_claimed_slots = {}     # (job, slot) -> (status, worker, at), for the file-based job run log
+_job_runs_offset = 0    # How far into JOB_RUNS_FILE _claimed_slots has read
+
+
+def is_leader():
+    return _lease is None or _lease.held
+
+
+async def _elect_loop():
+    was_leader = False
+    while True:
+        await _lease.refresh()
+        if _lease.held != was_leader:
+            print(f"Scheduler lease {'acquired' if _lease.held else 'lost'} by {WORKER_ID}")
+            was_leader = _lease.held
+        is_leader_gauge.set(int(_lease.held))
+        await asyncio.sleep(LEASE_RETRY_SECONDS)
+
+
+def _load_job_runs():
+    # Read the records appended since the last call
+    global _job_runs_offset
+    try:
+        with open(JOB_RUNS_FILE, "rb") as f:
+            if os.fstat(f.fileno()).st_size < _job_runs_offset:
+                _claimed_slots.clear()  # Replaced by a shorter file: read it from the start
+                _job_runs_offset = 0
+            f.seek(_job_runs_offset)
+            data = f.read()
+    except FileNotFoundError:
+        return
+    end = data.rfind(b"\n") + 1  # A line still being written is read next time
+    _job_runs_offset += end
+    for line in data[:end].splitlines():
+        try:
+            record = json.loads(line)
+            _claimed_slots[(record["job"], record["slot"])] = (record["status"], record["worker"], record["at"])
+        except (json.JSONDecodeError, KeyError, TypeError):
+            continue
+
+
+def _append_job_run(record):
+    with open(JOB_RUNS_FILE, "a", encoding="utf-8") as f:
+        f.write(json.dumps(record, separators=(",", ":")) + "\n")
+
+
+async def start():
+    global _lease, _elector_task
+    if _elector_task is not None and not _elector_task.done():
+        return  # Already running (on_ready fires again on reconnect)
+    if LEADER_LEASE == "none":
+        return
+    if LEADER_LEASE == "postgres":
+        _lease = PostgresLease(LEASE_NAME)
+        async with db.acquire() as conn:
+            await conn.execute(JOB_RUNS_SCHEMA)
+    else:
+        _lease = FileLease(LEASE_FILE)
+    await _lease.refresh()
+    _elector_task = asyncio.create_task(_elect_loop())
+
+
+async def _claim(job, slot):
+    if isinstance(_lease, PostgresLease):
+        async with db.acquire() as conn:
+            return await conn.fetchval(CLAIM_JOB_SQL, job, slot, WORKER_ID, JOB_TAKEOVER_SECONDS) is not None
+    _load_job_runs()  # Under the flock, so nobody else appends between this read and the claim
+    now = datetime.now(timezone.utc)
+    previous = _claimed_slots.get((job, slot))
+    if previous:
+        status, worker, at = previous
+        if status != "running" or worker == WORKER_ID:
+            return False
+        age = (now - datetime.fromisoformat(at)).total_seconds()
+        if age < JOB_TAKEOVER_SECONDS:
+            print(f"Not taking over {job} for {slot}: {worker} started it {age:.0f}s ago")
+            return False
+    _claimed_slots[(job, slot)] = ("running", WORKER_ID, now.isoformat())
+    _append_job_run({"job": job, "slot": slot, "worker": WORKER_ID, "status": "running", "at": now.isoformat()})
+    return True
+
+
+async def _finish(job, slot, status, error, duration):
+    job_runs_total.inc(job, status)
+    if isinstance(_lease, PostgresLease):
+        async with db.acquire() as conn:
+            await conn.execute(FINISH_JOB_SQL, job, slot, WORKER_ID, status, error)
+        return
+    now = datetime.now(timezone.utc).isoformat()
+    _claimed_slots[(job, slot)] = (status, WORKER_ID, now)
+    _append_job_run({"job": job, "slot": slot, "worker": WORKER_ID, "status": status,
+                     "at": now, "seconds": round(duration, 3), "error": error})
+
+
+async def run_exclusive(job, slot, func, *args, **kwargs):
+    # Run a scheduled job only on the lease holder, at most once per (job, slot)
+    if _lease is None:
+        return await func(*args, **kwargs)
+    if not _lease.held:
+        print(f"Skipping {job}: another worker holds the scheduler lease.")
+        return None
+    try:
+        claimed = await _claim(job, slot)
+    except Exception as e:
+        print(f"Skipping {job}: could not record job run: {e}")
+        return None
+    if not claimed:
+        print(f"Skipping {job}: already claimed for {slot}.")
+        return None
+    start = time.perf_counter()
+    try:
+        result = await func(*args, **kwargs)
+    except Exception as e:
+        await _finish(job, slot, "error", str(e), time.perf_counter() - start)
+        raise
+    await _finish(job, slot, "done", None, time.perf_counter() - start)
+    return result
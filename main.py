@@ -1,33 +1,98 @@
 import discord
-from discord.ext import tasks
 from discord import app_commands, Interaction, Embed
 from discord.ui import View, Button
 import asyncio
+import atexit
+import hashlib
+import heapq
+import io
 import json
 import os
 import re
 import random
+import tempfile
 import traceback
-from datetime import datetime, timezone, time
+import uuid
+import time as perf_time
+from datetime import datetime, timezone, time, timedelta
+from zoneinfo import ZoneInfo
+import aiohttp
 from views import LeaderboardView, create_leaderboard_embed
 from db import create_db_pool, upsert_user, get_user, insert_submitted_question, get_all_submitted_questions
+from http_server import start_http_server, route, not_modified, json_response
+import adjustments
+import cards
+import guess_stats
+import metrics
+import profiler
+import riddle_io
+import riddle_store
+import snapshot
+import sqlite_store
+import traffic
+import change_feed
+import leader
+from riddle_index import RiddleIndex
+from rounds import Round, RoundEngine
+from standings import RankedIndex
+from scheduler import Scheduler
 
 
 
 
 
 # Constants for file names
-QUESTIONS_FILE = "submitted_questions.json"
+QUESTIONS_FILE = "submitted_questions.json"          # Legacy format, imported once into the log below
+QUESTIONS_LOG_FILE = "submitted_questions.jsonl"     # Append-only riddle log (see riddle_store.py)
 SCORES_FILE = "scores.json"
 STREAKS_FILE = "streaks.json"
 SUBMISSION_DATES_FILE = "submission_dates.json"
+ROUND_FILE = "current_round.json"             # Checkpoint of the live rounds, restored on restart
+ROUND_HISTORY_FILE = "round_history.jsonl"    # Guessers, solvers and penalized users of every revealed round
+SCHEDULE_STATE_FILE = "schedule_state.json"   # Next/last run times of scheduled jobs
+COMMUNITIES_FILE = "communities.json"         # Optional per-community channel, timezone and times
+COMMAND_HASH_FILE = "command_sync_hash.txt"   # Hash of the last command tree synced to Discord
+SNAPSHOT_FILE = "state.snapshot"              # Binary copy of the in-memory state (see snapshot.py)
+SNAPSHOT_SECONDS = int(os.getenv("SNAPSHOT_SECONDS") or 300)  # 0 disables snapshots
+
+# Storage backend: "json" (the files above) or "sqlite" (single WAL-mode database file)
+STORAGE_BACKEND = os.getenv("STORAGE_BACKEND", "json").lower()
+SQLITE_PATH = os.getenv("SQLITE_PATH", "riddles.db")
+
+# User cache: "all" keeps every user in memory. "tiered" (sqlite backend only)
+# keeps users with a running streak or a recent guess, loads everyone else from
+# the database when they show up, and ranks the leaderboard from a top-K summary.
+USER_CACHE = os.getenv("USER_CACHE", "all").lower()
+USER_IDLE_ROUNDS = int(os.getenv("USER_IDLE_ROUNDS") or 7)      # Rounds without a guess before eviction
+LEADERBOARD_TOP_K = int(os.getenv("LEADERBOARD_TOP_K") or 1000)
+
+# Record guess traffic for offline replay (see traffic.py and replay.py); unset disables
+TRAFFIC_LOG = os.getenv("TRAFFIC_LOG")
+TRAFFIC_CONTENT = os.getenv("TRAFFIC_CONTENT", "hash").lower()   # "hash" or "text"
+
+# Share score/riddle changes with other bot processes over Postgres LISTEN/NOTIFY
+CHANGE_FEED_ENABLED = os.getenv("CHANGE_FEED", "0") == "1"
+
+STARTUP_STARTED = perf_time.perf_counter()
+startup_timings = {}        # phase name -> seconds, logged once the gateway is ready
+
+# How players answer: "message" (plain messages in the riddle channel) or
+# "slash" (ephemeral /guess). Slash mode needs neither the message_content nor the
+# members intent, so the gateway stops sending every message in every channel.
+GUESS_MODE = os.getenv("GUESS_MODE", "message").lower()
 
 # Bot intents
-intents = discord.Intents.default()
-intents.members = True
-intents.message_content = True
-
-client = discord.Client(intents=intents)
+if GUESS_MODE == "slash":
+    intents = discord.Intents.none()
+    intents.guilds = True
+    member_cache_flags = discord.MemberCacheFlags.none()
+else:
+    intents = discord.Intents.default()
+    intents.members = True
+    intents.message_content = True
+    member_cache_flags = discord.MemberCacheFlags.from_intents(intents)
+
+client = discord.Client(intents=intents, member_cache_flags=member_cache_flags, http_trace=metrics.http_trace())
 tree = app_commands.CommandTree(client)
 
 # Global state containers
@@ -37,13 +102,58 @@ streaks = {}                # user_id (str) -> int streak count
 submission_dates = {}       # user_id (str) -> str date (YYYY-MM-DD) for tracking submissions
 used_question_ids = set()   # Set of str IDs used recently
 
-current_riddle = None       # Currently active riddle dict or None
-current_answer_revealed = False
-correct_users = set()       # user_ids who guessed right this round
-guess_attempts = {}         # user_id -> int attempts count for current riddle
-deducted_for_user = set()   # user_ids deducted penalty for wrong guess in current riddle
+rounds = RoundEngine()      # Live rounds by channel id (see rounds.py)
+prepared_rounds = {}        # channel_id -> next Round built by prepare_round() at the announcement (memory only)
 
 max_id = 0                  # For generating new IDs (incremental)
+rounds_finished = 0         # Reveals since startup, the clock for user eviction
+last_seen_round = {}        # user_id -> rounds_finished when they last guessed (tiered cache)
+cold_top = {}               # user_id -> (score, streak) for top users not in memory (tiered cache)
+cold_floor = None           # (score, streak) below which cold users may be missing from cold_top
+store = None                # SQLiteStore when STORAGE_BACKEND is "sqlite"
+last_snapshot_sources = None  # snapshot_sources() of the newest snapshot written or loaded
+traffic_recorder = None     # traffic.Recorder when TRAFFIC_LOG is set
+ranked_index = RankedIndex(lambda: standing_entries())  # Leaderboard order of resident and cold_top users
+round_history = []          # Summaries of revealed rounds, oldest first (see round_summary)
+round_records = None        # riddle_id -> its latest full round history record, read on first lookup
+state_version = 0           # Bumped on every change the API shows; the API's ETags derive from it
+standings_version = 0       # Bumped only when scores or streaks change; card cache keys derive from it
+STATE_EPOCH = uuid.uuid4().hex[:8]  # Keeps ETags from one process run from matching another's
+
+ROUND_CHECKPOINT_SECONDS = 60
+
+# Default community, used when communities.json does not exist
+RIDDLE_TIMEZONE = os.getenv("RIDDLE_TIMEZONE", "UTC")
+ANNOUNCE_TIME = os.getenv("ANNOUNCE_TIME", "11:50")
+POST_TIME = os.getenv("POST_TIME", "12:00")
+REVEAL_TIME = os.getenv("REVEAL_TIME", "23:00")
+
+scheduler = Scheduler(SCHEDULE_STATE_FILE)
+communities = []            # List of dicts: id, channel_id, timezone, announce_time, post_time, reveal_time
+community_by_channel = {}   # channel_id (int) -> community dict
+
+# Metrics endpoint (Prometheus text format), served from the bot's own event loop
+METRICS_HOST = os.getenv("METRICS_HOST", "127.0.0.1")
+METRICS_PORT = int(os.getenv("METRICS_PORT") or 9108)  # 0 disables the endpoint
+
+# Read-only leaderboard/stats API under /api/, served by the same endpoint
+WEB_API_ENABLED = os.getenv("WEB_API", "0") == "1"
+API_MAX_PER_PAGE = 100
+
+# Leaderboard and profile image cards: opt in with CARDS=1, needs Pillow (see cards.py)
+CARDS_ENABLED = os.getenv("CARDS", "0") == "1" and cards.AVAILABLE
+CARD_WORKERS = int(os.getenv("CARD_WORKERS") or 1)                            # render processes
+CARD_CACHE_BYTES = int(os.getenv("CARD_CACHE_MB") or 16) * 1024 * 1024       # cached PNGs, evicted LRU
+card_renderer = cards.CardRenderer(CARD_CACHE_BYTES, CARD_WORKERS)
+
+metrics.Gauge("riddle_round_guessers", "Users who guessed in the live rounds", fn=lambda: rounds.guessers())
+metrics.Gauge("riddle_round_solvers", "Users who solved the live rounds", fn=lambda: rounds.solvers())
+metrics.Gauge("riddle_round_active", "Riddles live right now", fn=lambda: len(rounds))
+metrics.Gauge("riddle_users_resident", "Users whose score and streak are in memory", fn=lambda: len(scores))
+metrics.Gauge("riddle_users_cold_top", "Users in the leaderboard summary but not in memory", fn=lambda: len(cold_top))
+first_solve_gap = metrics.Histogram(
+    "riddle_first_solve_seconds", "Time from posting a riddle to its first correct guess",
+    buckets=(1, 5, 10, 30, 60, 120, 300, 600, 1800, 3600, 21600))
 
 
 # Utility: Clamp value to zero minimum
@@ -68,22 +178,220 @@ def load_json(filename):
 
 # Save data to JSON file
 def save_json(filename, data):
+    start = perf_time.perf_counter()
     try:
         with open(filename, "w", encoding="utf-8") as f:
             json.dump(data, f, indent=4, ensure_ascii=False)
+            size = f.tell()
     except Exception as e:
         print(f"Error saving {filename}: {e}")
+        return
+    metrics.persistence_flush_seconds.observe(perf_time.perf_counter() - start, filename)
+    metrics.persistence_flush_bytes.set(size, filename)
+
+
+def open_sqlite_store():
+    global store
+    if store is None:
+        store = sqlite_store.SQLiteStore(SQLITE_PATH)
+        atexit.register(store.close)
+        if store.is_empty():
+            # One-shot migration the first time the bot starts on an empty database
+            sqlite_store.migrate_from_json(store, SCORES_FILE, STREAKS_FILE, SUBMISSION_DATES_FILE,
+                                           QUESTIONS_LOG_FILE, QUESTIONS_FILE)
+    return store
+
+
+# --- State snapshots ---
+
+SNAPSHOT_CHECKPOINT_SECONDS = 30  # Skip a periodic snapshot rather than wait longer for queued writes
+
+# What a snapshot was taken from, checked part by part when it is loaded:
+#   "users"       file fingerprints of the score files (with SQLite, the whole database)
+#   "riddle_log"  position in the riddle log (JSON backend), so riddles appended
+#                 since can be read on top of the snapshot's catalog
+# Round state is not in the snapshot; current_round.json is always read at startup.
+def snapshot_sources():
+    if STORAGE_BACKEND == "sqlite":
+        users = snapshot.fingerprint([SQLITE_PATH])
+        # The WAL is folded into the main file before each snapshot, but a PASSIVE
+        # checkpoint leaves it in place; any write after the snapshot changes its mtime
+        wal = snapshot.fingerprint([SQLITE_PATH + "-wal"])[SQLITE_PATH + "-wal"]
+        users["wal"] = wal if wal and wal[1] else None
+        return {"users": users}
+    return {
+        "users": snapshot.fingerprint([SCORES_FILE, STREAKS_FILE, SUBMISSION_DATES_FILE]),
+        "riddle_log": riddle_store.log_position(QUESTIONS_LOG_FILE),
+    }
+
+
+def snapshot_checkpoint(mode="PASSIVE", timeout=SNAPSHOT_CHECKPOINT_SECONDS):
+    # Sources for a snapshot, taken after committing queued SQLite writes; None if the
+    # writer did not finish in time. Blocks, so the periodic job runs it in a thread.
+    if store is not None and not store.checkpoint(mode, timeout=timeout):
+        print("Skipping state snapshot: queued writes were not saved in time")
+        return None
+    return snapshot_sources()
+
+
+def snapshot_state():
+    # Copies, so the snapshot can be written off the event loop while the bot keeps running
+    return {
+        "user_cache": USER_CACHE,
+        "scores": dict(scores),
+        "streaks": dict(streaks),
+        "submission_dates": dict(submission_dates),
+        "riddles": list(submitted_questions),
+        "max_id": max_id,
+        "used_question_ids": list(used_question_ids),
+        "riddle_ids": list(riddle_index.ids),
+        "riddle_questions": dict(riddle_index.by_question),
+        "cold_top": dict(cold_top),
+        "cold_floor": cold_floor,
+        "riddle_log_records": riddle_store.record_counts(),
+    }
+
+
+def prepare_snapshot(sources):
+    # (state, sources) to write, or None when nothing changed since the last snapshot.
+    # The state is copied after the sources were read, so it holds at least what they
+    # do; a change in between only makes that part look stale when loaded.
+    global last_snapshot_sources
+    if sources is None or sources == last_snapshot_sources:
+        return None
+    last_snapshot_sources = sources
+    return snapshot_state(), sources
 
 
-# Load all persistent data on bot start
-def load_all_data():
-    global submitted_questions, scores, streaks, submission_dates, max_id
+def write_snapshot(state, sources):
+    start = perf_time.perf_counter()
+    try:
+        size = snapshot.write(SNAPSHOT_FILE, state, sources)
+    except Exception as e:
+        print(f"Error saving {SNAPSHOT_FILE}: {e}")
+        return
+    metrics.persistence_flush_seconds.observe(perf_time.perf_counter() - start, SNAPSHOT_FILE)
+    metrics.persistence_flush_bytes.set(size, SNAPSHOT_FILE)
+
+
+def save_snapshot():
+    # At exit: wait for every queued write and empty the WAL
+    prepared = prepare_snapshot(snapshot_checkpoint("TRUNCATE", timeout=None))
+    if prepared is not None:
+        write_snapshot(*prepared)
+
+
+async def _snapshot_job(slot):
+    sources = await asyncio.to_thread(snapshot_checkpoint)
+    prepared = prepare_snapshot(sources)
+    if prepared is not None:
+        await asyncio.to_thread(write_snapshot, *prepared)
+
+
+# Restore everything load_all_data() would, from the snapshot. Scores written
+# after it was taken are read from the score files, and riddles appended to the
+# log since are replayed on top of its catalog. Returns False if there is no
+# usable snapshot.
+def load_snapshot():
+    global submitted_questions, scores, streaks, submission_dates, max_id, used_question_ids, \
+        cold_top, cold_floor, last_snapshot_sources
+    if SNAPSHOT_SECONDS <= 0:
+        return False
+    if STORAGE_BACKEND == "sqlite":
+        open_sqlite_store()
+    loaded = snapshot.load(SNAPSHOT_FILE)
+    if loaded is None:
+        return False
+    taken_from, state = loaded
+    if state.get("user_cache") != USER_CACHE:
+        print(f"Ignoring {SNAPSHOT_FILE}: taken with USER_CACHE={state.get('user_cache')}")
+        return False
+    sources = snapshot_sources()
+    if not isinstance(taken_from, dict) or taken_from.keys() != sources.keys():
+        print(f"Ignoring {SNAPSHOT_FILE}: taken with another storage backend")
+        return False
+    users_current = taken_from["users"] == sources["users"]
+    if STORAGE_BACKEND == "sqlite" and not users_current:
+        # Riddles live in the same database; nothing in the snapshot can be trusted
+        print(f"Ignoring {SNAPSHOT_FILE}: {SQLITE_PATH} changed since the snapshot was taken")
+        return False
+    tail = []
+    if "riddle_log" in sources:
+        tail = riddle_store.read_after(QUESTIONS_LOG_FILE, taken_from["riddle_log"])
+        if tail is None:
+            print(f"Ignoring {SNAPSHOT_FILE}: {QUESTIONS_LOG_FILE} was rewritten since the snapshot was taken")
+            return False
+
+    submitted_questions = state["riddles"]
+    max_id = state["max_id"]
+    used_question_ids = set(state["used_question_ids"])
+    riddle_index.restore(submitted_questions, state["riddle_ids"], state["riddle_questions"])
+    riddle_store.set_record_counts(*state["riddle_log_records"])
+    if tail:
+        replay_riddle_records(tail)
+    if users_current:
+        scores = state["scores"]
+        streaks = state["streaks"]
+        submission_dates = state["submission_dates"]
+        cold_top = state["cold_top"]
+        cold_floor = state["cold_floor"]
+    else:
+        print(f"Score files changed since {SNAPSHOT_FILE} was taken; reading them")
+        load_users_json()
+    ranked_index.invalidate()
+    bump_standings_version()
+    if users_current and not tail:
+        last_snapshot_sources = sources
+    print(f"Loaded state from {SNAPSHOT_FILE}: {len(scores)} users, {len(submitted_questions)} riddles"
+          f" ({len(tail)} riddle log records since)")
+    return True
+
+
+# Apply riddle log records written after a snapshot, the way riddle_store.load_riddles() would
+def replay_riddle_records(records):
+    global max_id
+    live, dead = riddle_store.record_counts()
+    for record in records:
+        riddle_id = str(record.get("id"))
+        riddle = riddle_index.get(riddle_id)
+        if riddle is not None:
+            submitted_questions.remove(riddle)
+            riddle_index.remove(riddle_id)
+        if record.get("deleted"):
+            used_question_ids.discard(riddle_id)
+        else:
+            submitted_questions.append(record)  # Re-adding an id moves it to the end
+            riddle_index.add(record)
+            if riddle_id.isdigit():
+                max_id = max(max_id, int(riddle_id))
+    riddle_store.set_record_counts(len(submitted_questions), live + dead + len(records) - len(submitted_questions))
 
-    submitted_questions = load_json(QUESTIONS_FILE)
+
+def load_users_json():
+    global scores, streaks, submission_dates
     scores = load_json(SCORES_FILE)
     streaks = load_json(STREAKS_FILE)
     submission_dates = load_json(SUBMISSION_DATES_FILE)
 
+
+# Load all persistent data on bot start
+def load_all_data():
+    global submitted_questions, scores, streaks, submission_dates, max_id
+
+    if STORAGE_BACKEND == "sqlite":
+        open_sqlite_store()
+        submitted_questions = store.load_riddles()
+        scores, streaks, submission_dates = store.load_users(active_only=tiered_users())
+        if tiered_users():
+            load_cold_top()
+    else:
+        submitted_questions = riddle_store.load_riddles(QUESTIONS_LOG_FILE, legacy_filename=QUESTIONS_FILE)
+        load_users_json()
+
+    riddle_index.rebuild(submitted_questions)
+    ranked_index.invalidate()
+    bump_standings_version()
+
     # Determine max ID for new riddle submissions
     existing_ids = []
     for q in submitted_questions:
@@ -92,20 +400,418 @@ def load_all_data():
     max_id = max(existing_ids) if existing_ids else 0
 
 
-# Save all score and streak data
-def save_all_scores():
+def tiered_users():
+    return USER_CACHE == "tiered" and store is not None
+
+
+def load_cold_top():
+    global cold_top, cold_floor
+    rows = store.top_users(LEADERBOARD_TOP_K)
+    cold_top = {uid: (score, streak) for uid, score, streak in rows if uid not in scores}
+    cold_floor = (rows[-1][1], rows[-1][2]) if len(rows) == LEADERBOARD_TOP_K else None
+
+
+# Make sure a user's score and streak are in memory before reading or changing
+# them. With the tiered cache a cold user is read from the database here.
+def load_user(user_id):
+    if not tiered_users():
+        return
+    last_seen_round[user_id] = rounds_finished
+    if user_id in scores:
+        metrics.record_cache("user_state", True)
+        return
+    metrics.record_cache("user_state", False)
+    row = store.load_user(user_id)
+    if row is None:
+        return  # Never played; they start from zero
+    scores[user_id], streaks[user_id] = row[0], row[1]
+    if row[2] is not None:
+        submission_dates[user_id] = row[2]
+    cold_top.pop(user_id, None)
+    ranked_index.update(user_id, row[0], row[1])
+    bump_standings_version()
+
+
+# Drop users who have no streak and have not guessed for USER_IDLE_ROUNDS
+# rounds. Their rows are already saved; the best of them go to cold_top.
+def evict_idle_users():
+    global rounds_finished, cold_top, cold_floor
+    rounds_finished += 1
+    if not tiered_users():
+        return
+    for uid in [uid for uid, streak in streaks.items()
+                if streak == 0 and rounds_finished - last_seen_round.get(uid, 0) > USER_IDLE_ROUNDS]:
+        standing = (scores.pop(uid, 0), streaks.pop(uid, 0))
+        submission_dates.pop(uid, None)
+        last_seen_round.pop(uid, None)
+        if cold_floor is None or standing >= cold_floor:
+            cold_top[uid] = standing
+        else:
+            ranked_index.remove(uid)
+    if len(cold_top) > 2 * LEADERBOARD_TOP_K:
+        kept = dict(heapq.nlargest(LEADERBOARD_TOP_K, cold_top.items(), key=lambda item: item[1]))
+        for uid in cold_top.keys() - kept.keys():
+            ranked_index.remove(uid)
+        cold_top = kept
+        cold_floor = min(kept.values())
+    bump_standings_version()
+
+
+def bump_state_version():
+    global state_version
+    state_version += 1
+
+
+# For changes to who ranks where; also a change the API shows
+def bump_standings_version():
+    global standings_version
+    standings_version += 1
+    bump_state_version()
+
+
+# Everyone whose standing is in memory, for (re)building ranked_index
+def standing_entries():
+    entries = [(uid, score, streaks.get(uid, 0)) for uid, score in scores.items()]
+    entries += [(uid, score, streak) for uid, (score, streak) in cold_top.items() if uid not in scores]
+    return entries
+
+
+# How many users the leaderboard can list. With the tiered cache it stops where
+# cold users may be missing from cold_top.
+def ranked_count():
+    if tiered_users() and cold_floor is not None:
+        return ranked_index.count_at_least(*cold_floor)
+    return len(ranked_index)
+
+
+# [(user_id, score, streak)] for everyone with a score or streak, best first
+def ranked_users():
+    return ranked_index.entries(0, ranked_count())
+
+
+def top_score():
+    best = max(scores.values(), default=0)
+    return max(best, max((score for score, _ in cold_top.values()), default=0))
+
+
+# Save score and streak data. changed_user_ids lets the SQLite backend write only
+# those rows; the JSON backend always rewrites the full files.
+def save_all_scores(changed_user_ids=None):
+    bump_standings_version()
+    if changed_user_ids is None:
+        change_feed.publish_reload()
+    else:
+        ranked_index.update_many(changed_user_ids, lambda uid: (scores.get(uid, 0), streaks.get(uid, 0)))
+        change_feed.publish_users((uid, scores.get(uid, 0), streaks.get(uid, 0)) for uid in changed_user_ids)
+
+    if store is not None:
+        user_ids = scores.keys() | streaks.keys() if changed_user_ids is None else changed_user_ids
+        store.save_users(
+            (uid, scores.get(uid, 0), streaks.get(uid, 0), submission_dates.get(uid)) for uid in user_ids
+        )
+        return
     save_json(SCORES_FILE, scores)
     save_json(STREAKS_FILE, streaks)
     save_json(SUBMISSION_DATES_FILE, submission_dates)
 
 
-# Save all riddles/questions
+# Rewrite the whole riddle catalog (compacts the riddle log)
 def save_all_riddles():
-    save_json(QUESTIONS_FILE, submitted_questions)
+    bump_state_version()
+    change_feed.publish_reload()
+    if store is not None:
+        store.replace_riddles(submitted_questions)
+        return
+    start = perf_time.perf_counter()
+    riddle_store.compact_riddles(QUESTIONS_LOG_FILE, submitted_questions)
+    metrics.persistence_flush_seconds.observe(perf_time.perf_counter() - start, QUESTIONS_LOG_FILE)
+
+
+# Persist a single new riddle by appending it to the riddle log
+def save_new_riddle(riddle):
+    save_new_riddles([riddle])
+
+
+# Persist new riddles with one append (or one SQLite transaction), however many there are
+def save_new_riddles(riddles):
+    if not riddles:
+        return
+    bump_state_version()
+    if len(riddles) == 1:
+        change_feed.publish_riddle_added(riddles[0])
+    else:
+        change_feed.publish_reload()  # A bulk import would not fit in NOTIFY payloads
+    if store is not None:
+        store.add_riddles(riddles)
+        return
+    start = perf_time.perf_counter()
+    riddle_store.append_riddles(QUESTIONS_LOG_FILE, riddles)
+    metrics.persistence_flush_seconds.observe(perf_time.perf_counter() - start, QUESTIONS_LOG_FILE)
+
+
+# Persist a riddle removal as a tombstone, compacting the log once it is mostly dead records
+def save_removed_riddle(riddle_id):
+    bump_state_version()
+    change_feed.publish_riddle_removed(riddle_id)
+    if store is not None:
+        store.delete_riddle(riddle_id)
+        return
+    start = perf_time.perf_counter()
+    riddle_store.append_tombstone(QUESTIONS_LOG_FILE, riddle_id)
+    riddle_store.maybe_compact(QUESTIONS_LOG_FILE, submitted_questions)
+    metrics.persistence_flush_seconds.observe(perf_time.perf_counter() - start, QUESTIONS_LOG_FILE)
+
 
+# Add or remove a riddle in memory and in storage, keeping riddle_index in step
+def add_riddle(riddle):
+    submitted_questions.append(riddle)
+    riddle_index.add(riddle)
+    save_new_riddle(riddle)
 
-# Call load on startup
-load_all_data()
+
+def add_riddles(riddles):
+    submitted_questions.extend(riddles)
+    for riddle in riddles:
+        riddle_index.add(riddle)
+    save_new_riddles(riddles)
+
+
+def remove_riddle(riddle_id):
+    riddle_id = str(riddle_id)
+    riddle = riddle_index.get(riddle_id)
+    if riddle is None:
+        return None
+    submitted_questions.remove(riddle)
+    riddle_index.remove(riddle_id)
+    used_question_ids.discard(riddle_id)
+    save_removed_riddle(riddle_id)
+    return riddle
+
+
+# Apply a score/riddle change made by another bot process (see change_feed.py).
+# Only the in-memory copies are updated: the other process already persisted it.
+def apply_remote_change(kind, message):
+    global max_id
+    bump_state_version()
+    if kind == "u":
+        for uid, score, streak in message["u"]:
+            scores[uid] = score
+            streaks[uid] = streak
+            cold_top.pop(uid, None)
+            ranked_index.update(uid, score, streak)
+        bump_standings_version()
+    elif kind == "r+":
+        riddle = message["r"]
+        riddle_id = str(riddle.get("id"))
+        if riddle_index.get(riddle_id) is None:
+            submitted_questions.append(riddle)
+            riddle_index.add(riddle)
+        if riddle_id.isdigit():
+            max_id = max(max_id, int(riddle_id))
+    elif kind == "r-":
+        riddle_id = str(message["id"])
+        riddle = riddle_index.get(riddle_id)
+        if riddle is not None:
+            submitted_questions.remove(riddle)
+            riddle_index.remove(riddle_id)
+        used_question_ids.discard(riddle_id)
+    elif kind == "reload":
+        # Commit our own queued writes first, or the reload reads rows older than memory
+        if store is not None and not store.flush(timeout=5):
+            print("Reloading before all local score writes were saved")
+        load_all_data()
+
+
+# Save the live rounds so a restart (and a caught-up reveal) can pick them up again
+def save_round_state():
+    if not rounds:
+        if os.path.exists(ROUND_FILE):
+            os.remove(ROUND_FILE)
+        return
+    save_json(ROUND_FILE, round_state())
+
+
+def round_state():
+    return {"rounds": [rnd.to_state() for rnd in rounds]}
+
+
+def load_round_state():
+    restore_round_state(load_json(ROUND_FILE))
+
+
+def restore_round_state(state):
+    if not state:
+        return
+    # A checkpoint from before rounds were per channel holds a single round
+    states = state["rounds"] if "rounds" in state else [state]
+    for entry in states:
+        if not entry.get("riddle"):
+            continue
+        answer_words = frozenset(clean_and_filter(entry["riddle"].get("answer", "")))
+        rnd = Round.from_state(entry, answer_words, default_channel_id(), MAX_GUESSES)
+        rounds.start(rnd)
+        used_question_ids.add(str(rnd.riddle_id))
+        print(f"Restored riddle #{rnd.riddle_id} in channel {rnd.channel_id} with {len(rnd.guess_attempts)} guessers")
+
+
+def default_channel_id():
+    return int(os.getenv("DISCORD_CHANNEL_ID") or 0)
+
+
+# Append a finished round's participants to the round history
+def archive_round(rnd):
+    record = {
+        "riddle_id": rnd.riddle_id,
+        "channel_id": rnd.channel_id,
+        "revealed_at": datetime.now(timezone.utc).isoformat(),
+        "guessers": list(rnd.guess_attempts),
+        "solvers": list(rnd.correct_users),
+        "penalized": list(rnd.deducted_for_user),
+        "stats": rnd.stats.summary() if rnd.stats is not None else None,
+    }
+    with open(ROUND_HISTORY_FILE, "a", encoding="utf-8") as f:
+        f.write(json.dumps(record, separators=(",", ":")) + "\n")
+    round_history.append(round_summary(record))
+    if round_records is not None:
+        round_records[record["riddle_id"]] = record
+
+
+# What the API shows of a round history record: counts instead of user lists
+def round_summary(record):
+    return {
+        "riddle_id": record.get("riddle_id"),
+        "channel_id": record.get("channel_id"),
+        "revealed_at": record.get("revealed_at"),
+        "guessers": len(record.get("guessers", [])),
+        "solvers": len(record.get("solvers", [])),
+        "penalized": len(record.get("penalized", [])),
+        "stats": record.get("stats"),
+    }
+
+
+def load_round_history():
+    global round_history
+    round_history = []
+    if os.path.exists(ROUND_HISTORY_FILE):
+        round_history = [round_summary(record) for record in riddle_store.iter_log(ROUND_HISTORY_FILE)]
+
+
+# User ids who guessed, solved or were penalized in a riddle's round (a live one or a revealed one)
+def round_participants(riddle_id, who="guessers"):
+    riddle_id = str(riddle_id)
+    rnd = rounds.find_riddle(riddle_id)
+    if rnd is not None:
+        live = {"guessers": rnd.guess_attempts, "solvers": rnd.correct_users, "penalized": rnd.deducted_for_user}
+        return list(live[who])
+    record = find_round_record(riddle_id)
+    return record.get(who, []) if record is not None else None
+
+
+def find_round_record(riddle_id):
+    # Latest round history entry for a riddle (a riddle can be posted more than once)
+    global round_records
+    if round_records is None:
+        round_records = {}
+        if os.path.exists(ROUND_HISTORY_FILE):
+            for record in riddle_store.iter_log(ROUND_HISTORY_FILE):
+                round_records[record.get("riddle_id")] = record
+    return round_records.get(str(riddle_id))
+
+
+def parse_clock(value):
+    hour, minute = value.split(":")
+    return time(hour=int(hour), minute=int(minute))
+
+
+def load_communities():
+    global communities, community_by_channel
+    configured = load_json(COMMUNITIES_FILE) if os.path.exists(COMMUNITIES_FILE) else None
+    if not configured:
+        configured = [{
+            "id": "default",
+            "channel_id": int(os.getenv("DISCORD_CHANNEL_ID") or 0),
+            "timezone": RIDDLE_TIMEZONE,
+            "announce_time": ANNOUNCE_TIME,
+            "post_time": POST_TIME,
+            "reveal_time": REVEAL_TIME,
+        }]
+    communities = []
+    for entry in configured:
+        if entry.get("interval_minutes") is not None and entry["interval_minutes"] < 1:
+            # Interval runs are claimed per minute (see _community_job)
+            raise ValueError(f"Community {entry.get('id') or entry.get('channel_id')}: "
+                             f"interval_minutes must be at least 1, got {entry['interval_minutes']}")
+        communities.append({
+            "id": str(entry.get("id") or entry.get("channel_id")),
+            "channel_id": int(entry["channel_id"]),
+            "timezone": entry.get("timezone", "UTC"),
+            "announce_time": entry.get("announce_time", ANNOUNCE_TIME),
+            "post_time": entry.get("post_time", POST_TIME),
+            "reveal_time": entry.get("reveal_time", REVEAL_TIME),
+            # Rapid-fire: post a new round every interval_minutes instead of daily
+            "interval_minutes": entry.get("interval_minutes"),
+            # Reveal this long after the post (rapid-fire defaults to interval_minutes)
+            "round_minutes": entry.get("round_minutes"),
+            "max_guesses": int(entry.get("max_guesses", MAX_GUESSES)),
+            "streaks": entry.get("streaks", not entry.get("interval_minutes")),
+        })
+    community_by_channel = {c["channel_id"]: c for c in communities}
+
+
+# Hash of the command definitions as Discord sees them, used to skip redundant tree.sync() calls
+def command_tree_hash():
+    commands = sorted((cmd.to_dict(tree) for cmd in tree.get_commands()), key=lambda c: c["name"])
+    payload = json.dumps(commands, sort_keys=True, separators=(",", ":"), default=str)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+async def sync_commands_if_changed():
+    current = f"{client.application_id}:{command_tree_hash()}"
+    previous = None
+    if os.path.exists(COMMAND_HASH_FILE):
+        with open(COMMAND_HASH_FILE, "r", encoding="utf-8") as f:
+            previous = f.read().strip()
+    if current == previous:
+        print("Command tree unchanged; skipping sync.")
+        return False
+    try:
+        synced = await tree.sync()
+        print(f"Synced {len(synced)} commands.")
+    except Exception as e:
+        print(f"Failed to sync commands: {e}")
+        return False
+    with open(COMMAND_HASH_FILE, "w", encoding="utf-8") as f:
+        f.write(current + "\n")
+    return True
+
+
+# Runs once after login, before connecting to the gateway (not on every reconnect)
+async def setup_hook():
+    global traffic_recorder
+    startup_timings["login"] = perf_time.perf_counter() - STARTUP_STARTED
+
+    start = perf_time.perf_counter()
+    if not load_snapshot():
+        load_all_data()
+    load_round_state()
+    load_communities()
+    if WEB_API_ENABLED:
+        load_round_history()
+    if SNAPSHOT_SECONDS > 0:
+        atexit.register(save_snapshot)  # Registered after the SQLite store, so it runs before the store closes
+    if TRAFFIC_LOG:
+        traffic_recorder = traffic.Recorder(TRAFFIC_LOG, TRAFFIC_CONTENT)
+        atexit.register(traffic_recorder.close)
+        print(f"Recording guess traffic to {TRAFFIC_LOG} ({TRAFFIC_CONTENT})")
+    if CARDS_ENABLED:
+        atexit.register(card_renderer.close)
+    startup_timings["load_data"] = perf_time.perf_counter() - start
+
+    start = perf_time.perf_counter()
+    await sync_commands_if_changed()
+    startup_timings["command_sync"] = perf_time.perf_counter() - start
+
+client.setup_hook = setup_hook
 
 def get_next_id():
     global max_id
@@ -113,16 +819,70 @@ def get_next_id():
     return str(max_id)
 
 
+# Look up a user in the client cache first and only fall back to a REST fetch on a miss
+async def resolve_user(user_id):
+    user = client.get_user(int(user_id))
+    metrics.record_cache("user", user is not None)
+    if user is None:
+        user = await client.fetch_user(int(user_id))
+    return user
+
+
+USER_FETCH_CONCURRENCY = 5
+user_names = {}             # user_id (str) -> display name, for users missing from the client cache
+USER_NAMES_MAX = 10000
+
+
+# Display names for many users at once: client cache and user_names first, then
+# the misses fetched concurrently (bounded, so a big page does not trip rate limits)
+async def resolve_user_names(user_ids):
+    names = {}
+    missing = []
+    for uid in dict.fromkeys(str(u) for u in user_ids):
+        user = client.get_user(int(uid))
+        if user is not None:
+            names[uid] = user.display_name
+        elif uid in user_names:
+            names[uid] = user_names[uid]
+        else:
+            missing.append(uid)
+            metrics.record_cache("user", False)
+            continue
+        metrics.record_cache("user", True)
+
+    semaphore = asyncio.Semaphore(USER_FETCH_CONCURRENCY)
+
+    async def fetch(uid):
+        async with semaphore:
+            try:
+                return uid, (await client.fetch_user(int(uid))).display_name
+            except Exception:
+                return uid, None
+
+    for uid, name in await asyncio.gather(*(fetch(uid) for uid in missing)):
+        if name is None:
+            continue
+        if len(user_names) >= USER_NAMES_MAX:
+            user_names.pop(next(iter(user_names)))
+        user_names[uid] = name
+        names[uid] = name
+    return names
+
+
+# A riddle not used recently and not already prepared for another channel. It is
+# only marked used when its round goes live (activate_round), so a prepared round
+# lost to a restart does not use up its riddle.
 def pick_next_riddle():
-    unused = [q for q in submitted_questions if str(q.get("id")) not in used_question_ids and q.get("id") is not None]
+    held = {str(rnd.riddle_id) for rnd in prepared_rounds.values()}
+    skip = used_question_ids | held if held else used_question_ids
+    unused = [q for q in submitted_questions if str(q.get("id")) not in skip and q.get("id") is not None]
     if not unused:
         used_question_ids.clear()
-        unused = [q for q in submitted_questions if q.get("id") is not None]
+        unused = ([q for q in submitted_questions if str(q.get("id")) not in held and q.get("id") is not None]
+                  or [q for q in submitted_questions if q.get("id") is not None])
     if not unused:
         return None
-    riddle = random.choice(unused)
-    used_question_ids.add(str(riddle["id"]))
-    return riddle
+    return random.choice(unused)
 STOP_WORDS = {"a", "an", "the", "is", "was", "were", "of", "to", "and", "in", "on", "at", "by"}
 
 def clean_and_filter(text):
@@ -130,6 +890,19 @@ def clean_and_filter(text):
     return [w for w in words if w not in STOP_WORDS]
 
 
+# Normalize a question for duplicate detection (case-insensitive, ignoring extra spaces)
+def normalize_question(text):
+    return " ".join(text.lower().split())
+
+
+# Sorted ids, normalized questions and a search token index over the catalog (see riddle_index.py)
+riddle_index = RiddleIndex(clean_and_filter, normalize_question)
+
+
+def is_duplicate_question(question):
+    return riddle_index.find_question(question) is not None
+
+
 def count_unused_questions():
     return len([q for q in submitted_questions if str(q.get("id")) not in used_question_ids])
 
@@ -186,8 +959,10 @@ def get_rank(score, streak):
         return "Sushi Einstein 🧪"
 
 @tree.command(name="myranks", description="Show your riddle score, streak, and rank")
+@metrics.timed
 async def myranks(interaction: discord.Interaction):
     user_id = str(interaction.user.id)
+    load_user(user_id)
     score_val = scores.get(user_id, 0)
     streak_val = streaks.get(user_id, 0)
     rank = get_rank(score_val)
@@ -207,7 +982,19 @@ async def myranks(interaction: discord.Interaction):
     embed.add_field(name="Streak", value=streak_text, inline=False)
     embed.add_field(name="Rank", value=rank or "No rank", inline=False)
 
-    await interaction.response.send_message(embed=embed, ephemeral=True)
+    card = None
+    if CARDS_ENABLED:
+        await interaction.response.defer(ephemeral=True)
+        card = await card_file(("profile", user_id, standings_version), "profile.png", cards.render_profile,
+                               interaction.user.display_name, score_val, streak_val, rank, streak_rank,
+                               ranked_index.rank(user_id), ranked_count())
+    if card is not None:
+        embed.set_image(url="attachment://profile.png")
+        await interaction.followup.send(embed=embed, file=card, ephemeral=True)
+    elif interaction.response.is_done():
+        await interaction.followup.send(embed=embed, ephemeral=True)
+    else:
+        await interaction.response.send_message(embed=embed, ephemeral=True)
 
 
 
@@ -226,6 +1013,7 @@ def ensure_user_initialized(uid: str):
 
 
 @tree.command(name="ranks", description="View all rank tiers and how to earn them")
+@metrics.timed
 async def ranks(interaction: discord.Interaction):
     embed = discord.Embed(
         title="📊 Riddle Rank Tiers",
@@ -300,69 +1088,337 @@ def get_streak_rank(streak):
 @tree.command(name="removeriddle", description="Remove a riddle by its number (ID)")
 @app_commands.describe(riddle_id="The ID number of the riddle to remove")
 @app_commands.checks.has_permissions(manage_guild=True)
+@metrics.timed
 async def removeriddle(interaction: discord.Interaction, riddle_id: int):
-    global submitted_questions, used_question_ids
+    removed_riddle = remove_riddle(riddle_id)
 
-    # Convert ID to string to match stored riddles
-    riddle_id_str = str(riddle_id)
+    if removed_riddle is None:
+        await interaction.response.send_message(f"❌ No riddle found with ID #{riddle_id}.", ephemeral=True)
+        return
 
-    # Find riddle index by ID
-    index_to_remove = next((i for i, r in enumerate(submitted_questions) if str(r.get("id")) == riddle_id_str), None)
+    await interaction.response.send_message(f"✅ Removed riddle #{riddle_id}: {removed_riddle.get('question')}", ephemeral=True)
 
-    if index_to_remove is None:
-        await interaction.response.send_message(f"❌ No riddle found with ID #{riddle_id}.", ephemeral=True)
+# Parse "<@123> 5, 456 -2 1" into (user_id, points, streak) operations; users
+# listed without numbers get the default deltas
+ADJUSTMENT_ENTRY = re.compile(r"^(?:<@!?(\d+)>|(\d+))(?:\s+([+-]?\d+))?(?:\s+([+-]?\d+))?$")
+
+
+def parse_adjustment_entries(text, points, streak):
+    ops = []
+    for item in re.split(r"[,;\n]+", text or ""):
+        item = item.strip()
+        if not item:
+            continue
+        match = ADJUSTMENT_ENTRY.match(item)
+        if not match:
+            raise ValueError(f"Could not read `{item}`; use `@user [points] [streak]`.")
+        user_id = match.group(1) or match.group(2)
+        ops.append((user_id,
+                    int(match.group(3)) if match.group(3) is not None else points,
+                    int(match.group(4)) if match.group(4) is not None else streak))
+    return ops
+
+
+@tree.command(name="adjustscores", description="Adjust scores and streaks for many users at once (admin only)")
+@app_commands.describe(
+    points="Points to add to each user (negative to remove)",
+    streak="Streak days to add to each user (negative to remove)",
+    users="Mentions or IDs, comma separated, each optionally followed by its own points and streak",
+    role="Everyone with this role",
+    riddle_id="Everyone from this riddle's round (see 'who')",
+    who="With riddle_id: who guessed, who solved, or who lost points for a wrong guess",
+    reason="Why, for the adjustment log"
+)
+@app_commands.choices(who=[
+    app_commands.Choice(name="guessed", value="guessers"),
+    app_commands.Choice(name="solved", value="solvers"),
+    app_commands.Choice(name="penalized", value="penalized"),
+])
+@app_commands.checks.has_permissions(manage_guild=True)
+@metrics.timed
+async def adjustscores(interaction: discord.Interaction, points: int = 0, streak: int = 0, users: str = None,
+                       role: discord.Role = None, riddle_id: int = None,
+                       who: app_commands.Choice[str] = None, reason: str = None):
+    try:
+        ops = parse_adjustment_entries(users, points, streak)
+    except ValueError as e:
+        await interaction.response.send_message(f"❌ {e}", ephemeral=True)
+        return
+
+    if role is not None:
+        # Without the members intent (GUESS_MODE=slash) Discord sends no member lists
+        # at all, cached or fetched, so role.members would silently be empty
+        if not intents.members:
+            await interaction.response.send_message(
+                "❌ Role targets need the members intent, which is off with `GUESS_MODE=slash`; "
+                "list the users instead.", ephemeral=True)
+            return
+        ops += [(str(member.id), points, streak) for member in role.members if not member.bot]
+    if riddle_id is not None:
+        participants = round_participants(riddle_id, who.value if who else "guessers")
+        if participants is None:
+            await interaction.response.send_message(f"❌ No round found for riddle #{riddle_id}.", ephemeral=True)
+            return
+        ops += [(uid, points, streak) for uid in participants]
+
+    if not adjustments.merge_ops(ops):
+        await interaction.response.send_message(
+            "❌ Nothing to adjust: pick users, a role or a riddle, and a non-zero points or streak change.",
+            ephemeral=True)
         return
 
-    # Remove riddle
-    removed_riddle = submitted_questions.pop(index_to_remove)
-    used_question_ids.discard(riddle_id_str)
+    record = adjustments.apply(scores, streaks, ops, interaction.user.id, reason=reason, load_user=load_user)
+    save_all_scores([uid for uid, _, _ in record["ops"]])
+    await interaction.response.send_message(
+        f"✅ Adjusted {len(record['ops'])} users in batch `{record['batch']}`. "
+        f"Undo with `/revertadjustment batch_id:{record['batch']}`.",
+        ephemeral=True)
 
-    # Save changes
-    save_all_riddles()
 
-    await interaction.response.send_message(f"✅ Removed riddle #{riddle_id}: {removed_riddle.get('question')}", ephemeral=True)
+@tree.command(name="revertadjustment", description="Undo a bulk score adjustment by its batch id (admin only)")
+@app_commands.describe(batch_id="The batch id reported by /adjustscores")
+@app_commands.checks.has_permissions(manage_guild=True)
+@metrics.timed
+async def revertadjustment(interaction: discord.Interaction, batch_id: str):
+    try:
+        record = adjustments.revert(scores, streaks, batch_id.strip(), interaction.user.id, load_user=load_user)
+    except ValueError as e:
+        await interaction.response.send_message(f"❌ {e}", ephemeral=True)
+        return
+    save_all_scores([uid for uid, _, _ in record["ops"]])
+    await interaction.response.send_message(
+        f"↩️ Reverted batch `{batch_id}` for {len(record['ops'])} users (as batch `{record['batch']}`).",
+        ephemeral=True)
+
+
+@tree.command(name="profile", description="Profile the running bot for a few seconds (admin only)")
+@app_commands.describe(
+    mode="cpu: sampling profiler with collapsed stacks, memory: tracemalloc top allocations",
+    seconds="How long to profile (1-120)",
+    top="How many entries to include in the summary"
+)
+@app_commands.choices(mode=[
+    app_commands.Choice(name="cpu", value="cpu"),
+    app_commands.Choice(name="memory", value="memory"),
+])
+@app_commands.checks.has_permissions(manage_guild=True)
+@metrics.timed
+async def profile(interaction: discord.Interaction, mode: app_commands.Choice[str], seconds: int = 30, top: int = 25):
+    if profiler.is_busy():
+        await interaction.response.send_message("⏳ A profiling session is already running.", ephemeral=True)
+        return
+
+    seconds = max(1, min(seconds, profiler.MAX_SECONDS))
+    top = max(1, min(top, 200))
+    await interaction.response.defer(ephemeral=True, thinking=True)
+
+    stamp = datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%SZ")
+    if mode.value == "cpu":
+        summary, collapsed = await profiler.sample_stacks(seconds, top)
+        files = [
+            discord.File(io.BytesIO(summary.encode("utf-8")), filename=f"cpu-top-{stamp}.txt"),
+            discord.File(io.BytesIO(collapsed.encode("utf-8")), filename=f"cpu-collapsed-{stamp}.txt"),
+        ]
+    else:
+        report = await profiler.trace_allocations(seconds, top)
+        files = [discord.File(io.BytesIO(report.encode("utf-8")), filename=f"memory-top-{stamp}.txt")]
+
+    await interaction.followup.send(f"📈 {mode.value} profile for {seconds}s:", files=files, ephemeral=True)
+
+
+IMPORT_MAX_BYTES = 25 * 1024 * 1024
+IMPORT_BATCH_SIZE = 500         # Rows checked between yields to the event loop
+IMPORT_ERRORS_SHOWN = 10
+import_lock = asyncio.Lock()    # One import at a time, so two files cannot add the same riddle
+
+
+# Stream an attachment into a file in chunks instead of reading it into memory
+async def download_attachment(attachment, fp):
+    async with aiohttp.ClientSession() as session:
+        async with session.get(attachment.url) as resp:
+            resp.raise_for_status()
+            async for chunk in resp.content.iter_chunked(64 * 1024):
+                fp.write(chunk)
+
+
+def _check_import_batch(batch, accepted, seen, report, submitter_id):
+    for line_no, record, error in batch:
+        if error is None:
+            question = str(record.get("question") or "").strip()
+            answer = str(record.get("answer") or "").strip().lower()
+            if not question or not answer:
+                error = "missing question or answer"
+        if error is not None:
+            report["invalid"] += 1
+            if len(report["errors"]) < IMPORT_ERRORS_SHOWN:
+                report["errors"].append(f"line {line_no}: {error}")
+            continue
+
+        key = normalize_question(question)
+        if key in seen or riddle_index.find_question(question) is not None:
+            report["duplicates"] += 1
+            continue
+        seen.add(key)
+        accepted.append({
+            "id": None,             # Assigned when the import is committed
+            "question": question,
+            "answer": answer,
+            "submitter_id": str(record.get("submitter_id") or submitter_id),
+        })
+
+
+# Parse, validate and deduplicate an import file batch by batch, then add every
+# accepted riddle with a single write. Nothing is saved if the file is unreadable.
+async def import_riddles(text_file, fmt, submitter_id):
+    report = {"imported": 0, "duplicates": 0, "invalid": 0, "errors": []}
+    accepted = []
+    seen = set()            # Normalized questions accepted from this file
+    batch = []
+    for row in riddle_io.iter_records(text_file, fmt):
+        batch.append(row)
+        if len(batch) >= IMPORT_BATCH_SIZE:
+            _check_import_batch(batch, accepted, seen, report, submitter_id)
+            batch = []
+            await asyncio.sleep(0)  # Let the gateway and other commands run between batches
+    _check_import_batch(batch, accepted, seen, report, submitter_id)
+
+    # A /submitriddle may have landed while we yielded; drop anything it duplicated
+    fresh = [r for r in accepted if riddle_index.find_question(r["question"]) is None]
+    report["duplicates"] += len(accepted) - len(fresh)
+    for riddle in fresh:
+        riddle["id"] = get_next_id()
+    add_riddles(fresh)
+    report["imported"] = len(fresh)
+    return report
+
+
+@tree.command(name="importriddles", description="Import riddles from an attached JSONL or CSV file (admin only)")
+@app_commands.describe(file="A .jsonl file of {\"question\", \"answer\"} objects, or a .csv with question,answer columns")
+@app_commands.checks.has_permissions(manage_guild=True)
+@metrics.timed
+async def importriddles(interaction: discord.Interaction, file: discord.Attachment):
+    fmt = riddle_io.format_for(file.filename)
+    if fmt is None:
+        await interaction.response.send_message("❌ Attach a `.jsonl` or `.csv` file.", ephemeral=True)
+        return
+    if file.size > IMPORT_MAX_BYTES:
+        await interaction.response.send_message(
+            f"❌ That file is too large (limit {IMPORT_MAX_BYTES // (1024 * 1024)} MB).", ephemeral=True)
+        return
+    if import_lock.locked():
+        await interaction.response.send_message("⏳ Another import is already running.", ephemeral=True)
+        return
+
+    await interaction.response.defer(ephemeral=True, thinking=True)
+    start = perf_time.perf_counter()
+    async with import_lock:
+        with tempfile.TemporaryFile() as raw:
+            try:
+                await download_attachment(file, raw)
+                raw.seek(0)
+                report = await import_riddles(riddle_io.open_text(raw), fmt, str(interaction.user.id))
+            except UnicodeDecodeError:
+                await interaction.followup.send("❌ The file is not valid UTF-8; nothing was imported.", ephemeral=True)
+                return
+            except Exception as e:
+                await interaction.followup.send(f"❌ Import failed, nothing was imported: {e}", ephemeral=True)
+                return
+
+    lines = [
+        f"📥 Imported **{report['imported']}** riddles from `{file.filename}` "
+        f"in {perf_time.perf_counter() - start:.1f}s.",
+        f"• Skipped as duplicates: {report['duplicates']}",
+        f"• Skipped as invalid: {report['invalid']}",
+    ]
+    if report["errors"]:
+        lines.append("```\n" + "\n".join(report["errors"]) + "\n```")
+    await interaction.followup.send("\n".join(lines), ephemeral=True)
+
+
+@tree.command(name="exportriddles", description="Export every riddle as a JSONL or CSV file (admin only)")
+@app_commands.describe(fmt="File format")
+@app_commands.choices(fmt=[
+    app_commands.Choice(name="jsonl", value="jsonl"),
+    app_commands.Choice(name="csv", value="csv"),
+])
+@app_commands.checks.has_permissions(manage_guild=True)
+@metrics.timed
+async def exportriddles(interaction: discord.Interaction, fmt: app_commands.Choice[str]):
+    await interaction.response.defer(ephemeral=True, thinking=True)
+    riddles = list(submitted_questions)  # Snapshot of the list, not of the riddle text
+
+    # Written line by line to a temp file off the event loop, then uploaded from disk
+    out = tempfile.TemporaryFile()
+
+    def write():
+        text = io.TextIOWrapper(out, encoding="utf-8", newline="")
+        count = riddle_io.write_riddles(text, riddles, fmt.value)
+        text.flush()
+        text.detach()
+        return count
+
+    count = await asyncio.to_thread(write)
+    out.seek(0)
+    stamp = datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%SZ")
+    try:
+        await interaction.followup.send(f"📦 Exported {count} riddles.",
+                                        file=discord.File(out, filename=f"riddles-{stamp}.{fmt.value}"),
+                                        ephemeral=True)
+    except discord.HTTPException as e:
+        out.close()
+        await interaction.followup.send(f"❌ Could not upload the export: {e}", ephemeral=True)
+
 
 ITEMS_PER_PAGE = 10
 
+# Pages are fetched lazily by keyset (the riddle ids after the last one shown), so
+# opening the list or turning a page never copies or scans the whole catalog.
 class ListRiddlesView(View):
-    def __init__(self, riddles, author_id, bot):
+    def __init__(self, author_id, bot, query=None):
         super().__init__(timeout=180)
-        self.riddles = riddles
         self.author_id = author_id
-        self.current_page = 0
-        self.total_pages = max(1, (len(riddles) - 1) // ITEMS_PER_PAGE + 1)
+        self.query = query
+        self.matches = riddle_index.search(query) if query else None  # Sorted ids, or None for all
+        self.cursors = [None]       # after_id for each page visited so far, for Previous
+        self.has_next = False
+        self.last_id = None         # Id of the last riddle on the current page
         self.bot = bot  # save bot/client to fetch users
-        self.update_buttons()
+
+    def total(self):
+        return len(riddle_index) if self.matches is None else len(self.matches)
 
     def update_buttons(self):
-        self.prev_button.disabled = self.current_page == 0
-        self.next_button.disabled = self.current_page >= self.total_pages - 1
+        self.prev_button.disabled = len(self.cursors) == 1
+        self.next_button.disabled = not self.has_next
 
     async def get_page_embed(self):
-        start = self.current_page * ITEMS_PER_PAGE
-        end = start + ITEMS_PER_PAGE
-        page_riddles = self.riddles[start:end]
+        after_id = self.cursors[-1]
+        page_riddles = riddle_index.page(after_id, ITEMS_PER_PAGE + 1, ids=self.matches)
+        self.has_next = len(page_riddles) > ITEMS_PER_PAGE
+        page_riddles = page_riddles[:ITEMS_PER_PAGE]
+        self.last_id = int(page_riddles[-1]['id']) if page_riddles else None
+        self.update_buttons()
 
+        page_number = riddle_index.position(after_id, ids=self.matches) // ITEMS_PER_PAGE + 1
+        total_pages = max(1, (self.total() - 1) // ITEMS_PER_PAGE + 1)
+        title = "📜 Submitted Riddles" if not self.query else f"🔎 Riddles matching \"{self.query}\""
         embed = Embed(
-            title=f"📜 Submitted Riddles (Page {self.current_page + 1}/{self.total_pages})",
+            title=f"{title} (Page {page_number}/{total_pages})",
             color=discord.Color.blurple()
         )
 
         if not page_riddles:
-            embed.description = "No riddles available."
+            embed.description = "No riddles available." if not self.query else "No riddles match that search."
             return embed
 
+        names = await resolve_user_names(r['submitter_id'] for r in page_riddles if r.get('submitter_id'))
         desc_lines = []
         for riddle in page_riddles:
-            try:
-                user = await self.bot.fetch_user(int(riddle['submitter_id']))
-                display_name = user.display_name if hasattr(user, 'display_name') else user.name
-            except Exception:
-                display_name = "Unknown User"
+            display_name = names.get(str(riddle.get('submitter_id')), "Unknown User")
             desc_lines.append(f"#{riddle['id']}: {riddle['question']}\n_(submitted by {display_name})_")
 
         embed.description = "\n\n".join(desc_lines)
-        embed.set_footer(text="Use the buttons below to navigate pages.")
+        embed.set_footer(text=f"{self.total()} riddles. Use the buttons below to navigate pages.")
         return embed
 
     @discord.ui.button(label="Previous", style=discord.ButtonStyle.secondary)
@@ -370,9 +1426,8 @@ class ListRiddlesView(View):
         if interaction.user.id != self.author_id:
             await interaction.response.send_message("Only the command invoker can use these buttons.", ephemeral=True)
             return
-        if self.current_page > 0:
-            self.current_page -= 1
-            self.update_buttons()
+        if len(self.cursors) > 1:
+            self.cursors.pop()
             embed = await self.get_page_embed()
             await interaction.response.edit_message(embed=embed, view=self)
 
@@ -381,160 +1436,439 @@ class ListRiddlesView(View):
         if interaction.user.id != self.author_id:
             await interaction.response.send_message("Only the command invoker can use these buttons.", ephemeral=True)
             return
-        if self.current_page < self.total_pages - 1:
-            self.current_page += 1
-            self.update_buttons()
+        if self.has_next:
+            self.cursors.append(self.last_id)
             embed = await self.get_page_embed()
             await interaction.response.edit_message(embed=embed, view=self)
 
 
 @tree.command(name="listriddles", description="List all submitted riddles with pagination")
-async def listriddles(interaction: discord.Interaction):
-    if not submitted_questions:
+@app_commands.describe(query="Only show riddles whose question or answer contains all of these words")
+@metrics.timed
+async def listriddles(interaction: discord.Interaction, query: str = None):
+    if not len(riddle_index):
         await interaction.response.send_message("No riddles have been submitted yet.", ephemeral=True)
         return
 
-    view = ListRiddlesView(submitted_questions, interaction.user.id, interaction.client)
+    view = ListRiddlesView(interaction.user.id, interaction.client, query=query.strip() if query else None)
     embed = await view.get_page_embed()
     await interaction.response.send_message(embed=embed, view=view, ephemeral=True)
 
 
 
+LEADERBOARD_PER_PAGE = 10
+
+
+# One leaderboard page as (embed, card file or None), for the first send and for
+# LeaderboardView's page flips. The card is drawn off the event loop and reused
+# until the standings change (see cards.py).
+async def leaderboard_page(page, pages):
+    start = page * LEADERBOARD_PER_PAGE
+    entries = ranked_index.entries(start, min(start + LEADERBOARD_PER_PAGE, ranked_count()))
+    names = await resolve_user_names([user_id for user_id, _, _ in entries])
+    title = f"🏆 Riddle Leaderboard (Page {page + 1} / {pages})"
+
+    embed = Embed(title=title, color=discord.Color.gold())
+
+    description_lines = []
+    max_score = top_score()
+
+    for idx, (user_id_str, score_val, streak_val) in enumerate(entries, start=start + 1):
+        if user_id_str not in names:
+            description_lines.append(f"#{idx} <@{user_id_str}> (failed to fetch user)")
+            description_lines.append("")
+            continue
+
+        score_line = f"{score_val}"
+        if score_val == max_score and max_score > 0:
+            score_line += " - 👑 🍣 Master Sushi Chef"
+
+        rank = get_rank(score_val)
+        streak_rank = get_streak_rank(streak_val)
+        streak_text = f"🔥{streak_val}"
+        if streak_rank:
+            streak_text += f" - {streak_rank}"
+
+        description_lines.append(f"#{idx} {names[user_id_str]}:")
+        description_lines.append(f"    • Score: {score_line}")
+        description_lines.append(f"    • Rank: {rank}")
+        description_lines.append(f"    • Streak: {streak_text}")
+        description_lines.append("")
+
+    embed.description = "\n".join(description_lines) or "No users to display."
+
+    card = None
+    if CARDS_ENABLED and entries:
+        rows = [(idx, names.get(user_id_str, f"User {user_id_str}"), score_val, streak_val,
+                 get_rank(score_val), get_streak_rank(streak_val))
+                for idx, (user_id_str, score_val, streak_val) in enumerate(entries, start=start + 1)]
+        card = await card_file(("leaderboard", page, standings_version), "leaderboard.png",
+                               cards.render_leaderboard, title, rows)
+        if card is not None:
+            embed.set_image(url="attachment://leaderboard.png")
+    return embed, card
+
+
+# A cached or freshly rendered card as an attachment; None (text only) if rendering fails
+async def card_file(key, filename, render, *args):
+    try:
+        png = await card_renderer.get(key, render, *args)
+    except Exception as e:
+        print(f"Error rendering {filename}: {e}")
+        return None
+    return discord.File(io.BytesIO(png), filename=filename)
+
+
 @tree.command(name="leaderboard", description="Show the riddle leaderboard with pagination")
+@metrics.timed
 async def leaderboard(interaction: Interaction):
     await interaction.response.defer()
 
-    # Filter users with score or streak >= 1
-    filtered_users = [user_id for user_id in scores.keys() if (scores.get(user_id, 0) >= 1 or streaks.get(user_id, 0) >= 1)]
+    # Users with score or streak >= 1, descending by (score, streak)
+    ranked = ranked_users()
 
-    if not filtered_users:
+    if not ranked:
         await interaction.followup.send("No leaderboard data available.", ephemeral=True)
         return
 
-    # Sort users descending by (score, streak)
-    filtered_users.sort(key=lambda u: (scores.get(u, 0), streaks.get(u, 0)), reverse=True)
+    filtered_users = [user_id for user_id, _, _ in ranked]
+    view = LeaderboardView(client, filtered_users, per_page=LEADERBOARD_PER_PAGE, render_page=leaderboard_page)
+    embed, card = await leaderboard_page(0, view.max_page + 1)
 
-    view = LeaderboardView(client, filtered_users, per_page=10)
-    # Initial send
-    start = 0
-    end = 10
-    initial_users = filtered_users[start:end]
+    if card is not None:
+        await interaction.followup.send(embed=embed, view=view, file=card)
+    else:
+        await interaction.followup.send(embed=embed, view=view)
 
-    embed = Embed(
-        title=f"🏆 Riddle Leaderboard (Page 1 / {(len(filtered_users) - 1) // 10 + 1})",
-        color=discord.Color.gold()
-    )
 
-    description_lines = []
-    max_score = max((scores.get(u, 0) for u in filtered_users), default=0)
 
-    for idx, user_id_str in enumerate(initial_users, start=1):
-        try:
-            user = await client.fetch_user(int(user_id_str))
-            score_val = scores.get(user_id_str, 0)
-            streak_val = streaks.get(user_id_str, 0)
-
-            score_line = f"{score_val}"
-            if score_val == max_score and max_score > 0:
-                score_line += " - 👑 🍣 Master Sushi Chef"
-
-            rank = get_rank(score_val)
-            streak_rank = get_streak_rank(streak_val)
-            streak_text = f"🔥{streak_val}"
-            if streak_rank:
-                streak_text += f" - {streak_rank}"
-
-            description_lines.append(f"#{idx} {user.display_name}:")
-            description_lines.append(f"    • Score: {score_line}")
-            description_lines.append(f"    • Rank: {rank}")
-            description_lines.append(f"    • Streak: {streak_text}")
-            description_lines.append("")
-        except Exception:
-            description_lines.append(f"#{idx} <@{user_id_str}> (failed to fetch user)")
-            description_lines.append("")
 
-    embed.description = "\n".join(description_lines) or "No users to display."
+@tree.command(name="riddlestats", description="Guess statistics for the current riddle or a past one")
+@app_commands.describe(riddle_id="A past riddle's number (leave empty for the current riddle)")
+@metrics.timed
+async def riddlestats(interaction: discord.Interaction, riddle_id: int = None):
+    if riddle_id is None:
+        live = rounds.get(interaction.channel_id)
+        if live is None and len(rounds) == 1:
+            live = next(iter(rounds))
+    else:
+        live = rounds.find_riddle(riddle_id)
+    if riddle_id is None or live is not None:
+        if live is None or live.stats is None:
+            await interaction.response.send_message("There is no riddle running right now.", ephemeral=True)
+            return
+        stats = live.stats.summary()
+        title = f"📊 Riddle #{stats['riddle_id']} so far"
+    else:
+        record = find_round_record(riddle_id)
+        stats = record.get("stats") if record else None
+        if not stats:
+            await interaction.response.send_message(f"❌ No statistics recorded for riddle #{riddle_id}.", ephemeral=True)
+            return
+        title = f"📊 Riddle #{riddle_id}"
+
+    embed = Embed(title=title, color=discord.Color.blurple())
+    embed.add_field(name="Guesses", value=str(stats["guesses"]))
+    embed.add_field(name="Players", value=str(stats["guessers"]))
+    embed.add_field(name="Solved", value=f"{stats['solvers']} ({stats['solve_rate']:.0%})")
+    if stats["median_solve_seconds"] is not None:
+        embed.add_field(name="Median time to solve", value=str(timedelta(seconds=int(stats["median_solve_seconds"]))))
+        embed.add_field(name="Fastest solve", value=str(timedelta(seconds=int(stats["first_solve_seconds"]))))
+
+    histogram = stats["guesses_per_user"]
+    if histogram:
+        widest = max(histogram.values())
+        lines = [f"{n} guess{'es' if int(n) != 1 else '  '} {'█' * max(1, round(users * 20 / widest))} {users}"
+                 for n, users in sorted(histogram.items(), key=lambda item: int(item[0]))]
+        embed.add_field(name="Guesses per player", value="```\n" + "\n".join(lines) + "\n```", inline=False)
+    await interaction.response.send_message(embed=embed, ephemeral=True)
+
+
+# --- Read-only HTTP API (WEB_API=1) ---
+#
+#   GET /api/leaderboard?page=1&per_page=10   ranked users, best first
+#   GET /api/users/<user_id>                  one user's score, streak and rank
+#   GET /api/riddles?page=1&per_page=10       the live rounds and revealed rounds, newest first
+#   GET /api/riddles/<riddle_id>              the latest revealed round of one riddle
+#
+# Everything is answered from memory: ranked_index, round_history and the live
+# rounds. Names come from the client cache only and are null when not cached.
+# Every response carries an ETag built from state_version, so a poller that
+# sends If-None-Match gets a bodyless 304 until something actually changes.
+
+def api_etag():
+    return f'"{STATE_EPOCH}-{state_version}"'
+
+
+def api_error(status, message):
+    return json_response({"error": message}, status=status)
+
+
+def api_page(query):
+    # (page, per_page, start) from ?page=&per_page=, clamped to sane values
+    try:
+        page = max(1, int(query.get("page", 1)))
+        per_page = min(API_MAX_PER_PAGE, max(1, int(query.get("per_page", ITEMS_PER_PAGE))))
+    except ValueError:
+        return None
+    return page, per_page, (page - 1) * per_page
+
+
+def api_name(user_id):
+    user = client.get_user(int(user_id))
+    return user.display_name if user is not None else user_names.get(user_id)
+
+
+def api_user_entry(user_id, score, streak, rank):
+    return {
+        "user_id": user_id,
+        "name": api_name(user_id),
+        "rank": rank,
+        "score": score,
+        "streak": streak,
+        "title": get_rank(score),
+        "streak_title": get_streak_rank(streak),
+    }
+
+
+def api_round_entry(summary):
+    riddle = riddle_index.get(summary["riddle_id"])
+    entry = dict(summary)
+    entry["question"] = riddle.get("question") if riddle else None
+    entry["answer"] = riddle.get("answer") if riddle else None
+    if rounds.find_riddle(summary["riddle_id"]) is not None:
+        entry["answer"] = None  # Posted again and live right now
+    return entry
+
+
+def api_leaderboard(path, query, headers):
+    etag = api_etag()
+    cached = not_modified(headers, etag)
+    if cached:
+        return cached
+    total = ranked_count()
+    paging = api_page(query)
+    if paging is None:
+        return api_error(400, "page and per_page must be integers")
+    page, per_page, start = paging
+    entries = ranked_index.entries(start, min(start + per_page, total))
+    return json_response({
+        "page": page,
+        "pages": max(1, -(-total // per_page)),
+        "total": total,
+        "users": [api_user_entry(uid, score, streak, ranked_index.rank(uid)) for uid, score, streak in entries],
+    }, etag)
+
+
+def api_user(path, query, headers):
+    user_id = path.rsplit("/", 1)[-1]
+    if not user_id.isdigit():
+        return api_error(404, "unknown user")
+    etag = api_etag()
+    cached = not_modified(headers, etag)
+    if cached:
+        return cached
+    if user_id in scores:
+        score, streak = scores[user_id], streaks.get(user_id, 0)
+    elif user_id in cold_top:
+        score, streak = cold_top[user_id]
+    else:
+        return api_error(404, "unknown user")  # Never played, or idle and not among the top (tiered cache)
+    rank = ranked_index.rank(user_id)
+    if rank is not None and rank > ranked_count():
+        rank = None  # Below where the tiered cache knows every user's standing
+    entry = api_user_entry(user_id, score, streak, rank)
+    entry["live_rounds"] = [{
+        "channel_id": rnd.channel_id,
+        "riddle_id": rnd.riddle_id,
+        "guesses": rnd.guess_attempts.get(user_id, 0),
+        "solved": user_id in rnd.correct_users,
+    } for rnd in rounds if user_id in rnd.guess_attempts]
+    return json_response(entry, etag)
+
+
+def api_riddles(path, query, headers):
+    etag = api_etag()
+    cached = not_modified(headers, etag)
+    if cached:
+        return cached
+    total = len(round_history)
+    paging = api_page(query)
+    if paging is None:
+        return api_error(400, "page and per_page must be integers")
+    page, per_page, start = paging
+    # Newest first: page 1 is the end of round_history
+    stop = max(0, total - start)
+    revealed = round_history[max(0, stop - per_page):stop][::-1]
+    live = [{
+        "channel_id": rnd.channel_id,
+        "riddle_id": rnd.riddle_id,
+        "question": rnd.riddle.get("question"),
+        "reveal_at": rnd.reveal_at.isoformat() if rnd.reveal_at else None,
+        "guessers": len(rnd.guess_attempts),
+        "solvers": len(rnd.correct_users),
+    } for rnd in rounds]
+    return json_response({
+        "page": page,
+        "pages": max(1, -(-total // per_page)),
+        "total": total,
+        "live": live,
+        "rounds": [api_round_entry(summary) for summary in revealed],
+    }, etag)
+
+
+def api_riddle(path, query, headers):
+    riddle_id = path.rsplit("/", 1)[-1]
+    etag = api_etag()
+    cached = not_modified(headers, etag)
+    if cached:
+        return cached
+    # A riddle can be posted more than once; show its latest revealed round
+    for summary in reversed(round_history):
+        if summary["riddle_id"] == riddle_id:
+            return json_response(api_round_entry(summary), etag)
+    return api_error(404, "no revealed round for this riddle")
+
+
+if WEB_API_ENABLED:
+    route("/api/leaderboard")(api_leaderboard)
+    route("/api/users/", prefix=True)(api_user)
+    route("/api/riddles")(api_riddles)
+    route("/api/riddles/", prefix=True)(api_riddle)
+
+
+MAX_GUESSES = 5
+
+
+# Apply one guess to a channel's live round (None if there is none) and report
+# what happened. Shared by on_message (message mode) and /guess (slash mode). Outcomes:
+#   "inactive", "ignored", "submitter_blocked", "already_correct",
+#   "out_of_guesses", "correct", "wrong", "wrong_penalized"
+def evaluate_guess(rnd, user_id, content):
+    if rnd is None or rnd.revealed:
+        return "inactive", 0
+
+    user_words = clean_and_filter(content)
+
+    # Only block submitter IF the active riddle is theirs AND they are trying to guess it
+    if rnd.riddle.get("submitter_id") == user_id:
+        if not rnd.answer_words.isdisjoint(user_words):
+            return "submitter_blocked", 0
+        return "ignored", 0
+
+    # If they've already answered correctly, ignore further guesses
+    if user_id in rnd.correct_users:
+        return "already_correct", 0
+
+    load_user(user_id)
+
+    # Track how many guesses they’ve made
+    attempts = rnd.guess_attempts.get(user_id, 0)
+    if attempts >= rnd.max_guesses:
+        return "out_of_guesses", 0
+
+    # Record this guess
+    rnd.guess_attempts[user_id] = attempts + 1
+    correct = not rnd.answer_words.isdisjoint(user_words)
+    if rnd.stats is not None:
+        rnd.stats.record(user_id, correct)
+    bump_state_version()
+
+    if correct:
+        if not rnd.correct_users and rnd.stats is not None:
+            first_solve_gap.observe(perf_time.time() - rnd.stats.started_at)
+        rnd.correct_users.add(user_id)
+        scores[user_id] = scores.get(user_id, 0) + 1
+        if rnd.counts_streak:
+            streaks[user_id] = streaks.get(user_id, 0) + 1
+        save_all_scores([user_id])
+        return "correct", 0
+
+    remaining = rnd.max_guesses - rnd.guess_attempts.get(user_id, 0)
+    if remaining == 0 and user_id not in rnd.deducted_for_user:
+        # Penalty on the last wrong guess
+        scores[user_id] = max(0, scores.get(user_id, 0) - 1)
+        if rnd.counts_streak:
+            streaks[user_id] = 0
+        rnd.deducted_for_user.add(user_id)
+        save_all_scores([user_id])
+        return "wrong_penalized", 0
+    return "wrong", remaining
 
-    await interaction.followup.send(embed=embed, view=view)
+
+def reveal_countdown_text(community, rnd=None):
+    now_utc = datetime.now(timezone.utc)
+    if rnd is not None and rnd.reveal_at is not None:
+        reveal_dt = rnd.reveal_at
+    else:
+        reveal_dt = scheduler.next_run(f"{community['id']}:reveal_riddle_answer")
+    if reveal_dt is None:
+        reveal_dt = datetime.combine(now_utc.date(), time(23, 0), tzinfo=timezone.utc)
+        if now_utc >= reveal_dt:
+            reveal_dt += timedelta(days=1)
+    delta = reveal_dt - now_utc
+    hours, remainder = divmod(int(delta.total_seconds()), 3600)
+    minutes = remainder // 60
+    return (
+        f"⏳ Answer will be revealed in {hours} hour{'s' if hours != 1 else ''} "
+        f"{minutes} minute{'s' if minutes != 1 else ''}."
+    )
 
 
+async def delete_quietly(message):
+    try:
+        await message.delete()
+    except Exception:
+        pass
 
 
 @client.event
+@metrics.timed
 async def on_message(message):
-    if message.author.bot:
+    if GUESS_MODE == "slash" or message.author.bot:
         return
 
-    ch_id = int(os.getenv("DISCORD_CHANNEL_ID") or 0)
-    if message.channel.id != ch_id:
+    community = community_by_channel.get(message.channel.id)
+    if community is None:
         return
 
-    global correct_users, guess_attempts, deducted_for_user, current_riddle, current_answer_revealed
-
+    rnd = rounds.get(message.channel.id)
     user_id = str(message.author.id)
     content = message.content.strip()
+    outcome, remaining = evaluate_guess(rnd, user_id, content)
+    if traffic_recorder is not None:
+        traffic_recorder.guess("message", message.channel.id, user_id, content, outcome)
 
     # If no riddle is active or it's already revealed, ignore all messages (they're not guesses)
-    if not current_riddle or current_answer_revealed:
+    if outcome in ("inactive", "ignored"):
         return
 
-    # Only block submitter IF the active riddle is theirs AND they are trying to guess it
-    if current_riddle.get("submitter_id") == user_id:
-        user_words = clean_and_filter(content)
-        answer_words = clean_and_filter(current_riddle["answer"])
-
-        # Only block if it looks like an answer attempt
-        if any(word in answer_words for word in user_words):
-            try:
-                await message.delete()
-            except:
-                pass
-            await message.channel.send(
-                "⛔ You submitted this riddle and cannot answer it.",
-                delete_after=10
-            )
-            return
-        else:
-            return 
+    if outcome == "submitter_blocked":
+        await delete_quietly(message)
+        await message.channel.send(
+            "⛔ You submitted this riddle and cannot answer it.",
+            delete_after=10
+        )
+        return
 
-    # If they've already answered correctly, ignore further guesses
-    if user_id in correct_users:
-        try: await message.delete()
-        except: pass
+    if outcome == "already_correct":
+        await delete_quietly(message)
         await message.channel.send(
             f"✅ You already answered correctly, {message.author.mention}. No more guesses counted.",
             delete_after=5
         )
         return
 
-    # Track how many guesses they’ve made
-    attempts = guess_attempts.get(user_id, 0)
-    if attempts >= 5:
-        try: await message.delete()
-        except: pass
+    if outcome == "out_of_guesses":
+        await delete_quietly(message)
         await message.channel.send(
             f"❌ You are out of guesses for this riddle, {message.author.mention}.",
             delete_after=5
         )
         return
 
-    # Record this guess
-    guess_attempts[user_id] = attempts + 1
-
-    # Check answer words
-    user_words = clean_and_filter(content)
-    answer_words = clean_and_filter(current_riddle["answer"])
-    
-    if any(word in user_words for word in answer_words):
-        # Correct
-        correct_users.add(user_id)
-        scores[user_id] = scores.get(user_id, 0) + 1
-        streaks[user_id] = streaks.get(user_id, 0) + 1
-        save_all_scores()
-        try:
-            await message.delete()
-        except:
-            pass
+    if outcome == "correct":
+        await delete_quietly(message)
         correct_guess_embed = discord.Embed(
             title="You guess correctly!",
             description=f"🥳 Correct, {message.author.mention}! Your total score: {scores[user_id]}",
@@ -542,14 +1876,7 @@ async def on_message(message):
         )
         await message.channel.send(embed=correct_guess_embed)
     else:
-        # Wrong
-        remaining = 5 - guess_attempts.get(user_id, 0)
-        if remaining == 0 and user_id not in deducted_for_user:
-            # Penalty on 5th wrong guess
-            scores[user_id] = max(0, scores.get(user_id, 0) - 1)
-            streaks[user_id] = 0
-            deducted_for_user.add(user_id)
-            save_all_scores()
+        if outcome == "wrong_penalized":
             await message.channel.send(
                 f"❌ Incorrect, {message.author.mention}. You've used all guesses and lost 1 point.",
                 delete_after=8
@@ -559,36 +1886,48 @@ async def on_message(message):
                 f"❌ Incorrect, {message.author.mention}. {remaining} guess(es) left.",
                 delete_after=6
             )
-        try:
-            await message.delete()
-        except:
-            pass
-
+        await delete_quietly(message)
 
     # Send countdown until reveal
-    now_utc = datetime.now(timezone.utc)
-    reveal_dt = datetime.combine(now_utc.date(), time(23, 0), tzinfo=timezone.utc)
-    if now_utc >= reveal_dt:
-        reveal_dt += timedelta(days=1)
-    delta = reveal_dt - now_utc
-    hours, remainder = divmod(int(delta.total_seconds()), 3600)
-    minutes = remainder // 60
-    countdown_msg = (
-        f"⏳ Answer will be revealed in {hours} hour{'s' if hours != 1 else ''} "
-        f"{minutes} minute{'s' if minutes != 1 else ''}."
-    )
-    await message.channel.send(countdown_msg, delete_after=12)
+    await message.channel.send(reveal_countdown_text(community, rnd), delete_after=12)
 
-@client.event
-async def on_ready():
-    print(f"Bot logged in as {client.user} (ID: {client.user.id})")
-    try:
-        synced = await tree.sync()
-        print(f"Synced {len(synced)} commands.")
-    except Exception as e:
-        print(f"Failed to sync commands: {e}")
+
+@app_commands.command(name="guess", description="Guess the answer to today's riddle (only you see the reply)")
+@app_commands.describe(answer="Your answer")
+@metrics.timed
+async def guess(interaction: discord.Interaction, answer: str):
+    community = community_by_channel.get(interaction.channel_id)
+    if community is None:
+        await interaction.response.send_message("❌ Guesses only count in the riddle channel.", ephemeral=True)
+        return
+
+    rnd = rounds.get(interaction.channel_id)
+    user_id = str(interaction.user.id)
+    answer = answer.strip()
+    outcome, remaining = evaluate_guess(rnd, user_id, answer)
+    if traffic_recorder is not None:
+        traffic_recorder.guess("slash", interaction.channel_id, user_id, answer, outcome)
+
+    if outcome in ("inactive", "ignored"):
+        reply = "There is no riddle to guess right now."
+    elif outcome == "submitter_blocked":
+        reply = "⛔ You submitted this riddle and cannot answer it."
+    elif outcome == "already_correct":
+        reply = "✅ You already answered correctly. No more guesses counted."
+    elif outcome == "out_of_guesses":
+        reply = "❌ You are out of guesses for this riddle."
+    elif outcome == "correct":
+        reply = f"🥳 Correct! Your total score: {scores[user_id]}\n{reveal_countdown_text(community, rnd)}"
+    elif outcome == "wrong_penalized":
+        reply = f"❌ Incorrect. You've used all guesses and lost 1 point.\n{reveal_countdown_text(community, rnd)}"
+    else:
+        reply = f"❌ Incorrect. {remaining} guess(es) left."
+    await interaction.response.send_message(reply, ephemeral=True)
 
 
+if GUESS_MODE == "slash":
+    tree.add_command(guess)
+
 @client.event
 async def on_command_error(interaction: discord.Interaction, error):
     if isinstance(error, app_commands.errors.MissingPermissions):
@@ -600,9 +1939,10 @@ async def on_command_error(interaction: discord.Interaction, error):
         print(f"Error in command {interaction.command}: {error}")
         traceback.print_exc()
 
-@tasks.loop(time=time(hour=11, minute=50, second=0))  # 10 minutes before daily post
-async def riddle_announcement():
-    channel_id = int(os.getenv("DISCORD_CHANNEL_ID") or 0)
+# Scheduled jobs. Each takes the community channel; see schedule_jobs() for the times.
+
+async def riddle_announcement(channel_id=None):
+    channel_id = channel_id or int(os.getenv("DISCORD_CHANNEL_ID") or 0)
     channel = client.get_channel(channel_id)
     if not channel:
         print("Riddle announcement skipped: Channel not found.")
@@ -616,144 +1956,236 @@ async def riddle_announcement():
 
     await channel.send(embed=embed)
 
+    # Do the post's work now, ten minutes before the spike, rather than at 12:00
+    if rounds.get(channel_id) is None and submitted_questions:
+        riddle = pick_next_riddle()
+        prepared_rounds[channel_id] = await prepare_round(riddle, "Anonymous", channel_id)
+        print(f"Prepared riddle #{riddle['id']} for the next post")
+
+
+# Everything a round needs before it goes live: the answer matcher, the rendered
+# post, the guess ring buffer and the channel's round settings. activate_round()
+# then only starts the clock and routes the channel's guesses to it.
+def new_round(riddle, submitter_name, channel_id=None):
+    channel_id = channel_id or default_channel_id()
+    community = community_by_channel.get(channel_id, {})
+    duration = community.get("round_minutes") or community.get("interval_minutes")
+    rapid = bool(community.get("interval_minutes"))
+    return Round(
+        channel_id,
+        riddle,
+        frozenset(clean_and_filter(riddle.get("answer", ""))),
+        guess_stats.RoundStats(riddle["id"]),
+        max_guesses=community.get("max_guesses", MAX_GUESSES),
+        counts_streak=community.get("streaks", not rapid),
+        duration_seconds=duration * 60 if duration else None,
+        embed=discord.Embed(
+            title=f"🧩 {'Rapid-Fire Riddle' if rapid else 'Riddle of the Day'} #{riddle['id']}",
+            description=f"**Riddle:** {riddle['question']}\n\n_(Riddle submitted by {submitter_name})_",
+            color=discord.Color.blurple()
+        ),
+    )
 
-@tasks.loop(time=time(hour=12, minute=0, second=0))  # Posts every day at noon UTC
-async def daily_riddle_post():
-    global current_riddle, current_answer_revealed, correct_users, guess_attempts, deducted_for_user
 
-    if current_riddle is not None:
-        # There is already an active riddle; skip
+async def prepare_round(riddle, default_name, channel_id=None):
+    submitter_name = default_name
+    if riddle.get("submitter_id"):
+        names = await resolve_user_names([riddle["submitter_id"]])
+        submitter_name = names.get(str(riddle["submitter_id"]), default_name)
+    return new_round(riddle, submitter_name, channel_id)
+
+
+def activate_round(rnd):
+    used_question_ids.add(str(rnd.riddle_id))
+    rnd.stats.started_at = perf_time.time()
+    if rnd.duration_seconds:
+        rnd.reveal_at = datetime.now(timezone.utc) + timedelta(seconds=rnd.duration_seconds)
+        schedule_round_reveal(rnd)
+    rounds.start(rnd)
+    bump_state_version()
+    if traffic_recorder is not None:
+        traffic_recorder.round_event("post", rnd.channel_id)
+
+
+# Rounds with a duration reveal on a one-shot timer rather than the daily schedule
+def schedule_round_reveal(rnd):
+    async def run(slot):
+        await leader.run_exclusive("reveal_riddle_answer", f"{rnd.channel_id}:{slot}",
+                                   reveal_riddle_answer, rnd.channel_id, rnd)
+    scheduler.add_once(f"{rnd.channel_id}:round_reveal", rnd.reveal_at, run)
+
+
+async def daily_riddle_post(channel_id=None):
+    channel_id = channel_id or default_channel_id()
+    live = rounds.get(channel_id)
+    if live is not None and live.reveal_at is not None and live.reveal_at <= datetime.now(timezone.utc):
+        # A rapid-fire round's reveal is due at the same moment as the next post; close it
+        # here rather than skip the post because the reveal timer has not run yet
+        await reveal_riddle_answer(channel_id, live)
+    if rounds.get(channel_id) is not None:
+        # There is already an active riddle in this channel; skip
         return
 
-    channel_id = int(os.getenv("DISCORD_CHANNEL_ID") or 0)
     channel = client.get_channel(channel_id)
     if not channel:
         print("Daily riddle post skipped: Channel not found.")
         return
 
-    if not submitted_questions:
-        print("No riddles available to post.")
-        return
+    prepared = prepared_rounds.pop(channel_id, None)
+    if prepared is None or riddle_index.get(prepared.riddle_id) is None:
+        # No announcement ran (or its riddle was removed since): prepare it now
+        if not submitted_questions:
+            print("No riddles available to post.")
+            return
+        prepared = await prepare_round(pick_next_riddle(), "Anonymous", channel_id)
+
+    activate_round(prepared)
+    await channel.send(embed=prepared.embed)
+    save_round_state()
+
+    print(f"Posted riddle #{prepared.riddle_id} in channel {channel_id}")
+
+REVEAL_TOP_N = 25                   # Solvers listed with score, rank and streak; the rest by name only
+REVEAL_MAX_SUMMARY_MESSAGES = 5     # Messages of plain solver names before "...and N more"
+EMBED_DESCRIPTION_LIMIT = 4096
+
+
+# Group lines so each group, joined with separator, fits in one embed description
+def chunk_lines(lines, limit=EMBED_DESCRIPTION_LIMIT, separator="\n"):
+    chunk = []
+    size = 0
+    for line in lines:
+        extra = len(line) + (len(separator) if chunk else 0)
+        if chunk and size + extra > limit:
+            yield chunk
+            chunk = []
+            extra = len(line)
+            size = 0
+        chunk.append(line)
+        size += extra
+    if chunk:
+        yield chunk
+
+
+# Close a round: streak resets, persistence and history. Runs before any
+# message is sent, so a slow or failed post cannot leave the round half-finished.
+def finish_round(rnd):
+    rounds.finish(rnd.channel_id)
+    scheduler.cancel(f"{rnd.channel_id}:round_reveal")
+    rnd.revealed = True
 
-    riddle = random.choice(submitted_questions)
-    current_riddle = riddle
-    current_answer_revealed = False
-    correct_users = set()
-    guess_attempts = {}
-    deducted_for_user = set()
+    # ✅ Streak reset for users who did not guess and are not the submitter
+    reset_user_ids = []
+    if rnd.counts_streak:
+        submitter_id = rnd.riddle.get("submitter_id")
+        for user_id_str, streak in streaks.items():
+            if streak == 0 or user_id_str in rnd.correct_users or user_id_str in rnd.guess_attempts:
+                continue
+            # Skip if user is today's riddle submitter
+            if submitter_id and user_id_str == str(submitter_id):
+                continue
+            reset_user_ids.append(user_id_str)
+        for user_id_str in reset_user_ids:
+            streaks[user_id_str] = 0
 
-    submitter_name = "Anonymous"
-    if riddle.get("submitter_id"):
-        user = client.get_user(int(riddle["submitter_id"]))
-        if user:
-            submitter_name = user.display_name
+    save_all_scores(reset_user_ids)
+    archive_round(rnd)
+    evict_idle_users()
+    save_round_state()
+    bump_state_version()
+    if traffic_recorder is not None:
+        traffic_recorder.round_event("reveal", rnd.channel_id)
+    return rnd.riddle, list(rnd.correct_users)
 
-    embed = discord.Embed(
-        title=f"🧩 Riddle of the Day #{riddle['id']}",
-        description=f"**Riddle:** {riddle['question']}\n\n_(Riddle submitted by {submitter_name})_",
-        color=discord.Color.blurple()
-    )
-    await channel.send(embed=embed)
 
-    print(f"Posted daily riddle #{riddle['id']}")
+# Names straight from the client cache; anyone not cached is shown as a mention,
+# which Discord renders as their name without a REST lookup per solver
+def cached_display_name(user_id):
+    user = client.get_user(int(user_id))
+    if user is not None:
+        return user.display_name
+    return user_names.get(str(user_id), f"<@{user_id}>")
 
-from datetime import timedelta
 
-@tasks.loop(time=time(hour=23, minute=0, second=0))  # Runs at 23:00 UTC daily
-async def reveal_riddle_answer():
-    global current_riddle, current_answer_revealed, correct_users, guess_attempts, deducted_for_user
+def solver_lines(solvers):
+    max_score = top_score()
+    for idx, user_id_str in enumerate(solvers, start=1):
+        score_val = scores.get(user_id_str, 0)
+        streak_val = streaks.get(user_id_str, 0)
 
-    if not current_riddle or current_answer_revealed:
-        return  # Nothing to reveal
+        score_line = f"{score_val}"
+        if score_val == max_score and max_score > 0:
+            score_line += " - 👑 🍣 Master Sushi Chef"
 
-    channel_id = int(os.getenv("DISCORD_CHANNEL_ID") or 0)
-    channel = client.get_channel(channel_id)
-    if not channel:
-        print("Answer reveal skipped: Channel not found.")
-        return
+        streak_rank = get_streak_rank(streak_val)
+        streak_line = f"🔥{streak_val}"
+        if streak_rank:
+            streak_line += f" - {streak_rank}"
+
+        yield (f"#{idx} {cached_display_name(user_id_str)}:\n"
+               f"    • Score: {score_line}\n"
+               f"    • Rank: {get_rank(score_val)}\n"
+               f"    • Streak: {streak_line}\n")
 
-    answer = current_riddle.get("answer", "Unknown")
-    riddle_id = current_riddle.get("id", "???")
 
-    # Post the answer
+async def post_reveal(channel, riddle, solvers):
     embed = discord.Embed(
-        title=f"🔔 Answer to Riddle #{riddle_id}",
-        description=f"**Answer:** {answer}\n\n💡 Use `/submitriddle` to submit your own riddle!",
+        title=f"🔔 Answer to Riddle #{riddle.get('id', '???')}",
+        description=f"**Answer:** {riddle.get('answer', 'Unknown')}\n\n💡 Use `/submitriddle` to submit your own riddle!",
         color=discord.Color.green()
     )
     await channel.send(embed=embed)
 
-    # Post congratulations
-    if correct_users:
-        max_score = max(scores.values()) if scores else 0
-        congrats_embed = discord.Embed(
-            title="🎊 Congratulations to the following users who solved today's riddle! 🎊",
-            color=discord.Color.gold()
-        )
-        description_lines = []
-        for idx, user_id_str in enumerate(correct_users, start=1):
-            try:
-                user = await client.fetch_user(int(user_id_str))
-                score_val = scores.get(user_id_str, 0)
-                streak_val = streaks.get(user_id_str, 0)
-
-                score_line = f"{score_val}"
-                if score_val == max_score and max_score > 0:
-                    score_line += " - 👑 🍣 Master Sushi Chef"
-
-                rank = get_rank(score_val)
-                streak_rank = get_streak_rank(streak_val)
-                streak_line = f"🔥{streak_val}"
-                if streak_rank:
-                    streak_line += f" - {streak_rank}"
-
-                description_lines.append(f"#{idx} {user.display_name}:")
-                description_lines.append(f"    • Score: {score_line}")
-                description_lines.append(f"    • Rank: {rank}")
-                description_lines.append(f"    • Streak: {streak_line}")
-                description_lines.append("")
-            except Exception:
-                description_lines.append(f"#{idx} <@{user_id_str}>")
-                description_lines.append("")
-        congrats_embed.description = "\n".join(description_lines)
-        await channel.send(embed=congrats_embed)
-    else:
+    if not solvers:
         await channel.send("😢 No one guessed the riddle correctly today.")
+        return
 
-    # ✅ Streak reset for users who did not guess and are not the submitter
-    submitter_id = current_riddle.get("submitter_id")
-
-    for user_id_str in list(streaks.keys()):
-        # Skip users who got it correct
-        if user_id_str in correct_users:
-            continue
-
-        # Skip if user is today's riddle submitter
-        if submitter_id and user_id_str == str(submitter_id):
-            continue
-
-        # If the user made 0 attempts, reset their streak
-        if user_id_str not in guess_attempts:
-            streaks[user_id_str] = 0
+    solvers.sort(key=lambda uid: (scores.get(uid, 0), streaks.get(uid, 0)), reverse=True)
+    top, rest = solvers[:REVEAL_TOP_N], solvers[REVEAL_TOP_N:]
+
+    title = "🎊 Congratulations to the following users who solved today's riddle! 🎊"
+    for chunk in chunk_lines(solver_lines(top)):
+        await channel.send(embed=discord.Embed(title=title, description="\n".join(chunk), color=discord.Color.gold()))
+        title = None
+
+    # Everyone else by name only, in a bounded number of messages
+    listed = 0
+    title = f"🎉 Also solved by {len(rest)} more"
+    names = (cached_display_name(uid) for uid in rest)
+    for n, chunk in enumerate(chunk_lines(names, limit=EMBED_DESCRIPTION_LIMIT - 32, separator=", ")):
+        listed += len(chunk)
+        description = ", ".join(chunk)
+        last = n == REVEAL_MAX_SUMMARY_MESSAGES - 1
+        if last and listed < len(rest):
+            description += f"\n\n…and {len(rest) - listed} more!"
+        await channel.send(embed=discord.Embed(title=title, description=description, color=discord.Color.gold()))
+        title = None
+        if last:
+            break
+
+
+async def reveal_riddle_answer(channel_id=None, expected=None):
+    # expected: the round a timer was set for; a later round in the channel is left alone
+    channel_id = channel_id or default_channel_id()
+    rnd = rounds.get(channel_id)
+    if rnd is None or rnd.revealed or (expected is not None and rnd is not expected):
+        return  # Nothing to reveal
 
-    save_all_scores()
+    channel = client.get_channel(channel_id)
+    if not channel:
+        print("Answer reveal skipped: Channel not found.")
+        return
 
-    # ✅ Reset state
-    current_answer_revealed = True
-    current_riddle = None
-    correct_users.clear()
-    guess_attempts.clear()
-    deducted_for_user.clear()
+    riddle, solvers = finish_round(rnd)
+    await post_reveal(channel, riddle, solvers)
 
 
 async def daily_riddle_post_callback():
-    global current_riddle, current_answer_revealed, correct_users, guess_attempts, deducted_for_user
-
-    if current_riddle is not None:
+    channel_id = default_channel_id()
+    if rounds.get(channel_id) is not None:
         print("⛔ Skipping manual riddle post: one already exists.")
         return
 
-    channel_id = int(os.getenv("DISCORD_CHANNEL_ID") or 0)
     channel = client.get_channel(channel_id)
     if not channel:
         print("⚠️ Could not find channel for riddle post.")
@@ -763,43 +2195,95 @@ async def daily_riddle_post_callback():
         print("⛔ No riddles available to post.")
         return
 
-    riddle = pick_next_riddle()
-    current_riddle = riddle
-    current_answer_revealed = False
-    correct_users = set()
-    guess_attempts = {}
-    deducted_for_user = set()
+    prepared = await prepare_round(pick_next_riddle(), "Riddle of the day bot", channel_id)
+    activate_round(prepared)
+    save_round_state()
 
-    submitter_name = "Riddle of the day bot"
-    if riddle.get("submitter_id"):
-        user = client.get_user(int(riddle["submitter_id"]))
-        if user:
-            submitter_name = user.display_name
-
-    embed = discord.Embed(
-        title=f"🧩 Riddle of the Day #{riddle['id']}",
-        description=f"**Riddle:** {riddle['question']}\n\n_(Riddle submitted by {submitter_name})_",
-        color=discord.Color.blurple()
-    )
-    await channel.send(embed=embed)
-    print(f"✅ Sent manual riddle post #{riddle['id']}.")
+    await channel.send(embed=prepared.embed)
+    print(f"✅ Sent manual riddle post #{prepared.riddle_id}.")
 
 
 @client.event
 async def on_ready():
-    await create_db_pool()
     print(f"Bot logged in as {client.user} (ID: {client.user.id})")
+    first_ready = "time_to_ready" not in startup_timings
+    if first_ready:
+        startup_timings["time_to_ready"] = perf_time.perf_counter() - STARTUP_STARTED
+
+    if os.getenv("DATABASE_URL"):
+        try:
+            await create_db_pool()
+        except Exception as e:
+            print(f"Failed to create database pool: {e}")
+    if CHANGE_FEED_ENABLED:
+        change_feed.set_handler(apply_remote_change)
+        await change_feed.start()
+    metrics.start_event_loop_monitor()
+    if METRICS_PORT:
+        try:
+            await start_http_server(METRICS_HOST, METRICS_PORT)
+        except OSError as e:
+            print(f"Failed to start metrics endpoint: {e}")
+    # Only the scheduler lease holder actually runs the jobs below (see leader.py)
     try:
-        synced = await tree.sync()
-        print(f"Synced {len(synced)} commands.")
+        await leader.start()
     except Exception as e:
-        print(f"Failed to sync commands: {e}")
+        print(f"Failed to start scheduler lease: {e}")
+
+    # on_ready fires again after every reconnect; the scheduler only starts once
+    schedule_jobs()
+    scheduler.start()
+
+    if first_ready:
+        phases = ", ".join(f"{name} {seconds:.2f}s" for name, seconds in startup_timings.items())
+        print(f"Startup timings: {phases}")
+
+
+def _minutes_between(start, end):
+    return ((end.hour * 60 + end.minute) - (start.hour * 60 + start.minute)) % (24 * 60)
+
+
+def schedule_jobs():
+    for community in communities:
+        if community["interval_minutes"]:
+            # Each round reveals itself on a one-shot timer (schedule_round_reveal)
+            scheduler.add_interval(f"{community['id']}:rapid_post", community["interval_minutes"] * 60,
+                                   _community_job("daily_riddle_post", daily_riddle_post, community))
+            continue
+        tz = ZoneInfo(community["timezone"])
+        announce_at = parse_clock(community["announce_time"])
+        post_at = parse_clock(community["post_time"])
+        reveal_at = parse_clock(community["reveal_time"])
+        # Catch up a missed post only while there is still time before the reveal
+        post_lateness = min(6 * 3600, _minutes_between(post_at, reveal_at) * 30)
+        jobs = (
+            ("riddle_announcement", announce_at, riddle_announcement, _minutes_between(announce_at, post_at) * 60),
+            ("daily_riddle_post", post_at, daily_riddle_post, post_lateness),
+            ("reveal_riddle_answer", reveal_at, reveal_riddle_answer, 12 * 3600),
+        )
+        for job_name, at, func, max_lateness in jobs:
+            scheduler.add_daily(f"{community['id']}:{job_name}", at, tz,
+                                _community_job(job_name, func, community), max_lateness)
+    for rnd in rounds:
+        if rnd.reveal_at is not None:
+            schedule_round_reveal(rnd)  # Restored rounds keep their reveal time; a past one runs at once
+    scheduler.add_interval("round_checkpoint", ROUND_CHECKPOINT_SECONDS, _checkpoint_round)
+    if SNAPSHOT_SECONDS > 0:
+        scheduler.add_interval("state_snapshot", SNAPSHOT_SECONDS, _snapshot_job)
+
+
+def _community_job(job_name, func, community):
+    async def run(slot):
+        if slot is None:
+            slot = datetime.now(timezone.utc).strftime("%Y-%m-%dT%H:%M")  # Interval jobs: one run per minute
+        await leader.run_exclusive(job_name, f"{community['id']}:{slot}", func, community["channel_id"])
+    return run
+
+
+async def _checkpoint_round(slot):
+    if rounds:
+        save_round_state()
 
-    # <<< ADD THESE LINES RIGHT HERE >>>
-    daily_riddle_post.start()
-    riddle_announcement.start()
-    reveal_riddle_answer.start()
- 
 
 if __name__ == "__main__":
     TOKEN = os.getenv("DISCORD_BOT_TOKEN")
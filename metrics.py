@@ -0,0 +1,216 @@
+import asyncio
+import functools
+import re
+import time
+from bisect import bisect_left
+
+from http_server import route
+
+# In-process metrics exposed in Prometheus text format on /metrics.
+# Everything here is plain dict/list arithmetic so it is cheap enough to leave on.
+
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+REGISTRY = []
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(labelnames, values, extra=None):
+    pairs = list(zip(labelnames, values))
+    if extra:
+        pairs.append(extra)
+    if not pairs:
+        return ""
+    inner = ",".join(f'{k}="{_escape(v)}"' for k, v in pairs)
+    return "{" + inner + "}"
+
+
+class Counter:
+    kind = "counter"
+
+    def __init__(self, name, help_text, labelnames=()):
+        self.name = name
+        self.help = help_text
+        self.labelnames = tuple(labelnames)
+        self.values = {}
+        REGISTRY.append(self)
+
+    def inc(self, *labels, amount=1):
+        self.values[labels] = self.values.get(labels, 0) + amount
+
+    def get(self, *labels):
+        return self.values.get(labels, 0)
+
+    def render(self):
+        for labels, value in self.values.items():
+            yield f"{self.name}{_format_labels(self.labelnames, labels)} {value}"
+
+
+class Gauge:
+    kind = "gauge"
+
+    # fn, when given, is called at scrape time instead of storing a value
+    def __init__(self, name, help_text, labelnames=(), fn=None):
+        self.name = name
+        self.help = help_text
+        self.labelnames = tuple(labelnames)
+        self.values = {}
+        self.fn = fn
+        REGISTRY.append(self)
+
+    def set(self, value, *labels):
+        self.values[labels] = value
+
+    def get(self, *labels):
+        return self.values.get(labels, 0)
+
+    def render(self):
+        if self.fn is not None:
+            try:
+                yield f"{self.name} {self.fn()}"
+            except Exception:
+                pass
+            return
+        for labels, value in self.values.items():
+            yield f"{self.name}{_format_labels(self.labelnames, labels)} {value}"
+
+
+class Histogram:
+    kind = "histogram"
+
+    def __init__(self, name, help_text, labelnames=(), buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.help = help_text
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(buckets)
+        self.series = {}  # labels -> [bucket counts..., +Inf count, sum]
+        REGISTRY.append(self)
+
+    def observe(self, value, *labels):
+        series = self.series.get(labels)
+        if series is None:
+            series = [0] * (len(self.buckets) + 2)
+            self.series[labels] = series
+        series[bisect_left(self.buckets, value)] += 1
+        series[-1] += value
+
+    def count(self, *labels):
+        series = self.series.get(labels)
+        return sum(series[:-1]) if series else 0
+
+    def render(self):
+        for labels, series in self.series.items():
+            cumulative = 0
+            for bound, count in zip(self.buckets, series):
+                cumulative += count
+                le = _format_labels(self.labelnames, labels, ("le", bound))
+                yield f"{self.name}_bucket{le} {cumulative}"
+            cumulative += series[len(self.buckets)]
+            yield f"{self.name}_bucket{_format_labels(self.labelnames, labels, ('le', '+Inf'))} {cumulative}"
+            yield f"{self.name}_sum{_format_labels(self.labelnames, labels)} {series[-1]}"
+            yield f"{self.name}_count{_format_labels(self.labelnames, labels)} {cumulative}"
+
+
+def render_prometheus():
+    lines = []
+    for metric in REGISTRY:
+        lines.append(f"# HELP {metric.name} {metric.help}")
+        lines.append(f"# TYPE {metric.name} {metric.kind}")
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
+
+
+@route("/metrics")
+def metrics_endpoint(path, query, headers):
+    return 200, {"Content-Type": "text/plain; version=0.0.4; charset=utf-8"}, render_prometheus()
+
+
+# --- Bot metrics ---
+
+handler_latency = Histogram(
+    "riddle_handler_latency_seconds", "Time spent in slash commands and gateway event handlers", ("handler",))
+handler_errors = Counter(
+    "riddle_handler_errors_total", "Handlers that raised an exception", ("handler",))
+event_loop_lag = Histogram(
+    "riddle_event_loop_lag_seconds", "How late the event loop woke up a periodic sleeper",
+    buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 5.0))
+persistence_flush_seconds = Histogram(
+    "riddle_persistence_flush_seconds", "Duration of writing a data file", ("file",))
+persistence_flush_bytes = Gauge(
+    "riddle_persistence_flush_bytes", "Size of the last write of a data file", ("file",))
+rest_requests = Counter(
+    "riddle_rest_requests_total", "Discord REST calls by route and status", ("method", "route", "status"))
+rest_rate_limited = Counter(
+    "riddle_rest_rate_limited_total", "Discord REST calls answered with 429", ("method", "route"))
+cache_requests = Counter(
+    "riddle_cache_requests_total", "Cache lookups by cache and result (hit/miss)", ("cache", "result"))
+
+
+def timed(func):
+    # Records latency for a coroutine handler, labelled with its function name.
+    # functools.wraps keeps the signature visible to discord.py's command parser.
+    name = func.__name__
+
+    @functools.wraps(func)
+    async def wrapper(*args, **kwargs):
+        start = time.perf_counter()
+        try:
+            return await func(*args, **kwargs)
+        except Exception:
+            handler_errors.inc(name)
+            raise
+        finally:
+            handler_latency.observe(time.perf_counter() - start, name)
+    return wrapper
+
+
+def record_cache(cache, hit):
+    cache_requests.inc(cache, "hit" if hit else "miss")
+
+
+_SNOWFLAKE_RE = re.compile(r"/\d{15,21}(?=/|$)")
+_TOKEN_RE = re.compile(r"/[A-Za-z0-9_\-\.]{40,}(?=/|$)")
+
+
+def _route_template(path):
+    # /api/v10/channels/123.../messages -> /channels/{id}/messages
+    if "/api/v" in path:
+        path = "/" + path.split("/api/v", 1)[1].split("/", 1)[-1]
+    path = _TOKEN_RE.sub("/{token}", path)
+    return _SNOWFLAKE_RE.sub("/{id}", path)
+
+
+def http_trace():
+    # aiohttp trace hooks for discord.Client(http_trace=...), counting REST calls
+    import aiohttp
+
+    async def on_request_end(session, ctx, params):
+        route_name = _route_template(params.url.path)
+        status = params.response.status
+        rest_requests.inc(params.method, route_name, status)
+        if status == 429:
+            rest_rate_limited.inc(params.method, route_name)
+
+    trace = aiohttp.TraceConfig()
+    trace.on_request_end.append(on_request_end)
+    return trace
+
+
+_lag_task = None
+
+
+async def _monitor_event_loop(interval):
+    loop = asyncio.get_running_loop()
+    while True:
+        start = loop.time()
+        await asyncio.sleep(interval)
+        event_loop_lag.observe(max(0.0, loop.time() - start - interval))
+
+
+def start_event_loop_monitor(interval=0.5):
+    global _lag_task
+    if _lag_task is None or _lag_task.done():
+        _lag_task = asyncio.get_running_loop().create_task(_monitor_event_loop(interval))
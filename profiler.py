@@ -0,0 +1,120 @@
+import asyncio
+import os
+import sys
+import threading
+import time
+import tracemalloc
+
+# On-demand profiling of the running bot.
+#
+# sample_stacks() is a wall-clock sampling profiler: a background thread reads the
+# event loop thread's current frame every few milliseconds and counts collapsed
+# stacks ("outer;inner;leaf count"), the format flamegraph.pl and speedscope read.
+# Nothing is hooked into the interpreter, so overhead is one stack walk per sample.
+#
+# trace_allocations() runs tracemalloc for a window and reports the top-N lines by
+# memory allocated during it.
+
+MAX_SECONDS = 120
+DEFAULT_INTERVAL = 0.005
+
+_session_lock = asyncio.Lock()
+
+
+def is_busy():
+    return _session_lock.locked()
+
+
+def _frame_label(frame):
+    code = frame.f_code
+    filename = os.path.basename(code.co_filename)
+    return f"{code.co_name} ({filename}:{frame.f_lineno})"
+
+
+class StackSampler(threading.Thread):
+    def __init__(self, target_thread_id, interval=DEFAULT_INTERVAL):
+        super().__init__(name="stack-sampler", daemon=True)
+        self.target_thread_id = target_thread_id
+        self.interval = interval
+        self.stacks = {}
+        self.samples = 0
+        self._stop_event = threading.Event()
+
+    def run(self):
+        while not self._stop_event.wait(self.interval):
+            frame = sys._current_frames().get(self.target_thread_id)
+            if frame is None:
+                continue
+            labels = []
+            while frame is not None:
+                labels.append(_frame_label(frame))
+                frame = frame.f_back
+            key = ";".join(reversed(labels))
+            self.stacks[key] = self.stacks.get(key, 0) + 1
+            self.samples += 1
+
+    def stop(self):
+        self._stop_event.set()
+        self.join()
+
+
+def format_collapsed(stacks):
+    lines = [f"{stack} {count}" for stack, count in sorted(stacks.items(), key=lambda x: x[1], reverse=True)]
+    return "\n".join(lines) + "\n"
+
+
+def format_top_functions(stacks, samples, top):
+    # Self time: samples where the function was the innermost frame
+    leaf_counts = {}
+    for stack, count in stacks.items():
+        leaf = stack.rsplit(";", 1)[-1]
+        leaf_counts[leaf] = leaf_counts.get(leaf, 0) + count
+    lines = [f"Top {top} frames by self samples ({samples} samples):"]
+    for leaf, count in sorted(leaf_counts.items(), key=lambda x: x[1], reverse=True)[:top]:
+        lines.append(f"{count:8d}  {count * 100 / max(samples, 1):5.1f}%  {leaf}")
+    return "\n".join(lines) + "\n"
+
+
+async def sample_stacks(seconds, top=25, interval=DEFAULT_INTERVAL):
+    # Must be awaited on the event loop thread: that is the thread being sampled
+    seconds = max(1, min(seconds, MAX_SECONDS))
+    async with _session_lock:
+        sampler = StackSampler(threading.get_ident(), interval)
+        started = time.perf_counter()
+        sampler.start()
+        try:
+            await asyncio.sleep(seconds)
+        finally:
+            sampler.stop()
+        elapsed = time.perf_counter() - started
+
+    header = f"# CPU sampling profile: {elapsed:.1f}s, every {interval * 1000:.0f}ms, {sampler.samples} samples\n"
+    summary = format_top_functions(sampler.stacks, sampler.samples, top)
+    return header + summary, format_collapsed(sampler.stacks)
+
+
+async def trace_allocations(seconds, top=25, frames=10):
+    seconds = max(1, min(seconds, MAX_SECONDS))
+    async with _session_lock:
+        already_tracing = tracemalloc.is_tracing()
+        if not already_tracing:
+            tracemalloc.start(frames)
+        try:
+            before = tracemalloc.take_snapshot()
+            await asyncio.sleep(seconds)
+            after = tracemalloc.take_snapshot()
+            current, peak = tracemalloc.get_traced_memory()
+        finally:
+            if not already_tracing:
+                tracemalloc.stop()
+
+    filters = [tracemalloc.Filter(False, tracemalloc.__file__)]
+    diff = after.filter_traces(filters).compare_to(before.filter_traces(filters), "lineno")
+    lines = [
+        f"# Allocation profile: {seconds}s window",
+        f"# Traced memory now {current / 1024:.1f} KiB, peak {peak / 1024:.1f} KiB",
+        f"Top {top} lines by memory allocated during the window:",
+    ]
+    for stat in diff[:top]:
+        lines.append(str(stat))
+    return "\n".join(lines) + "\n"
@@ -0,0 +1,167 @@
+import argparse
+import asyncio
+import atexit
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+# Replay a recorded guess log (see traffic.py) through the bot's real handlers.
+#
+#   python replay.py traffic.jsonl               # original timing
+#   python replay.py traffic.jsonl --speed 10    # ten times faster
+#   python replay.py traffic.jsonl --speed max   # no waiting between events
+#
+# Each guess is dispatched as its own task at its (scaled) recorded time, the way
+# discord.py dispatches gateway events, and runs through on_message or /guess
+# against the stubbed client in fake_discord.py. Latency is measured from when
+# the event was due to when its handler finished, so it includes time spent
+# waiting for the event loop. The report lists latency percentiles per kind
+# and every outbound call the handlers made.
+#
+# The replay plays one synthetic riddle per recorded round, in the channel the
+# round ran in. Guesses recorded as
+# correct are replayed with its answer and every other guess with the recorded
+# text (or its digest), so the mix of right and wrong guesses matches the
+# recording. Guesses blocked because the player submitted the riddle replay as
+# ordinary wrong guesses.
+
+REPO_DIR = os.path.dirname(os.path.abspath(__file__))
+START_DIR = os.getcwd()
+
+# main.py loads its JSON files from the working directory at import time, so
+# import it from an empty scratch directory to keep real data untouched.
+WORK_DIR = tempfile.mkdtemp(prefix="riddle-replay-")
+atexit.register(shutil.rmtree, WORK_DIR, ignore_errors=True)
+os.chdir(WORK_DIR)
+os.environ.pop("TRAFFIC_LOG", None)
+sys.path.insert(0, REPO_DIR)
+
+import main  # noqa: E402
+import traffic  # noqa: E402
+from fake_discord import FakeClient, FakeInteraction, FakeMessage  # noqa: E402
+
+REPLAY_ANSWER = "lantern"
+
+
+def start_round(number, channel_id):
+    riddle = {"id": str(number), "question": f"Replayed riddle {number}", "answer": REPLAY_ANSWER,
+              "submitter_id": None}
+    main.add_riddle(riddle)
+    main.activate_round(main.new_round(riddle, "Replay", channel_id))
+
+
+def setup(events):
+    main.GUESS_MODE = "message"     # on_message ignores everything in slash mode
+    main.client = FakeClient()
+    channel_ids = sorted({event[2] for event in events if len(event) > 2})
+    main.communities = [{
+        "id": str(channel_id), "channel_id": channel_id, "timezone": "UTC",
+        "announce_time": main.ANNOUNCE_TIME, "post_time": main.POST_TIME, "reveal_time": main.REVEAL_TIME,
+        "interval_minutes": None, "round_minutes": None, "max_guesses": main.MAX_GUESSES, "streaks": True,
+    } for channel_id in channel_ids]
+    main.community_by_channel = {c["channel_id"]: c for c in main.communities}
+    for channel_id in channel_ids:
+        main.client.add_channel(channel_id)
+
+
+async def dispatch(event, due, latencies):
+    ms, kind, channel_id, user_id, content, outcome = event
+    if outcome == "correct":
+        content = REPLAY_ANSWER
+    channel = main.client.get_channel(channel_id)
+    user = main.client._user(user_id)
+    if kind == "message":
+        await main.on_message(FakeMessage(channel, user, content, main.client.calls))
+    else:
+        await main.guess.callback(FakeInteraction(user, main.client, channel), content)
+    latencies.setdefault(kind, []).append(time.perf_counter() - due)
+
+
+async def replay(events, speed):
+    latencies = {}
+    pending = set()
+    rounds = 0
+    # Channels whose recording started mid-round: the first thing seen there is a live guess
+    seen = set()
+    for event in events:
+        if len(event) < 3:
+            break               # A round boundary in every channel
+        channel_id = event[2]
+        if channel_id in seen:
+            continue
+        seen.add(channel_id)
+        if event[1] in traffic.GUESS_KINDS and event[5] != "inactive":
+            rounds += 1
+            start_round(rounds, channel_id)
+
+    started = time.perf_counter()
+    for event in events:
+        due = time.perf_counter()
+        if speed is not None:
+            due = started + event[0] / 1000 / speed
+            if due > time.perf_counter():
+                await asyncio.sleep(due - time.perf_counter())
+        kind = event[1]
+        if kind in traffic.GUESS_KINDS:
+            task = asyncio.create_task(dispatch(event, due, latencies))
+            pending.add(task)
+            task.add_done_callback(pending.discard)
+            continue
+        # Round boundaries: let the guesses already dispatched finish first
+        if pending:
+            await asyncio.gather(*pending)
+        # Logs from before rounds were per channel carry no channel: one round, in every channel
+        channel_ids = [event[2]] if len(event) > 2 else [c["channel_id"] for c in main.communities]
+        for channel_id in channel_ids:
+            rnd = main.rounds.get(channel_id)
+            if rnd is not None:
+                main.finish_round(rnd)
+            if kind == "post":
+                rounds += 1
+                start_round(rounds, channel_id)
+    if pending:
+        await asyncio.gather(*pending)
+    return latencies, rounds, time.perf_counter() - started
+
+
+def percentile(sorted_values, fraction):
+    return sorted_values[min(len(sorted_values) - 1, int(len(sorted_values) * fraction))]
+
+
+def report(latencies, rounds, elapsed, calls, recorded_seconds):
+    guesses = sum(len(values) for values in latencies.values())
+    print(f"Replayed {guesses} guesses over {rounds} rounds in {elapsed:.2f}s "
+          f"(recorded over {recorded_seconds:.2f}s, {guesses / max(elapsed, 1e-9):.0f} guesses/s)")
+    print(f"{'kind':<10}{'count':>8}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'max ms':>10}")
+    for kind, values in sorted(latencies.items()):
+        values.sort()
+        print(f"{kind:<10}{len(values):>8}" + "".join(
+            f"{percentile(values, q) * 1000:>10.2f}" for q in (0.50, 0.95, 0.99, 1.0)))
+    print(f"Outbound calls: {calls.total()} ({calls.total() / max(guesses, 1):.2f} per guess)")
+    for name, count in sorted(calls.counts.items(), key=lambda item: item[1], reverse=True):
+        print(f"  {name:<24}{count:>8}")
+
+
+def main_cli():
+    parser = argparse.ArgumentParser(description="Replay a recorded guess log through the bot's handlers.")
+    parser.add_argument("log", help="Traffic log written with TRAFFIC_LOG set")
+    parser.add_argument("--speed", default="1", help="Playback speed: a multiplier such as 1 or 10, or 'max'")
+    args = parser.parse_args()
+
+    speed = None if args.speed == "max" else float(args.speed)
+    if speed is not None and speed <= 0:
+        parser.error("--speed must be positive or 'max'")
+    header, events = traffic.read_log(os.path.join(START_DIR, args.log))
+    print(f"Log started {header['started_at']}, content {header['content']}, {len(events)} events")
+
+    setup(events)
+    latencies, rounds, elapsed = asyncio.run(replay(events, speed))
+    recorded_seconds = events[-1][0] / 1000 if events else 0
+    report(latencies, rounds, elapsed, main.client.calls, recorded_seconds)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main_cli())
@@ -0,0 +1,126 @@
+from bisect import bisect_left, bisect_right, insort
+from itertools import islice
+
+# In-memory indexes over the riddle catalog, kept up to date on every submit and
+# remove so /listriddles and /submitriddle never scan the whole list:
+#   - ids sorted numerically, for keyset pagination ("the page after id N")
+#   - normalized question -> id, for duplicate detection
+#   - token -> set of ids over question and answer text, for search; built on the
+#     first search rather than at load, since tokenizing the catalog dominates startup
+
+
+class RiddleIndex:
+    def __init__(self, tokenize, normalize):
+        self.tokenize = tokenize      # text -> list of search tokens
+        self.normalize = normalize    # question -> duplicate-detection key
+        self.clear()
+
+    def clear(self):
+        self.ids = []                 # sorted int ids
+        self.by_id = {}               # int id -> riddle dict
+        self.by_question = {}         # normalized question -> int id
+        self.postings = None          # token -> set of int ids, once built
+
+    def rebuild(self, riddles):
+        self.clear()
+        for riddle in riddles:
+            key = self._key(riddle.get("id"))
+            if key is not None:
+                self.by_id[key] = riddle  # Later duplicates of an id win, as in the riddle log
+        self.ids = sorted(self.by_id)
+        normalize = self.normalize
+        self.by_question = {normalize(riddle.get("question", "")): key for key, riddle in self.by_id.items()}
+
+    def restore(self, riddles, ids, by_question):
+        # Reuse ids and by_question saved in a state snapshot instead of recomputing them
+        self.clear()
+        self.by_id = {int(riddle["id"]): riddle for riddle in riddles if str(riddle.get("id")).isdigit()}
+        self.ids = ids
+        self.by_question = by_question
+
+    def __len__(self):
+        return len(self.ids)
+
+    def _key(self, riddle_id):
+        riddle_id = str(riddle_id)
+        return int(riddle_id) if riddle_id.isdigit() else None
+
+    def _tokens(self, riddle):
+        return set(self.tokenize(f"{riddle.get('question', '')} {riddle.get('answer', '')}"))
+
+    def _index_text(self, key, riddle):
+        self.by_question[self.normalize(riddle.get("question", ""))] = key
+        if self.postings is not None:
+            for token in self._tokens(riddle):
+                self.postings.setdefault(token, set()).add(key)
+
+    def _build_postings(self):
+        self.postings = {}
+        for key, riddle in self.by_id.items():
+            for token in self._tokens(riddle):
+                self.postings.setdefault(token, set()).add(key)
+
+    def _forget(self, key):
+        riddle = self.by_id.pop(key)
+        question = self.normalize(riddle.get("question", ""))
+        if self.by_question.get(question) == key:
+            del self.by_question[question]
+        for token in self._tokens(riddle) if self.postings is not None else ():
+            ids = self.postings.get(token)
+            if ids is not None:
+                ids.discard(key)
+                if not ids:
+                    del self.postings[token]
+        pos = bisect_left(self.ids, key)
+        if pos < len(self.ids) and self.ids[pos] == key:
+            del self.ids[pos]
+
+    def add(self, riddle):
+        key = self._key(riddle.get("id"))
+        if key is None:
+            return
+        if key in self.by_id:
+            self._forget(key)
+        self.by_id[key] = riddle
+        insort(self.ids, key)
+        self._index_text(key, riddle)
+
+    def remove(self, riddle_id):
+        key = self._key(riddle_id)
+        if key is not None and key in self.by_id:
+            self._forget(key)
+
+    def get(self, riddle_id):
+        key = self._key(riddle_id)
+        return self.by_id.get(key) if key is not None else None
+
+    def find_question(self, question):
+        key = self.by_question.get(self.normalize(question))
+        return self.by_id.get(key) if key is not None else None
+
+    def search(self, query):
+        # Ids of riddles containing every query token, sorted ascending
+        tokens = set(self.tokenize(query))
+        if not tokens:
+            return []
+        if self.postings is None:
+            self._build_postings()
+        postings = sorted((self.postings.get(token, set()) for token in tokens), key=len)
+        matches = set(postings[0])
+        for ids in postings[1:]:
+            matches &= ids
+            if not matches:
+                break
+        return sorted(matches)
+
+    def page(self, after_id=None, limit=10, ids=None):
+        # Keyset pagination: up to `limit` riddles with id > after_id from `ids` (default: all).
+        # A saved search result may hold ids removed since; those are skipped.
+        ids = self.ids if ids is None else ids
+        start = 0 if after_id is None else bisect_right(ids, int(after_id))
+        return list(islice((self.by_id[key] for key in islice(ids, start, None) if key in self.by_id), limit))
+
+    def position(self, after_id, ids=None):
+        # How many ids sort at or before after_id, for "Page N of M" labels
+        ids = self.ids if ids is None else ids
+        return 0 if after_id is None else bisect_right(ids, int(after_id))
@@ -0,0 +1,75 @@
+import csv
+import io
+import json
+import os
+
+# Bulk riddle import/export in JSON Lines or CSV.
+#
+# Both directions work on open files one record at a time, so an import of a
+# large attachment or an export of the whole catalog never holds the full
+# text in memory. CSV files need a header row with at least "question" and
+# "answer"; "id" and "submitter_id" columns are optional (imported riddles
+# always get fresh ids).
+
+FORMATS = ("jsonl", "csv")
+CSV_FIELDS = ("id", "question", "answer", "submitter_id")
+
+
+def format_for(filename):
+    # Guess the format from a file name; None if it is neither JSONL nor CSV
+    ext = os.path.splitext(filename.lower())[1]
+    if ext in (".jsonl", ".ndjson", ".json"):
+        return "jsonl"
+    if ext == ".csv":
+        return "csv"
+    return None
+
+
+def open_text(binary_file):
+    # Text view of a binary file; utf-8-sig drops the BOM spreadsheet exports often start with
+    return io.TextIOWrapper(binary_file, encoding="utf-8-sig", newline="")
+
+
+def iter_records(text_file, fmt):
+    # Yield (line_no, record, error) for each row; record is a dict or None when unreadable
+    if fmt == "csv":
+        reader = csv.DictReader(text_file)
+        missing = {"question", "answer"} - set(reader.fieldnames or ())
+        if missing:
+            yield 1, None, f"CSV header is missing {', '.join(sorted(missing))}"
+            return
+        for row in reader:
+            yield reader.line_num, row, None
+        return
+
+    for line_no, line in enumerate(text_file, start=1):
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            record = json.loads(line)
+        except json.JSONDecodeError as e:
+            yield line_no, None, f"invalid JSON ({e.msg})"
+            continue
+        if not isinstance(record, dict):
+            yield line_no, None, "not a JSON object"
+            continue
+        yield line_no, record, None
+
+
+def write_riddles(text_file, riddles, fmt):
+    # Write riddles one line at a time; returns how many were written
+    count = 0
+    if fmt == "csv":
+        writer = csv.DictWriter(text_file, fieldnames=CSV_FIELDS, extrasaction="ignore")
+        writer.writeheader()
+        for riddle in riddles:
+            writer.writerow(riddle)
+            count += 1
+        return count
+
+    for riddle in riddles:
+        text_file.write(json.dumps({k: riddle.get(k) for k in CSV_FIELDS}, ensure_ascii=False, separators=(",", ":")))
+        text_file.write("\n")
+        count += 1
+    return count
@@ -0,0 +1,186 @@
+import hashlib
+import json
+import os
+
+# Append-only riddle catalog in JSON Lines format.
+#
+# Every submission appends one riddle record and every removal appends a
+# tombstone ({"id": ..., "deleted": true}), so a change costs one short write no
+# matter how big the catalog is. Loading replays the log line by line; when dead
+# records (tombstones and the entries they shadow) outweigh live ones the log is
+# compacted by rewriting only the live riddles.
+
+COMPACT_MIN_DEAD = 1000     # Never compact for fewer dead records than this
+
+_dead_records = 0           # Records in the log that no longer describe a live riddle
+_live_records = 0
+_load_failed = False        # The last load stopped early; the riddles in memory may be incomplete
+
+
+def _dumps(record):
+    return json.dumps(record, ensure_ascii=False, separators=(",", ":"))
+
+
+def iter_log(filename):
+    # Stream records from the log without reading the whole file into memory
+    with open(filename, "r", encoding="utf-8") as f:
+        for line_no, line in enumerate(f, start=1):
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                yield json.loads(line)
+            except json.JSONDecodeError:
+                # A crash mid-append can leave a torn last line; skip it
+                print(f"Skipping unreadable record on line {line_no} of {filename}")
+
+
+def load_riddles(filename, legacy_filename=None):
+    global _dead_records, _live_records, _load_failed
+
+    if not os.path.exists(filename):
+        riddles = []
+        if legacy_filename and os.path.exists(legacy_filename):
+            # First start after switching formats: import the old JSON array once
+            try:
+                with open(legacy_filename, "r", encoding="utf-8") as f:
+                    riddles = json.load(f)
+            except Exception as e:
+                print(f"Error loading {legacy_filename}: {e}")
+                riddles = []
+            compact_riddles(filename, riddles)
+            print(f"Migrated {len(riddles)} riddles from {legacy_filename} to {filename}")
+        _dead_records = 0
+        _live_records = len(riddles)
+        return riddles
+
+    by_id = {}
+    total = 0
+    _load_failed = False
+    try:
+        for line_no, record in enumerate(iter_log(filename), start=1):
+            total += 1
+            if not isinstance(record, dict):
+                print(f"Skipping record {line_no} of {filename}: not a riddle object")
+                continue
+            riddle_id = str(record.get("id"))
+            if record.get("deleted"):
+                by_id.pop(riddle_id, None)
+            else:
+                by_id.pop(riddle_id, None)  # Re-adding an id moves it to the end
+                by_id[riddle_id] = record
+    except Exception as e:
+        print(f"Error loading {filename}: {e}; not compacting it until a clean load")
+        _load_failed = True
+
+    riddles = list(by_id.values())
+    _live_records = len(riddles)
+    _dead_records = total - _live_records
+    maybe_compact(filename, riddles)
+    return riddles
+
+
+TAIL_CHECK_BYTES = 256     # How much of the log before a saved position must still match
+
+
+def log_position(filename):
+    # [inode, size, digest of the bytes just before size], or None without a log. A
+    # state snapshot keeps this so it can later pick up only what was appended since.
+    try:
+        with open(filename, "rb") as f:
+            st = os.fstat(f.fileno())
+            f.seek(max(0, st.st_size - TAIL_CHECK_BYTES))
+            return [st.st_ino, st.st_size, hashlib.blake2b(f.read(), digest_size=8).hexdigest()]
+    except FileNotFoundError:
+        return None
+
+
+def read_after(filename, position):
+    # The records appended after log_position() returned position, or None if the log
+    # was rewritten (compacted, replaced) since and the whole log must be read again
+    current = log_position(filename)
+    if position is None or current is None:
+        return [] if position == current else None
+    inode, size, digest = position
+    if current[0] != inode or current[1] < size:
+        return None
+    records = []
+    with open(filename, "rb") as f:
+        f.seek(max(0, size - TAIL_CHECK_BYTES))
+        if hashlib.blake2b(f.read(size - f.tell()), digest_size=8).hexdigest() != digest:
+            return None
+        for line in f.read().decode("utf-8").splitlines():
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                continue  # A torn last line, as in iter_log()
+            if isinstance(record, dict):
+                records.append(record)
+    return records
+
+
+def record_counts():
+    # (live, dead) records in the log, carried across restarts by state snapshots
+    return _live_records, _dead_records
+
+
+def set_record_counts(live, dead):
+    global _live_records, _dead_records
+    _live_records, _dead_records = live, dead
+
+
+def _append(filename, lines):
+    with open(filename, "a", encoding="utf-8") as f:
+        f.write("".join(lines))
+        f.flush()
+
+
+def append_riddle(filename, riddle):
+    global _live_records
+    _append(filename, [_dumps(riddle) + "\n"])
+    _live_records += 1
+
+
+def append_riddles(filename, riddles):
+    # Several riddles in a single write
+    global _live_records
+    if riddles:
+        _append(filename, [_dumps(r) + "\n" for r in riddles])
+        _live_records += len(riddles)
+
+
+def append_tombstone(filename, riddle_id):
+    global _dead_records, _live_records
+    _append(filename, [_dumps({"id": str(riddle_id), "deleted": True}) + "\n"])
+    # The tombstone and the record it hides are both dead weight now
+    _dead_records += 2
+    _live_records = max(0, _live_records - 1)
+
+
+def maybe_compact(filename, riddles):
+    # Never after a failed load: compacting would rewrite the log without the riddles it missed
+    if not _load_failed and _dead_records >= COMPACT_MIN_DEAD and _dead_records > _live_records:
+        compact_riddles(filename, riddles)
+        return True
+    return False
+
+
+def compact_riddles(filename, riddles):
+    # Rewrite the log with only live riddles; the rename makes it atomic
+    global _dead_records, _live_records
+    tmp_filename = filename + ".tmp"
+    try:
+        with open(tmp_filename, "w", encoding="utf-8") as f:
+            for riddle in riddles:
+                f.write(_dumps(riddle) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_filename, filename)
+    except Exception as e:
+        print(f"Error compacting {filename}: {e}")
+        return
+    _dead_records = 0
+    _live_records = len(riddles)
@@ -0,0 +1,106 @@
+from datetime import datetime
+
+import guess_stats
+
+# Live riddle rounds, at most one per channel.
+#
+# Each Round carries everything a guess or a reveal needs: the riddle, its
+# answer tokens, the per-round guess budget and the players' progress. Rounds
+# are looked up by channel id, so routing a guess to its round is one dict
+# lookup however many rounds are live. Timers (a rapid-fire round's reveal)
+# live on the bot's one Scheduler, not on the round.
+
+
+class Round:
+    def __init__(self, channel_id, riddle, answer_words, stats, max_guesses, counts_streak=True,
+                 duration_seconds=None, embed=None):
+        self.channel_id = int(channel_id)
+        self.riddle = riddle
+        self.answer_words = answer_words      # frozenset of answer tokens, matched against every guess
+        self.stats = stats                    # guess_stats.RoundStats
+        self.max_guesses = max_guesses
+        self.counts_streak = counts_streak    # Daily rounds build streaks; rapid-fire rounds only score
+        self.duration_seconds = duration_seconds  # Reveal this long after going live; None = on the daily schedule
+        self.embed = embed                    # The post, rendered while preparing
+        self.reveal_at = None                 # Aware datetime, once live with a duration
+        self.revealed = False
+        self.correct_users = set()            # user_ids who guessed right
+        self.guess_attempts = {}              # user_id -> guesses made
+        self.deducted_for_user = set()        # user_ids penalized for running out of guesses
+
+    @property
+    def riddle_id(self):
+        return str(self.riddle.get("id"))
+
+    def to_state(self):
+        return {
+            "channel_id": self.channel_id,
+            "riddle": self.riddle,
+            "revealed": self.revealed,
+            "correct_users": list(self.correct_users),
+            "guess_attempts": dict(self.guess_attempts),
+            "deducted_for_user": list(self.deducted_for_user),
+            "stats": self.stats.to_dict() if self.stats is not None else None,
+            "max_guesses": self.max_guesses,
+            "counts_streak": self.counts_streak,
+            "duration_seconds": self.duration_seconds,
+            "reveal_at": self.reveal_at.isoformat() if self.reveal_at else None,
+        }
+
+    @classmethod
+    def from_state(cls, state, answer_words, channel_id, max_guesses):
+        # channel_id and max_guesses are defaults for checkpoints written before
+        # rounds were per channel
+        riddle = state["riddle"]
+        if state.get("stats"):
+            stats = guess_stats.RoundStats.from_dict(state["stats"])
+        else:
+            stats = guess_stats.RoundStats(riddle.get("id"))
+        rnd = cls(state.get("channel_id", channel_id), riddle, answer_words, stats,
+                  state.get("max_guesses", max_guesses), state.get("counts_streak", True),
+                  state.get("duration_seconds"))
+        rnd.revealed = state.get("revealed", False)
+        rnd.correct_users = set(state.get("correct_users", []))
+        rnd.guess_attempts = state.get("guess_attempts", {})
+        rnd.deducted_for_user = set(state.get("deducted_for_user", []))
+        if state.get("reveal_at"):
+            rnd.reveal_at = datetime.fromisoformat(state["reveal_at"])
+        return rnd
+
+
+class RoundEngine:
+    def __init__(self):
+        self.by_channel = {}                  # channel_id -> live Round
+
+    def __len__(self):
+        return len(self.by_channel)
+
+    def __iter__(self):
+        return iter(list(self.by_channel.values()))
+
+    def clear(self):
+        self.by_channel.clear()
+
+    def get(self, channel_id):
+        return self.by_channel.get(channel_id)
+
+    def start(self, rnd):
+        # Replaces whatever round was live in the same channel
+        self.by_channel[rnd.channel_id] = rnd
+
+    def finish(self, channel_id):
+        return self.by_channel.pop(channel_id, None)
+
+    def find_riddle(self, riddle_id):
+        # The live round of a riddle, if any; there are only ever a handful of rounds
+        riddle_id = str(riddle_id)
+        for rnd in self.by_channel.values():
+            if rnd.riddle_id == riddle_id:
+                return rnd
+        return None
+
+    def guessers(self):
+        return sum(len(rnd.guess_attempts) for rnd in self.by_channel.values())
+
+    def solvers(self):
+        return sum(len(rnd.correct_users) for rnd in self.by_channel.values())
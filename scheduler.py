@@ -0,0 +1,214 @@
+import asyncio
+import heapq
+import itertools
+import json
+import os
+from datetime import datetime, timedelta, timezone
+
+import metrics
+
+# Single-timer job scheduler.
+#
+# All jobs live in one heap ordered by next run time, and one asyncio task
+# sleeps until the earliest entry is due. Next-run times are written to a state
+# file. After downtime, any daily run missed by less than its max_lateness is
+# caught up once at startup; older runs are skipped and logged.
+#
+# Daily jobs are defined by a wall-clock time in their own timezone (zoneinfo),
+# so DST changes move the UTC run time with the community's clock.
+#
+# One-shot timers (add_once) share the same heap, e.g. the reveal of each live
+# rapid-fire round. They are not written to the state file: whoever owns them
+# registers them again after a restart. Cancelling or replacing one leaves its
+# old heap entry behind, which is skipped when it comes up.
+
+job_lateness = metrics.Histogram(
+    "riddle_scheduler_job_lateness_seconds", "How late a scheduled job started", ("job",),
+    buckets=(0.01, 0.1, 1, 5, 30, 60, 300, 1800, 3600, 21600))
+
+
+class _DailyJob:
+    persistent = True
+
+    def __init__(self, key, at, tz, callback, max_lateness):
+        self.key = key
+        self.at = at                      # datetime.time, wall clock in tz
+        self.tz = tz
+        self.callback = callback          # async callback(slot) where slot is the local date (YYYY-MM-DD)
+        self.max_lateness = max_lateness  # seconds
+
+    def next_after(self, after):
+        # First run strictly after `after` (aware datetime), returned in UTC
+        local_date = after.astimezone(self.tz).date() - timedelta(days=1)
+        while True:
+            run_at = datetime.combine(local_date, self.at, tzinfo=self.tz).astimezone(timezone.utc)
+            if run_at > after:
+                return run_at
+            local_date += timedelta(days=1)
+
+    def slot_for(self, run_at):
+        return run_at.astimezone(self.tz).date().isoformat()
+
+
+class _IntervalJob:
+    persistent = True
+
+    def __init__(self, key, seconds, callback):
+        self.key = key
+        self.seconds = seconds
+        self.callback = callback          # async callback(slot) with slot None
+        self.max_lateness = None
+
+    def next_after(self, after):
+        return after + timedelta(seconds=self.seconds)
+
+    def slot_for(self, run_at):
+        return None
+
+
+class _OnceJob:
+    persistent = False
+
+    def __init__(self, key, run_at, callback):
+        self.key = key
+        self.run_at = run_at
+        self.callback = callback          # async callback(slot) with slot the run time (ISO)
+        self.max_lateness = None
+
+    def next_after(self, after):
+        return None
+
+    def slot_for(self, run_at):
+        return run_at.isoformat()
+
+
+class Scheduler:
+    def __init__(self, state_file):
+        self.state_file = state_file
+        self.jobs = {}
+        self.heap = []                    # (run_at, seq, key)
+        self.next_runs = {}               # key -> run_at currently queued
+        self.state = self._load_state()   # key -> {"next_run": iso, "last_run": iso}
+        self._seq = itertools.count()
+        self._task = None
+        self._wakeup = None
+
+    def _load_state(self):
+        if not os.path.exists(self.state_file):
+            return {}
+        try:
+            with open(self.state_file, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except Exception as e:
+            print(f"Error loading {self.state_file}: {e}")
+            return {}
+
+    def _save_state(self):
+        tmp_file = self.state_file + ".tmp"
+        try:
+            with open(tmp_file, "w", encoding="utf-8") as f:
+                json.dump(self.state, f, indent=4)
+            os.replace(tmp_file, self.state_file)
+        except Exception as e:
+            print(f"Error saving {self.state_file}: {e}")
+
+    def add_daily(self, key, at, tz, callback, max_lateness=0):
+        self._add(_DailyJob(key, at, tz, callback, max_lateness))
+
+    def add_interval(self, key, seconds, callback):
+        self._add(_IntervalJob(key, seconds, callback))
+
+    def add_once(self, key, run_at, callback):
+        # Run callback once at run_at (aware datetime), replacing any pending timer with this key
+        self.jobs[key] = _OnceJob(key, run_at, callback)
+        self._push(key, run_at)
+
+    def cancel(self, key):
+        job = self.jobs.get(key)
+        if job is not None and not job.persistent:
+            del self.jobs[key]
+            self.next_runs.pop(key, None)
+
+    def _add(self, job):
+        if job.key in self.jobs:
+            return  # Registering again (e.g. after a reconnect) is a no-op
+        self.jobs[job.key] = job
+        now = datetime.now(timezone.utc)
+        run_at = job.next_after(now)
+
+        stored = self.state.get(job.key, {}).get("next_run")
+        if stored and job.max_lateness is not None:
+            missed_at = datetime.fromisoformat(stored)
+            if missed_at <= now:
+                lateness = (now - missed_at).total_seconds()
+                if lateness <= job.max_lateness:
+                    print(f"Catching up missed run of {job.key} scheduled for {stored}")
+                    run_at = missed_at
+                else:
+                    print(f"Skipping missed run of {job.key} scheduled for {stored} ({lateness:.0f}s late)")
+        self._push(job.key, run_at)
+
+    def _push(self, key, run_at):
+        self.next_runs[key] = run_at
+        if self.jobs[key].persistent:
+            self.state.setdefault(key, {})["next_run"] = run_at.isoformat()
+        heapq.heappush(self.heap, (run_at, next(self._seq), key))
+        if self._wakeup is not None:
+            self._wakeup.set()
+
+    def next_run(self, key):
+        return self.next_runs.get(key)
+
+    def is_running(self):
+        return self._task is not None and not self._task.done()
+
+    def start(self):
+        if self.is_running():
+            return
+        self._wakeup = asyncio.Event()
+        self._save_state()
+        self._task = asyncio.get_running_loop().create_task(self._run())
+
+    def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+        self._task = None
+
+    async def _run(self):
+        while True:
+            self._wakeup.clear()
+            if not self.heap:
+                await self._wakeup.wait()
+                continue
+            run_at, _, key = self.heap[0]
+            if self.next_runs.get(key) != run_at:
+                heapq.heappop(self.heap)  # Cancelled or rescheduled since it was queued
+                continue
+            delay = (run_at - datetime.now(timezone.utc)).total_seconds()
+            if delay > 0:
+                try:
+                    # Wake early if a sooner job gets added in the meantime
+                    await asyncio.wait_for(self._wakeup.wait(), timeout=delay)
+                    continue
+                except asyncio.TimeoutError:
+                    pass
+            heapq.heappop(self.heap)
+            job = self.jobs[key]
+            now = datetime.now(timezone.utc)
+            job_lateness.observe(max(0.0, (now - run_at).total_seconds()), key)
+
+            next_run = job.next_after(max(now, run_at))
+            if next_run is None:
+                del self.jobs[key]
+                del self.next_runs[key]
+            else:
+                self.state[key]["last_run"] = now.isoformat()
+                self._push(key, next_run)
+                self._save_state()
+            asyncio.get_running_loop().create_task(self._invoke(job, job.slot_for(run_at)))
+
+    async def _invoke(self, job, slot):
+        try:
+            await job.callback(slot)
+        except Exception as e:
+            print(f"Scheduled job {job.key} failed: {e}")
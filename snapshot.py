@@ -0,0 +1,77 @@
+import marshal
+import os
+import struct
+import sys
+import time
+
+# Binary snapshot of the bot's in-memory state.
+#
+# Loading scores, streaks and the riddle catalog from their source files means
+# parsing JSON and rebuilding every derived index; a snapshot stores the same
+# objects with marshal, which loads them with next to no parsing. The file is:
+#
+#   header   magic, format version, Python major/minor (marshal is only stable
+#            within one Python version), creation time, length of meta
+#   meta     marshal'd dict: {"sources": ...}, what the state was taken from
+#   state    marshal'd dict of plain builtins, as built by main.snapshot_state()
+#
+# The file is read in one call and unmarshalled from memory: marshal.load() on
+# a file object reads in small pieces and is many times slower.
+#
+# load() hands back the recorded sources with the state; the caller decides what
+# is still current (see main.load_snapshot): parts whose source files changed
+# afterwards (a crash between snapshots, an edit by hand, another process) are
+# loaded from the sources instead, or topped up from what was appended since.
+
+MAGIC = b"RDLSNAP\0"
+FORMAT_VERSION = 2
+HEADER = struct.Struct("<8sHBBdI")
+
+
+def fingerprint(paths):
+    sources = {}
+    for path in paths:
+        try:
+            st = os.stat(path)
+        except FileNotFoundError:
+            sources[path] = None
+            continue
+        sources[path] = [st.st_mtime_ns, st.st_size]
+    return sources
+
+
+def write(path, state, sources):
+    # Write to a temp file and rename, so a crash never leaves a torn snapshot
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "wb") as f:
+        meta = marshal.dumps({"sources": sources})
+        f.write(HEADER.pack(MAGIC, FORMAT_VERSION, sys.version_info.major, sys.version_info.minor, time.time(),
+                            len(meta)))
+        f.write(meta)
+        marshal.dump(state, f)
+        f.flush()
+        os.fsync(f.fileno())
+        size = f.tell()
+    os.replace(tmp_path, path)
+    return size
+
+
+def load(path):
+    # Returns (sources, state), or None (with the reason printed) if the file can't be used
+    if not os.path.exists(path):
+        return None
+    try:
+        with open(path, "rb") as f:
+            data = memoryview(f.read())
+        magic, version, major, minor, created_at, meta_size = HEADER.unpack_from(data)
+        if magic != MAGIC or version != FORMAT_VERSION:
+            print(f"Ignoring {path}: unknown snapshot format")
+            return None
+        if (major, minor) != sys.version_info[:2]:
+            print(f"Ignoring {path}: written by Python {major}.{minor}")
+            return None
+        meta = marshal.loads(data[HEADER.size:HEADER.size + meta_size])
+        return meta.get("sources"), marshal.loads(data[HEADER.size + meta_size:])
+    except (EOFError, ValueError, TypeError, struct.error) as e:
+        print(f"Ignoring unreadable snapshot {path}: {e}")
+        return None
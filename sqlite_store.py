@@ -0,0 +1,326 @@
+import json
+import os
+import queue
+import sqlite3
+import sys
+import threading
+import time
+
+import metrics
+import riddle_store
+
+# Embedded SQLite storage backend (STORAGE_BACKEND=sqlite in main.py).
+#
+# Reads happen on the caller's thread, on their own connection (never inside the
+# writer's transaction): at startup and on reloads, plus single-user lookups when
+# main.py runs with USER_CACHE=tiered. All writes go through a
+# single worker thread: callers enqueue row changes and return immediately, and
+# the worker drains whatever has queued up into one transaction, so a burst of
+# guesses at the noon post turns into a handful of small commits instead of one
+# file rewrite per guess. If that transaction fails, its changes are retried one
+# row at a time so a single bad row cannot take the rest of the batch with it.
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS users (
+    user_id TEXT PRIMARY KEY,
+    score INTEGER NOT NULL DEFAULT 0,
+    streak INTEGER NOT NULL DEFAULT 0,
+    submission_date TEXT
+);
+CREATE INDEX IF NOT EXISTS users_rank ON users (score DESC, streak DESC);
+
+CREATE TABLE IF NOT EXISTS riddles (
+    id INTEGER PRIMARY KEY,
+    question TEXT NOT NULL,
+    answer TEXT NOT NULL,
+    submitter_id TEXT,
+    normalized_question TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS riddles_normalized_question ON riddles (normalized_question);
+"""
+
+UPSERT_USER_SQL = """
+    INSERT INTO users (user_id, score, streak, submission_date) VALUES (?, ?, ?, ?)
+    ON CONFLICT (user_id) DO UPDATE SET
+        score = excluded.score,
+        streak = excluded.streak,
+        submission_date = excluded.submission_date
+"""
+
+UPSERT_RIDDLE_SQL = """
+    INSERT OR REPLACE INTO riddles (id, question, answer, submitter_id, normalized_question)
+    VALUES (?, ?, ?, ?, ?)
+"""
+
+MAX_BATCH = 5000    # Queue items folded into one transaction
+
+
+def _normalize_question(text):
+    return " ".join(text.lower().split())
+
+
+def _riddle_row(riddle):
+    submitter_id = riddle.get("submitter_id")
+    return (
+        int(riddle["id"]),
+        riddle.get("question", ""),
+        riddle.get("answer", ""),
+        str(submitter_id) if submitter_id is not None else None,
+        _normalize_question(riddle.get("question", "")),
+    )
+
+
+def connect(path):
+    conn = sqlite3.connect(path, check_same_thread=False)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")  # Durable at checkpoints; safe with WAL
+    conn.execute("PRAGMA busy_timeout=5000")
+    conn.executescript(SCHEMA)
+    return conn
+
+
+class SQLiteStore:
+    def __init__(self, path):
+        self.path = path
+        self.conn = connect(path)
+        self.reader = connect(path)     # Reads from the event loop thread
+        self._queue = queue.Queue()
+        self._pending_users = {}        # user_id -> newest queued row not yet committed
+        self._pending_lock = threading.Lock()
+        self.failed_writes = 0          # Changes dropped after their retry failed too
+        self._writer = threading.Thread(target=self._write_loop, name="sqlite-writer", daemon=True)
+        self._writer.start()
+
+    # --- Reads ---
+
+    def is_empty(self):
+        users = self.reader.execute("SELECT COUNT(*) FROM users").fetchone()[0]
+        riddles = self.reader.execute("SELECT COUNT(*) FROM riddles").fetchone()[0]
+        return users == 0 and riddles == 0
+
+    def load_users(self, active_only=False):
+        # active_only: just the users with a running streak (the rest are loaded on demand)
+        scores = {}
+        streaks = {}
+        submission_dates = {}
+        sql = "SELECT user_id, score, streak, submission_date FROM users"
+        if active_only:
+            sql += " WHERE streak > 0"
+        for user_id, score, streak, submission_date in self.reader.execute(sql):
+            scores[user_id] = score
+            streaks[user_id] = streak
+            if submission_date is not None:
+                submission_dates[user_id] = submission_date
+        return scores, streaks, submission_dates
+
+    def load_user(self, user_id):
+        # (score, streak, submission_date) for one user, or None if they never played.
+        # A row still waiting for the writer is answered from memory, so this never
+        # waits on a commit; anything else is committed and visible to the reader.
+        with self._pending_lock:
+            row = self._pending_users.get(str(user_id))
+        if row is not None:
+            return tuple(row[1:])
+        return self.reader.execute(
+            "SELECT score, streak, submission_date FROM users WHERE user_id = ?", (str(user_id),)).fetchone()
+
+    def top_users(self, limit):
+        # [(user_id, score, streak)] by rank, read through the users_rank index
+        return self.reader.execute(
+            "SELECT user_id, score, streak FROM users ORDER BY score DESC, streak DESC LIMIT ?", (limit,)).fetchall()
+
+    def load_riddles(self):
+        riddles = []
+        for riddle_id, question, answer, submitter_id in self.reader.execute(
+                "SELECT id, question, answer, submitter_id FROM riddles ORDER BY id"):
+            riddles.append({
+                "id": str(riddle_id),
+                "question": question,
+                "answer": answer,
+                "submitter_id": submitter_id,
+            })
+        return riddles
+
+    def max_riddle_id(self):
+        return self.reader.execute("SELECT COALESCE(MAX(id), 0) FROM riddles").fetchone()[0]
+
+    # --- Writes (queued to the worker thread) ---
+
+    def save_users(self, rows):
+        # rows: iterable of (user_id, score, streak, submission_date)
+        rows = list(rows)
+        if rows:
+            with self._pending_lock:
+                for row in rows:
+                    self._pending_users[row[0]] = row
+            self._queue.put(("users", rows))
+
+    def add_riddles(self, riddles):
+        rows = [_riddle_row(r) for r in riddles]
+        if rows:
+            self._queue.put(("riddles", rows))
+
+    def delete_riddle(self, riddle_id):
+        self._queue.put(("delete_riddle", int(riddle_id)))
+
+    def replace_riddles(self, riddles):
+        self._queue.put(("replace_riddles", [_riddle_row(r) for r in riddles]))
+
+    def flush(self, timeout=None):
+        # Block until everything queued so far is committed. False on timeout, or if a
+        # change in the writer's batch could not be written (see failed_writes).
+        done = _Flush()
+        self._queue.put(("flush", done))
+        return done.event.wait(timeout) and done.ok
+
+    def checkpoint(self, mode="TRUNCATE", timeout=None):
+        # Commit everything queued, then have the writer fold the WAL into the main file,
+        # e.g. before a state snapshot. PASSIVE never waits for readers; TRUNCATE (at exit)
+        # also empties the WAL. False on timeout or a failed write, like flush().
+        done = _Flush(checkpoint=mode)
+        self._queue.put(("flush", done))
+        return done.event.wait(timeout) and done.ok
+
+    def close(self):
+        if self._writer.is_alive():
+            self._queue.put(("stop", None))
+            self._writer.join()
+        self.conn.close()
+        self.reader.close()
+
+    def _write_loop(self):
+        while True:
+            batch = [self._queue.get()]
+            while len(batch) < MAX_BATCH:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            stop = self._apply(batch)
+            if stop:
+                return
+
+    def _apply(self, batch):
+        writes = [(kind, payload) for kind, payload in batch if kind not in ("flush", "stop")]
+        waiters = [payload for kind, payload in batch if kind == "flush"]
+        stop = any(kind == "stop" for kind, _ in batch)
+        start = time.perf_counter()
+        ok = True
+        try:
+            with self.conn:
+                self._write(writes)
+        except Exception as e:
+            print(f"Error writing to {self.path}: {e}; retrying {len(writes)} changes one by one")
+            ok = self._write_each(writes)
+        metrics.persistence_flush_seconds.observe(time.perf_counter() - start, self.path)
+        self._settle_users(writes)
+        for waiter in waiters:
+            waiter.ok = ok
+            if waiter.checkpoint:
+                try:
+                    self.conn.execute(f"PRAGMA wal_checkpoint({waiter.checkpoint})")
+                except Exception as e:
+                    print(f"Error checkpointing {self.path}: {e}")
+                    waiter.ok = False
+            waiter.event.set()
+        return stop
+
+    def _settle_users(self, writes):
+        # The batch's user rows are committed (or given up on): stop answering them from
+        # memory, unless a newer row for the same user was queued in the meantime
+        with self._pending_lock:
+            for kind, payload in writes:
+                if kind == "users":
+                    for row in payload:
+                        if self._pending_users.get(row[0]) is row:
+                            del self._pending_users[row[0]]
+
+    def _write(self, writes):
+        user_rows = {}
+        for kind, payload in writes:
+            if kind == "users":
+                # Later changes to the same user win; write each row once
+                for row in payload:
+                    user_rows[row[0]] = row
+            elif kind == "riddles":
+                self.conn.executemany(UPSERT_RIDDLE_SQL, payload)
+            elif kind == "delete_riddle":
+                self.conn.execute("DELETE FROM riddles WHERE id = ?", (payload,))
+            elif kind == "replace_riddles":
+                self.conn.execute("DELETE FROM riddles")
+                self.conn.executemany(UPSERT_RIDDLE_SQL, payload)
+        if user_rows:
+            self.conn.executemany(UPSERT_USER_SQL, user_rows.values())
+
+    def _write_each(self, writes):
+        # After a failed batch: each user row, and each other change, in its own transaction
+        singles = []
+        for kind, payload in writes:
+            if kind in ("users", "riddles"):
+                singles.extend((kind, [row]) for row in payload)
+            else:
+                singles.append((kind, payload))
+        ok = True
+        for change in singles:
+            try:
+                with self.conn:
+                    self._write([change])
+            except Exception as e:
+                ok = False
+                self.failed_writes += 1
+                print(f"Dropped a {change[0]} change to {self.path}: {e} ({change[1]!r})")
+        return ok
+
+
+class _Flush:
+    # A flush() or checkpoint() waiting on the writer; ok is False if its batch lost a change
+    def __init__(self, checkpoint=None):
+        self.event = threading.Event()
+        self.ok = True
+        self.checkpoint = checkpoint  # wal_checkpoint mode to run once the batch is committed
+
+
+def _load_json_file(filename, default):
+    if not os.path.exists(filename):
+        return default
+    try:
+        with open(filename, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except Exception as e:
+        print(f"Error loading {filename}: {e}")
+        return default
+
+
+def migrate_from_json(store, scores_file, streaks_file, dates_file, questions_log_file, questions_file):
+    # One-shot import of the JSON data files into an empty database
+    scores = _load_json_file(scores_file, {})
+    streaks = _load_json_file(streaks_file, {})
+    submission_dates = _load_json_file(dates_file, {})
+    if os.path.exists(questions_log_file) or os.path.exists(questions_file):
+        riddles = riddle_store.load_riddles(questions_log_file, legacy_filename=questions_file)
+    else:
+        riddles = []
+
+    user_ids = set(scores) | set(streaks) | set(submission_dates)
+    store.save_users(
+        (uid, scores.get(uid, 0), streaks.get(uid, 0), submission_dates.get(uid)) for uid in user_ids
+    )
+    valid_riddles = [r for r in riddles if str(r.get("id", "")).isdigit()]
+    if len(valid_riddles) != len(riddles):
+        print(f"Skipped {len(riddles) - len(valid_riddles)} riddles without a numeric id")
+    store.add_riddles(valid_riddles)
+    store.flush()
+    print(f"Migrated {len(user_ids)} users and {len(valid_riddles)} riddles into {store.path}")
+    return len(user_ids), len(valid_riddles)
+
+
+if __name__ == "__main__":
+    # python sqlite_store.py [path/to/riddles.db] -- import the JSON files in the working directory
+    db_path = sys.argv[1] if len(sys.argv) > 1 else os.getenv("SQLITE_PATH", "riddles.db")
+    sqlite_store = SQLiteStore(db_path)
+    if not sqlite_store.is_empty():
+        print(f"{db_path} already has data; refusing to migrate over it.")
+        sys.exit(1)
+    migrate_from_json(sqlite_store, "scores.json", "streaks.json", "submission_dates.json",
+                      "submitted_questions.jsonl", "submitted_questions.json")
+    sqlite_store.close()
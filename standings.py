@@ -0,0 +1,97 @@
+from bisect import bisect_left, insort
+
+# The leaderboard order, kept sorted as scores change instead of re-sorting every
+# user whenever someone asks for a page. Each ranked user has one key
+# (-score, -streak, user_id) in a sorted list, so:
+#   - a score change is one bisect + delete and one insort
+#   - a page is a slice
+#   - a user's rank is one bisect on (-score, -streak); tied users share a rank
+# Users with neither a score nor a streak are not ranked, as on the leaderboard.
+#
+# The list is built from `source` on first use rather than at load, and again
+# after invalidate(), so startup does not pay for sorting every user.
+
+BULK_UPDATE_MIN = 256   # From this many changes at once, re-sort instead of moving keys one by one
+
+
+class RankedIndex:
+    def __init__(self, source):
+        self.source = source          # () -> iterable of (user_id, score, streak) for every known user
+        self.invalidate()
+
+    def invalidate(self):
+        self.keys = None              # sorted (-score, -streak, user_id), or None until built
+        self.key_of = {}              # user_id -> its key in self.keys
+
+    def _ensure(self):
+        if self.keys is None:
+            self.key_of = {uid: (-score, -streak, uid) for uid, score, streak in self.source()
+                           if score >= 1 or streak >= 1}
+            self.keys = sorted(self.key_of.values())
+
+    def __len__(self):
+        self._ensure()
+        return len(self.keys)
+
+    def update(self, user_id, score, streak):
+        if self.keys is None:
+            return  # Built from the current scores when next needed
+        key = (-score, -streak, user_id)
+        old = self.key_of.get(user_id)
+        if old == key:
+            return
+        if old is not None:
+            self.remove(user_id)
+        if score >= 1 or streak >= 1:
+            self.key_of[user_id] = key
+            insort(self.keys, key)
+
+    def update_many(self, user_ids, standing):
+        # Like update() for each of user_ids (a list or set), with
+        # standing(user_id) -> (score, streak). A big batch (a reveal resetting thousands of streaks) costs one
+        # mostly-sorted sort instead of a list shift per user.
+        if self.keys is None:
+            return
+        if len(user_ids) * 4 >= len(self.keys):
+            self.invalidate()  # Most users changed: rebuilding later costs no more than merging now
+            return
+        if len(user_ids) < BULK_UPDATE_MIN:
+            for user_id in user_ids:
+                self.update(user_id, *standing(user_id))
+            return
+        stale = set()
+        fresh = []
+        for user_id in set(user_ids):
+            score, streak = standing(user_id)
+            old = self.key_of.pop(user_id, None)
+            if old is not None:
+                stale.add(old)
+            if score >= 1 or streak >= 1:
+                key = (-score, -streak, user_id)
+                self.key_of[user_id] = key
+                fresh.append(key)
+        keys = [key for key in self.keys if key not in stale] if stale else self.keys
+        keys += fresh
+        keys.sort()  # Timsort merges the sorted remainder with the new keys
+        self.keys = keys
+
+    def remove(self, user_id):
+        key = self.key_of.pop(user_id, None)
+        if key is not None:
+            del self.keys[bisect_left(self.keys, key)]
+
+    def entries(self, start=0, stop=None):
+        # [(user_id, score, streak)] for positions start..stop, best first
+        self._ensure()
+        return [(uid, -score, -streak) for score, streak, uid in self.keys[start:stop]]
+
+    def rank(self, user_id):
+        # 1-based rank, or None if the user is not ranked
+        self._ensure()
+        key = self.key_of.get(user_id)
+        return None if key is None else bisect_left(self.keys, key[:2]) + 1
+
+    def count_at_least(self, score, streak):
+        # How many users rank at or above the standing (score, streak)
+        self._ensure()
+        return bisect_left(self.keys, (-score, -streak + 1))
@@ -0,0 +1,61 @@
+import pytest
+
+import adjustments
+
+
+@pytest.fixture
+def log_file(tmp_path):
+    return str(tmp_path / "score_adjustments.jsonl")
+
+
+def test_apply_merges_repeated_users_and_clamps_at_zero(log_file):
+    scores = {"1": 10, "2": 3}
+    streaks = {"1": 2, "2": 0}
+
+    record = adjustments.apply(scores, streaks, [("1", 5, 1), ("1", -2, 0), ("2", -10, -1)], by=99,
+                               filename=log_file)
+
+    assert scores == {"1": 13, "2": 0}
+    assert streaks == {"1": 3, "2": 0}
+    # Only the deltas that were actually applied are logged
+    assert record["ops"] == [["1", 3, 1], ["2", -3, 0]]
+
+
+def test_revert_restores_the_previous_values(log_file):
+    scores = {"1": 10, "2": 3}
+    streaks = {"1": 2, "2": 0}
+    record = adjustments.apply(scores, streaks, [("1", 5, 1), ("2", -10, 0)], by=99, filename=log_file)
+
+    revert = adjustments.revert(scores, streaks, record["batch"], by=99, filename=log_file)
+
+    assert scores == {"1": 10, "2": 3}
+    assert streaks == {"1": 2, "2": 0}
+    assert revert["reverts"] == record["batch"]
+    assert adjustments.find(record["batch"], log_file) == (record, revert["batch"])
+
+
+def test_a_batch_is_reverted_only_once(log_file):
+    scores, streaks = {}, {}
+    record = adjustments.apply(scores, streaks, [("1", 5, 0)], by=99, filename=log_file)
+    adjustments.revert(scores, streaks, record["batch"], by=99, filename=log_file)
+
+    with pytest.raises(ValueError, match="already reverted"):
+        adjustments.revert(scores, streaks, record["batch"], by=99, filename=log_file)
+
+
+def test_unknown_batch(log_file):
+    with pytest.raises(ValueError, match="No adjustment batch"):
+        adjustments.revert({}, {}, "20250101-000000", by=99, filename=log_file)
+
+
+def test_load_user_runs_before_users_are_read(log_file):
+    cold = {"7": (40, 4)}
+    scores, streaks = {}, {}
+
+    def load_user(user_id):
+        if user_id in cold:
+            scores[user_id], streaks[user_id] = cold.pop(user_id)
+
+    adjustments.apply(scores, streaks, [("7", 1, 1)], by=99, filename=log_file, load_user=load_user)
+
+    assert (scores["7"], streaks["7"]) == (41, 5)
@@ -0,0 +1,54 @@
+import random
+import statistics
+
+from guess_stats import RECORD, RoundStats
+
+
+def test_running_median_matches_a_sort():
+    rng = random.Random(7)
+    stats = RoundStats("1", started_at=0)
+    solve_ms = []
+
+    for n in range(201):
+        now = rng.uniform(0, 3600)
+        stats.record(f"user{n}", True, now=now)
+        solve_ms.append(int(now * 1000))
+        assert stats.median_solve_ms() == statistics.median(solve_ms)
+
+
+def test_summary_counts_guesses_guessers_and_solvers():
+    stats = RoundStats("1", started_at=0)
+    stats.record("a", False, now=1)
+    stats.record("a", True, now=2)
+    stats.record("b", False, now=3)
+
+    summary = stats.summary()
+
+    assert (summary["guesses"], summary["guessers"], summary["solvers"]) == (3, 2, 1)
+    assert summary["solve_rate"] == 0.5
+    assert summary["first_solve_seconds"] == 2.0
+    assert summary["guesses_per_user"] == {1: 1, 2: 1}
+
+
+def test_ring_grows_with_guesses_and_keeps_the_newest_once_full():
+    stats = RoundStats("1", started_at=0, capacity=4)
+    assert len(stats.ring) == 0
+
+    for n in range(6):
+        stats.record(f"user{n}", False, now=n)
+
+    assert len(stats.ring) == 4 * RECORD.size
+    assert [uid for uid, _, _ in stats.records()] == ["user2", "user3", "user4", "user5"]
+    assert stats.summary()["guesses"] == 6
+
+
+def test_checkpoint_round_trip():
+    stats = RoundStats("1", started_at=100.0)
+    stats.record("a", False, now=101)
+    stats.record("a", True, now=105)
+    stats.record("b", True, now=110)
+
+    restored = RoundStats.from_dict(stats.to_dict())
+
+    assert list(restored.records()) == list(stats.records())
+    assert restored.summary() == stats.summary()
@@ -0,0 +1,77 @@
+import asyncio
+import json
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+import leader
+
+
+@pytest.fixture
+def file_lease(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(leader, "_claimed_slots", {})
+    monkeypatch.setattr(leader, "_job_runs_offset", 0)
+    lease = leader.FileLease(str(tmp_path / "scheduler.lock"))
+    monkeypatch.setattr(leader, "_lease", lease)
+    asyncio.run(lease.refresh())
+    yield lease
+    asyncio.run(lease.release())
+
+
+def _other_worker_run(job, slot, status, age_seconds=0):
+    at = datetime.now(timezone.utc) - timedelta(seconds=age_seconds)
+    with open(leader.JOB_RUNS_FILE, "a", encoding="utf-8") as f:
+        f.write(json.dumps({"job": job, "slot": slot, "worker": "other", "status": status,
+                            "at": at.isoformat()}) + "\n")
+
+
+def _run(job, slot):
+    runs = []
+
+    async def func():
+        runs.append(slot)
+
+    asyncio.run(leader.run_exclusive(job, slot, func))
+    return len(runs)
+
+
+def test_a_slot_runs_once(file_lease):
+    assert _run("post", "2025-01-01") == 1
+    assert _run("post", "2025-01-01") == 0
+    assert _run("post", "2025-01-02") == 1
+
+
+def test_runs_logged_by_another_worker_after_start_are_seen(file_lease):
+    _run("post", "2025-01-01")  # Reads the log once
+    _other_worker_run("post", "2025-01-02", "done")
+
+    assert _run("post", "2025-01-02") == 0
+
+
+def test_a_recent_running_slot_is_not_taken_over(file_lease):
+    _other_worker_run("post", "2025-01-01", "running")
+
+    assert _run("post", "2025-01-01") == 0
+
+
+def test_a_stale_running_slot_is_taken_over(file_lease):
+    _other_worker_run("post", "2025-01-01", "running", age_seconds=leader.JOB_TAKEOVER_SECONDS + 1)
+
+    assert _run("post", "2025-01-01") == 1
+
+
+def test_a_failed_run_is_recorded_and_not_repeated(file_lease):
+    async def fail():
+        raise RuntimeError("boom")
+
+    with pytest.raises(RuntimeError):
+        asyncio.run(leader.run_exclusive("post", "2025-01-01", fail))
+
+    assert leader._claimed_slots[("post", "2025-01-01")][0] == "error"
+    assert _run("post", "2025-01-01") == 0
+
+
+def test_a_second_file_lease_is_refused(file_lease, tmp_path):
+    standby = leader.FileLease(str(tmp_path / "scheduler.lock"))
+    assert asyncio.run(standby.refresh()) is False
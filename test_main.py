@@ -0,0 +1,92 @@
+import asyncio
+
+import pytest
+
+import riddle_store
+from fake_discord import FakeClient, FakeInteraction, FakeUser
+
+CHANNEL_ID = 100
+
+
+@pytest.fixture
+def bot(tmp_path, monkeypatch):
+    # replay imports main from a scratch directory; each test then works in its own
+    monkeypatch.chdir(tmp_path)
+    import replay
+    monkeypatch.chdir(tmp_path)
+    main = replay.main
+    main.submitted_questions = []
+    main.scores, main.streaks, main.submission_dates = {}, {}, {}
+    main.used_question_ids = set()
+    main.max_id = 0
+    main.cold_top, main.cold_floor = {}, None
+    main.rounds.clear()
+    main.prepared_rounds.clear()
+    main.riddle_index.clear()
+    main.ranked_index.invalidate()
+    main.last_snapshot_sources = None
+    replay.setup([(0, "message", CHANNEL_ID)])
+    yield replay
+    main.rounds.clear()
+
+
+def test_replayed_guesses_score_through_on_message(bot):
+    main = bot.main
+    events = [
+        (0, "message", CHANNEL_ID, 5, "a candle", "wrong"),
+        (1, "message", CHANNEL_ID, 5, "", "correct"),
+        (2, "message", CHANNEL_ID, 6, "", "correct"),
+        (3, "message", CHANNEL_ID, 5, "", "correct"),
+    ]
+
+    latencies, rounds, _ = asyncio.run(bot.replay(events, None))
+
+    assert rounds == 1 and len(latencies["message"]) == 4
+    assert main.scores["5"] > 0 and main.scores["6"] > 0
+    assert main.rounds.get(CHANNEL_ID).correct_users == {"5", "6"}
+    assert main.client.calls.counts["channel.send"] >= 4  # One reply per guess, plus announcements
+
+
+def test_snapshot_is_topped_up_with_changes_made_after_it(bot):
+    main = bot.main
+    for n in range(1, 4):
+        main.add_riddle({"id": str(n), "question": f"Riddle {n}", "answer": "echo"})
+    main.max_id = 3
+    main.scores["5"], main.streaks["5"] = 3, 1
+    main.save_all_scores()
+    main.save_snapshot()
+
+    # Written after the snapshot, then the bot stops without taking another
+    main.add_riddle({"id": "4", "question": "Riddle 4", "answer": "echo"})
+    main.remove_riddle("2")
+    main.scores["5"] = 10
+    main.save_all_scores()
+    main.submitted_questions, main.scores, main.max_id = [], {}, 0
+    main.riddle_index.clear()
+
+    assert main.load_snapshot()
+    assert [riddle["id"] for riddle in main.submitted_questions] == ["1", "3", "4"]
+    assert main.riddle_index.get("4") is not None and main.riddle_index.get("2") is None
+    assert main.max_id == 4
+    assert main.scores == {"5": 10}
+
+
+def test_snapshot_is_not_used_after_the_riddle_log_is_compacted(bot):
+    main = bot.main
+    main.add_riddle({"id": "1", "question": "Riddle 1", "answer": "echo"})
+    main.save_snapshot()
+    riddle_store.compact_riddles(main.QUESTIONS_LOG_FILE, [])
+
+    assert not main.load_snapshot()
+
+
+def test_adjustscores_rejects_role_targets_without_the_members_intent(bot, monkeypatch):
+    main = bot.main
+    monkeypatch.setattr(main.intents, "members", False)
+    main.client = FakeClient(CHANNEL_ID)
+    interaction = FakeInteraction(FakeUser(9), main.client)
+
+    asyncio.run(main.adjustscores.callback(interaction, points=5, role=object()))
+
+    assert main.client.calls.counts == {"response.send_message": 1}
+    assert main.scores == {}
@@ -0,0 +1,59 @@
+from riddle_index import RiddleIndex
+
+
+def _index(count):
+    index = RiddleIndex(lambda text: text.lower().split(), lambda question: " ".join(question.lower().split()))
+    index.rebuild([{"id": str(n), "question": f"Riddle {n}", "answer": "echo" if n % 2 else "shadow"}
+                   for n in range(1, count + 1)])
+    return index
+
+
+def _ids(riddles):
+    return [int(riddle["id"]) for riddle in riddles]
+
+
+def test_pages_continue_after_the_last_id_seen():
+    index = _index(25)
+
+    first = index.page(limit=10)
+    second = index.page(after_id=first[-1]["id"], limit=10)
+    last = index.page(after_id=second[-1]["id"], limit=10)
+
+    assert _ids(first) == list(range(1, 11))
+    assert _ids(second) == list(range(11, 21))
+    assert _ids(last) == list(range(21, 26))
+    assert index.position(second[-1]["id"]) == 20
+
+
+def test_ids_sort_numerically_not_as_text():
+    index = _index(12)
+
+    assert _ids(index.page(after_id=9, limit=5)) == [10, 11, 12]
+
+
+def test_a_page_is_unaffected_by_removals_before_it():
+    index = _index(20)
+    first = index.page(limit=5)
+
+    index.remove("2")
+    index.remove("7")
+
+    assert _ids(index.page(after_id=first[-1]["id"], limit=5)) == [6, 8, 9, 10, 11]
+
+
+def test_saved_search_results_skip_removed_riddles():
+    index = _index(10)
+    results = index.search("shadow")
+    assert results == [2, 4, 6, 8, 10]
+
+    index.remove("4")
+
+    assert _ids(index.page(limit=3, ids=results)) == [2, 6, 8]
+
+
+def test_duplicate_questions_are_found_after_normalizing():
+    index = _index(3)
+
+    assert index.find_question("  riddle   2 ")["id"] == "2"
+    index.remove("2")
+    assert index.find_question("riddle 2") is None
@@ -0,0 +1,85 @@
+import json
+
+import pytest
+
+import riddle_store
+
+
+@pytest.fixture
+def log_file(tmp_path, monkeypatch):
+    monkeypatch.setattr(riddle_store, "COMPACT_MIN_DEAD", 2)
+    return str(tmp_path / "submitted_questions.jsonl")
+
+
+def _riddle(riddle_id):
+    return {"id": str(riddle_id), "question": f"question {riddle_id}", "answer": "answer"}
+
+
+def _lines(filename):
+    with open(filename, "r", encoding="utf-8") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def _raw(filename):
+    with open(filename, "rb") as f:
+        return f.read()
+
+
+def test_load_replays_additions_and_tombstones(log_file):
+    riddle_store.append_riddles(log_file, [_riddle(1), _riddle(2), _riddle(3)])
+    riddle_store.append_tombstone(log_file, "2")
+
+    riddles = riddle_store.load_riddles(log_file)
+
+    assert [r["id"] for r in riddles] == ["1", "3"]
+    assert riddle_store.record_counts() == (2, 2)
+
+
+def test_compaction_rewrites_only_live_riddles(log_file):
+    riddle_store.append_riddles(log_file, [_riddle(1), _riddle(2), _riddle(3)])
+    for riddle_id in ("1", "2"):
+        riddle_store.append_tombstone(log_file, riddle_id)
+
+    riddles = riddle_store.load_riddles(log_file)
+
+    assert [r["id"] for r in riddles] == ["3"]
+    assert _lines(log_file) == [_riddle(3)]
+    assert riddle_store.record_counts() == (1, 0)
+
+
+def test_torn_lines_and_non_objects_are_skipped(log_file):
+    riddle_store.append_riddle(log_file, _riddle(1))
+    with open(log_file, "a", encoding="utf-8") as f:
+        f.write('[1, 2]\n{"id": "2", "quest\n')
+
+    assert [r["id"] for r in riddle_store.load_riddles(log_file)] == ["1"]
+
+
+def test_a_failed_load_is_never_compacted(log_file):
+    riddle_store.append_riddles(log_file, [_riddle(1), _riddle(2), _riddle(3)])
+    for riddle_id in ("1", "2", "3"):
+        riddle_store.append_tombstone(log_file, riddle_id)
+    with open(log_file, "ab") as f:
+        f.write(b"\xff\xfe not utf-8\n")
+    before = _raw(log_file)
+
+    riddle_store.load_riddles(log_file)
+
+    assert _raw(log_file) == before
+
+
+def test_read_after_returns_only_appended_records(log_file):
+    riddle_store.append_riddle(log_file, _riddle(1))
+    position = riddle_store.log_position(log_file)
+    riddle_store.append_riddle(log_file, _riddle(2))
+    riddle_store.append_tombstone(log_file, "1")
+
+    assert riddle_store.read_after(log_file, position) == [_riddle(2), {"id": "1", "deleted": True}]
+
+
+def test_read_after_detects_a_rewritten_log(log_file):
+    riddle_store.append_riddles(log_file, [_riddle(1), _riddle(2)])
+    position = riddle_store.log_position(log_file)
+    riddle_store.compact_riddles(log_file, [_riddle(2), _riddle(3)])
+
+    assert riddle_store.read_after(log_file, position) is None
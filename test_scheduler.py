@@ -0,0 +1,75 @@
+import asyncio
+import json
+from datetime import datetime, time, timedelta, timezone
+
+from scheduler import Scheduler
+
+
+async def _noop(slot):
+    pass
+
+
+def _write_state(path, key, next_run):
+    path.write_text(json.dumps({key: {"next_run": next_run.isoformat()}}), encoding="utf-8")
+
+
+def test_daily_run_missed_within_max_lateness_is_caught_up(tmp_path):
+    state_file = tmp_path / "schedule_state.json"
+    missed = datetime.now(timezone.utc) - timedelta(minutes=5)
+    _write_state(state_file, "post", missed)
+
+    scheduler = Scheduler(str(state_file))
+    scheduler.add_daily("post", time(12, 0), timezone.utc, _noop, max_lateness=600)
+
+    assert scheduler.next_run("post") == missed
+
+
+def test_daily_run_missed_beyond_max_lateness_is_skipped(tmp_path):
+    state_file = tmp_path / "schedule_state.json"
+    missed = datetime.now(timezone.utc) - timedelta(hours=2)
+    _write_state(state_file, "post", missed)
+
+    scheduler = Scheduler(str(state_file))
+    scheduler.add_daily("post", time(12, 0), timezone.utc, _noop, max_lateness=600)
+
+    assert scheduler.next_run("post") > datetime.now(timezone.utc)
+
+
+def test_interval_jobs_are_not_caught_up(tmp_path):
+    state_file = tmp_path / "schedule_state.json"
+    _write_state(state_file, "snapshot", datetime.now(timezone.utc) - timedelta(seconds=30))
+
+    scheduler = Scheduler(str(state_file))
+    scheduler.add_interval("snapshot", 300, _noop)
+
+    assert scheduler.next_run("snapshot") > datetime.now(timezone.utc)
+
+
+def test_daily_next_run_follows_the_local_clock():
+    scheduler_tz = timezone(timedelta(hours=-5))
+    scheduler = Scheduler("unused.json")
+    scheduler.add_daily("post", time(12, 0), scheduler_tz, _noop)
+
+    assert scheduler.next_run("post").astimezone(scheduler_tz).time() == time(12, 0)
+
+
+def test_once_job_runs_with_its_slot_and_cancel_drops_it(tmp_path):
+    scheduler = Scheduler(str(tmp_path / "schedule_state.json"))
+    slots = []
+
+    async def record(slot):
+        slots.append(slot)
+
+    async def run():
+        soon = datetime.now(timezone.utc) + timedelta(milliseconds=20)
+        scheduler.add_once("reveal", soon, record)
+        scheduler.add_once("cancelled", soon, record)
+        scheduler.cancel("cancelled")
+        scheduler.start()
+        await asyncio.sleep(0.2)
+        scheduler.stop()
+        return soon
+
+    soon = asyncio.run(run())
+    assert slots == [soon.isoformat()]
+    assert scheduler.next_run("reveal") is None
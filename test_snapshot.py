@@ -0,0 +1,46 @@
+import struct
+
+import snapshot
+
+
+def test_state_and_sources_round_trip(tmp_path):
+    path = str(tmp_path / "state.snapshot")
+    state = {"scores": {"1": 5}, "riddles": [{"id": "1"}], "cold_floor": (3, 1)}
+    sources = {"users": snapshot.fingerprint([str(tmp_path / "scores.json")])}
+
+    snapshot.write(path, state, sources)
+
+    assert snapshot.load(path) == (sources, state)
+
+
+def test_fingerprint_changes_when_a_source_is_written(tmp_path):
+    source = tmp_path / "scores.json"
+    assert snapshot.fingerprint([str(source)]) == {str(source): None}
+
+    source.write_text("{}", encoding="utf-8")
+    before = snapshot.fingerprint([str(source)])
+    source.write_text('{"1": 5}', encoding="utf-8")
+
+    assert snapshot.fingerprint([str(source)]) != before
+
+
+def test_missing_snapshot_is_not_used(tmp_path):
+    assert snapshot.load(str(tmp_path / "state.snapshot")) is None
+
+
+def test_truncated_snapshot_is_not_used(tmp_path):
+    path = tmp_path / "state.snapshot"
+    snapshot.write(str(path), {"scores": {str(n): n for n in range(1000)}}, {})
+    path.write_bytes(path.read_bytes()[:-100])
+
+    assert snapshot.load(str(path)) is None
+
+
+def test_other_format_versions_are_not_used(tmp_path):
+    path = tmp_path / "state.snapshot"
+    snapshot.write(str(path), {}, {})
+    data = bytearray(path.read_bytes())
+    struct.pack_into("<H", data, len(snapshot.MAGIC), snapshot.FORMAT_VERSION + 1)
+    path.write_bytes(bytes(data))
+
+    assert snapshot.load(str(path)) is None
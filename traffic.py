@@ -0,0 +1,99 @@
+import hashlib
+import json
+import time
+from datetime import datetime, timezone
+
+# Opt-in recording of the guess traffic the bot sees, for replay with replay.py.
+#
+# The log is JSON Lines: a header object, then one compact array per event:
+#
+#   {"traffic": 1, "started_at": "2025-01-01T12:00:00+00:00", "content": "hash"}
+#   [ms, "message", channel_id, user_id, content, outcome]   on_message in the riddle channel
+#   [ms, "slash", channel_id, user_id, content, outcome]     /guess
+#   [ms, "post", channel_id]                                 a round went live
+#   [ms, "reveal", channel_id]                               a round was closed
+#
+# ms counts from when recording started. outcome is what evaluate_guess()
+# returned, so a replay can reproduce which guesses were correct without the
+# log holding the answer. Logs written before rounds were per channel have no
+# channel_id on "post" and "reveal"; those events apply to every channel. With content "hash" (the default) the guess text is
+# stored as a short BLAKE2 digest instead of what the player typed.
+#
+# Lines go through the file's own buffer; the log is flushed when a round is
+# closed and when the bot exits.
+
+FORMAT_VERSION = 1
+CONTENT_MODES = ("hash", "text")
+GUESS_KINDS = ("message", "slash")
+
+
+def content_digest(content):
+    return hashlib.blake2b(content.encode("utf-8"), digest_size=8).hexdigest()
+
+
+class Recorder:
+    def __init__(self, path, content="hash"):
+        if content not in CONTENT_MODES:
+            raise ValueError(f"Unknown traffic content mode {content!r}; expected one of {', '.join(CONTENT_MODES)}")
+        self.path = path
+        self.content = content
+        self.events = 0
+        self.started = time.perf_counter()
+        self._file = open(path, "a", encoding="utf-8")
+        self._write({
+            "traffic": FORMAT_VERSION,
+            "started_at": datetime.now(timezone.utc).isoformat(),
+            "content": content,
+        })
+
+    def _write(self, entry):
+        self._file.write(json.dumps(entry, ensure_ascii=False, separators=(",", ":")) + "\n")
+
+    def _ms(self):
+        return int((time.perf_counter() - self.started) * 1000)
+
+    def guess(self, kind, channel_id, user_id, content, outcome):
+        if self.content == "hash":
+            content = content_digest(content)
+        self._write([self._ms(), kind, channel_id, int(user_id), content, outcome])
+        self.events += 1
+
+    def round_event(self, kind, channel_id):
+        self._write([self._ms(), kind, channel_id])
+        self.events += 1
+        if kind == "reveal":
+            self.flush()
+
+    def flush(self):
+        if not self._file.closed:
+            self._file.flush()
+
+    def close(self):
+        if not self._file.closed:
+            self._file.close()
+
+
+def read_log(path):
+    # Returns (header, events); a log appended to by several runs keeps only the last run
+    header = None
+    events = []
+    with open(path, "r", encoding="utf-8") as f:
+        for line_no, line in enumerate(f, start=1):
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                entry = json.loads(line)
+            except json.JSONDecodeError:
+                print(f"Skipping unreadable line {line_no} of {path}")
+                continue
+            if isinstance(entry, dict):
+                if entry.get("traffic") != FORMAT_VERSION:
+                    raise ValueError(f"{path}: unsupported traffic log version {entry.get('traffic')!r}")
+                header = entry
+                events = []
+            elif isinstance(entry, list) and entry:
+                events.append(entry)
+    if header is None:
+        raise ValueError(f"{path}: not a traffic log (no header line)")
+    return header, events
@@ -11,11 +11,13 @@ def get_combined_sort_key(user_id):
     return (scores.get(user_id, 0), streaks.get(user_id, 0))
 
 class LeaderboardView(View):
-    def __init__(self, client, users, per_page=10):
+    def __init__(self, client, users, per_page=10, render_page=None):
         super().__init__(timeout=120)  # 2 minutes timeout
         self.client = client
         self.users = users  # list of user_id strings sorted
         self.per_page = per_page
+        # Optional async render_page(page, pages) -> (embed, card file or None)
+        self.render_page = render_page
         self.current_page = 0
         self.max_page = (len(users) - 1) // per_page
 
@@ -25,6 +27,12 @@ class LeaderboardView(View):
             self.next_button.disabled = True
 
     async def update_message(self, interaction: Interaction):
+        if self.render_page is not None:
+            embed, card = await self.render_page(self.current_page, self.max_page + 1)
+            # Replaces the previous page's card; no card leaves the page text-only
+            await interaction.response.edit_message(embed=embed, attachments=[card] if card else [], view=self)
+            return
+
         start = self.current_page * self.per_page
         end = start + self.per_page
         page_users = self.users[start:end]